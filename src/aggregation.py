@@ -0,0 +1,307 @@
+from statistics import NormalDist
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from src.datastructures import Conversation, EvaluationResult, Scenario
+from src.evaluation import (
+    DIMENSIONS,
+    calculate_average_words_per_turn,
+    calculate_student_talk_time,
+)
+
+# Score columns of an EvaluationResult, driven by the rubric dimensions
+SCORE_FIELDS = ["rating"] + [f"{key}_score" for _, key, _ in DIMENSIONS]
+GROUP_KEYS = ("student", "scenario", "subject", "grade_band")
+
+# Fields with more distinct values than this are resampled row by row, drawing
+# at most _MAX_RESAMPLED_CELLS row indices at a time
+_MAX_DISTINCT_VALUES = 1000
+_MAX_RESAMPLED_CELLS = 4_000_000
+
+
+
+def grade_band(scenario: Optional[Scenario]) -> str:
+    """
+    Returns the grade band label of a scenario: its `grade_band` when set,
+    otherwise its `grade_level` (e.g. "3-5"), which the scenario files use.
+    """
+    if scenario is None:
+        return ""
+    if scenario.grade_band is not None:
+        return str(scenario.grade_band)
+    return scenario.grade_level
+
+
+class ResultTable:
+    """
+    Evaluation results in columnar form: one NumPy array per score field and
+    one label array per group key, all aligned by row.
+    """
+
+    def __init__(self, scores: np.ndarray, labels: Dict[str, np.ndarray]):
+        # scores has one row per score field and one column per result
+        self.scores = scores
+        self.labels = labels
+
+    @classmethod
+    def from_results(
+        cls,
+        results: Iterable[EvaluationResult],
+        scenarios: Optional[Dict[str, Scenario]] = None,
+    ) -> "ResultTable":
+        """
+        Builds a table from evaluation results. Subject and grade band are looked
+        up in `scenarios` by scenario id.
+        """
+        results = list(results)
+        scenarios = scenarios or {}
+        scores = np.array(
+            [[getattr(result, field) for result in results] for field in SCORE_FIELDS],
+            dtype=np.float64,
+        ).reshape(len(SCORE_FIELDS), len(results))
+        students = [result.student for result in results]
+        scenario_ids = [result.scenario for result in results]
+        labels = {
+            "student": students,
+            "scenario": scenario_ids,
+            "subject": [
+                scenarios[s].subject if s in scenarios else "" for s in scenario_ids
+            ],
+            "grade_band": [grade_band(scenarios.get(s)) for s in scenario_ids],
+        }
+        return cls(
+            scores,
+            {key: np.array(values, dtype=object) for key, values in labels.items()},
+        )
+
+    @classmethod
+    def concat(cls, tables: List["ResultTable"]) -> "ResultTable":
+        """
+        Stacks tables, e.g. the results of several runs.
+        """
+        return cls(
+            np.concatenate([table.scores for table in tables], axis=1),
+            {
+                key: np.concatenate([table.labels[key] for table in tables])
+                for key in GROUP_KEYS
+            },
+        )
+
+    def __len__(self) -> int:
+        return self.scores.shape[1]
+
+    def means(self) -> Dict[str, float]:
+        """
+        Returns the mean of every score field (0.0 for an empty table).
+        """
+        if not len(self):
+            return {field: 0.0 for field in SCORE_FIELDS}
+        return dict(zip(SCORE_FIELDS, self.scores.mean(axis=1).tolist()))
+
+    def bootstrap_ci(
+        self, resamples: int = 1000, confidence: float = 0.95, seed: Optional[int] = 0
+    ) -> Dict[str, Tuple[float, float]]:
+        """
+        Returns percentile bootstrap confidence intervals of the mean of every
+        score field.
+
+        Scores take few distinct values, so each resample is drawn as multinomial
+        counts over a field's distinct values rather than over individual rows;
+        this draws from the same distribution at a cost independent of the
+        number of results.
+        """
+        n = len(self)
+        if n < 2 or resamples < 1:
+            means = self.means()
+            return {field: (mean, mean) for field, mean in means.items()}
+        rng = np.random.default_rng(seed)
+        alpha = (1.0 - confidence) / 2
+        intervals = {}
+        for field, column in zip(SCORE_FIELDS, self.scores):
+            values, counts = np.unique(column, return_counts=True)
+            if len(values) <= _MAX_DISTINCT_VALUES:
+                draws = rng.multinomial(n, counts / n, size=resamples)
+                boot_means = draws @ values / n
+            else:
+                chunk = max(1, _MAX_RESAMPLED_CELLS // n)
+                boot_means = np.concatenate(
+                    [
+                        column[rng.integers(0, n, size=(size, n))].mean(axis=1)
+                        for size in np.diff(np.r_[0:resamples:chunk, resamples])
+                    ]
+                )
+            low, high = np.quantile(boot_means, [alpha, 1.0 - alpha])
+            intervals[field] = (float(low), float(high))
+        return intervals
+
+    def group_by(self, key: str) -> Dict[str, "ResultTable"]:
+        """
+        Splits the table by the values of a group key.
+        """
+        values, inverse = np.unique(self.labels[key].astype(str), return_inverse=True)
+        order = np.argsort(inverse, kind="stable")
+        bounds = np.cumsum(np.bincount(inverse, minlength=len(values)))[:-1]
+        return {
+            value: ResultTable(
+                self.scores[:, rows],
+                {name: labels[rows] for name, labels in self.labels.items()},
+            )
+            for value, rows in zip(values.tolist(), np.split(order, bounds))
+        }
+
+    def summary(
+        self, resamples: int = 1000, confidence: float = 0.95, seed: Optional[int] = 0
+    ) -> Dict[str, Any]:
+        """
+        Returns the size, means and bootstrap confidence intervals of the table.
+        """
+        return {
+            "n": len(self),
+            "means": self.means(),
+            "ci": self.bootstrap_ci(resamples, confidence, seed),
+        }
+
+
+def aggregate_groups(
+    table: ResultTable,
+    keys: Iterable[str] = GROUP_KEYS,
+    resamples: int = 1000,
+    confidence: float = 0.95,
+    seed: Optional[int] = 0,
+) -> Dict[str, Dict[str, Dict[str, Any]]]:
+    """
+    Returns the summary of every group for each group key. Keys whose labels
+    are all unknown are left out.
+    """
+    groups = {}
+    for key in keys:
+        if not any(table.labels[key]):
+            continue
+        groups[key] = {
+            value or "unknown": group.summary(resamples, confidence, seed)
+            for value, group in table.group_by(key).items()
+        }
+    return groups
+
+
+class RunningStats:
+    """
+    Welford's running mean and variance of a vector of values.
+    """
+
+    def __init__(self, size: int):
+        self.n = 0
+        self.mean = np.zeros(size)
+        self._m2 = np.zeros(size)
+
+    def update(self, values: np.ndarray) -> None:
+        self.n += 1
+        delta = values - self.mean
+        self.mean += delta / self.n
+        self._m2 += delta * (values - self.mean)
+
+    def stddev(self) -> np.ndarray:
+        """
+        Returns the sample standard deviation (zeros below two values).
+        """
+        if self.n < 2:
+            return np.zeros_like(self.mean)
+        return np.sqrt(self._m2 / (self.n - 1))
+
+
+class OnlineAggregator:
+    """
+    Aggregates evaluation results one at a time as they arrive during a run.
+
+    Keeps running means and variances of every score field overall and per
+    student, scenario, subject and grade band, plus the running conversation
+    metrics. `snapshot` returns them in the shape of `aggregate_results`, with
+    normal-approximation confidence intervals instead of bootstrap ones.
+    """
+
+    def __init__(
+        self,
+        scenarios: Optional[Dict[str, Scenario]] = None,
+        confidence: float = 0.95,
+        expected: Optional[int] = None,
+    ):
+        self.scenarios = scenarios or {}
+        self.confidence = confidence
+        self.expected = expected
+        self.overall = RunningStats(len(SCORE_FIELDS))
+        self.groups: Dict[str, Dict[str, RunningStats]] = {key: {} for key in GROUP_KEYS}
+        self.conversation_metrics = RunningStats(2)
+
+    def _labels(self, result: EvaluationResult) -> Dict[str, str]:
+        scenario = self.scenarios.get(result.scenario)
+        return {
+            "student": result.student,
+            "scenario": result.scenario,
+            "subject": scenario.subject if scenario else "",
+            "grade_band": grade_band(scenario),
+        }
+
+    def add(self, result: EvaluationResult) -> None:
+        """
+        Adds an evaluation result.
+        """
+        values = np.array([getattr(result, field) for field in SCORE_FIELDS], dtype=np.float64)
+        self.overall.update(values)
+        for key, label in self._labels(result).items():
+            if label:
+                self.groups[key].setdefault(label, RunningStats(len(SCORE_FIELDS))).update(values)
+
+    def add_conversation(self, conversation: Conversation) -> None:
+        """
+        Adds a conversation's talk time and words per turn.
+        """
+        self.conversation_metrics.update(
+            np.array(
+                [
+                    calculate_student_talk_time(conversation),
+                    calculate_average_words_per_turn(conversation),
+                ]
+            )
+        )
+
+    def _summary(self, stats: RunningStats) -> Dict[str, Any]:
+        z = NormalDist().inv_cdf(0.5 + self.confidence / 2)
+        half_width = z * stats.stddev() / np.sqrt(max(stats.n, 1))
+        return {
+            "n": stats.n,
+            "means": dict(zip(SCORE_FIELDS, stats.mean.tolist())),
+            "ci": {
+                field: (mean - half, mean + half)
+                for field, mean, half in zip(
+                    SCORE_FIELDS, stats.mean.tolist(), half_width.tolist()
+                )
+            },
+        }
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Returns the current aggregate, in the shape of `aggregate_results`.
+        """
+        overall = self._summary(self.overall)
+        talk_time, words_per_turn = self.conversation_metrics.mean.tolist()
+        return {
+            "average_rating": overall["means"]["rating"],
+            "num_evaluations": self.overall.n,
+            "metrics": {
+                "student_talk_time": talk_time,
+                "average_words_per_turn": words_per_turn,
+                **{
+                    f"average_{field}": mean
+                    for field, mean in overall["means"].items()
+                    if field != "rating"
+                },
+            },
+            "confidence": self.confidence,
+            "ci_method": "normal approximation",
+            "confidence_intervals": overall["ci"],
+            "groups": {
+                key: {label: self._summary(stats) for label, stats in sorted(groups.items())}
+                for key, groups in self.groups.items()
+                if groups
+            },
+            "progress": {"evaluations": self.overall.n, "expected": self.expected},
+        }
@@ -0,0 +1,298 @@
+import asyncio
+import json
+import os
+import platform
+import sys
+import time
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional
+from src.clients import ClientWrapper
+from src.datastructures import Student, Scenario, Teacher, Conversation
+from src.fake_backend import FakeChatClient, FakeResponder
+from src.generator import MODERATOR_PROMPT, generate_conversation
+from src.evaluation import PROMPT, evaluate_conversation_with_grader
+from src.reporting import aggregate_results
+from src.runner import run_pipeline
+from src.telemetry import JsonlSink, SpanExporter, TelemetryClient
+from src.usage import percentile
+
+
+def latency_summary(values: List[float]) -> Dict[str, float]:
+    """
+    Returns the count, p50/p95/p99 and maximum of a list of latencies.
+    """
+    return {
+        "count": len(values),
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": max(values) if values else 0.0,
+    }
+
+
+def peak_rss_mb() -> Optional[float]:
+    """
+    Returns the peak resident set size of this process in MiB, or None where
+    the `resource` module is unavailable (Windows).
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+class TimedClient(ClientWrapper):
+    """
+    Records the wall-clock latency of every completion call.
+    """
+
+    def __init__(self, client: Any, latencies: List[float]):
+        super().__init__(client)
+        self.latencies = latencies
+
+    async def create(self, **kwargs) -> Any:
+        start = time.perf_counter()
+        try:
+            return await self.client.chat.completions.create(**kwargs)
+        finally:
+            self.latencies.append(time.perf_counter() - start)
+
+
+def cpu_time(function: Callable[[], Any], repeat: int) -> Dict[str, float]:
+    """
+    Measures the CPU time of calling a function `repeat` times.
+    """
+    start = time.process_time()
+    for _ in range(repeat):
+        function()
+    total = time.process_time() - start
+    return {"calls": repeat, "total_seconds": total, "per_call_us": total / repeat * 1e6}
+
+
+def synthetic_grid(num_students: int, num_scenarios: int):
+    """
+    Returns synthetic students, scenarios and a teacher for a benchmark grid.
+    """
+    students = [
+        Student(id=f"bench_student_{i}", system_prompt=f"You are student {i}.")
+        for i in range(num_students)
+    ]
+    scenarios = [
+        Scenario(
+            id=f"bench_scenario_{i}",
+            initial_message=f"I don't understand problem {i}. Can you help?",
+        )
+        for i in range(num_scenarios)
+    ]
+    teacher = Teacher(id="bench_teacher", system_prompt="You are a patient tutor.")
+    return students, scenarios, teacher
+
+
+def measure_own_code(conversations: List[Conversation], evaluations: List[Any], repeat: int):
+    """
+    Measures the CPU time spent in EduBench's own code on the run's outputs:
+    prompt building, grader output parsing, aggregation, JSON serialization and
+    queuing a call trace for export.
+    """
+    if not conversations:
+        return {}
+    conversation = max(conversations, key=lambda c: len(c.exchanges))
+    history = "\n".join(f"{ex.speaker}: {ex.message}" for ex in conversation.exchanges)
+    transcript = "\n".join(
+        f"[{ex.speaker}]: {ex.message}" for ex in conversation.exchanges
+    )
+    grader_reply = FakeResponder().grade(transcript)
+    response = SimpleNamespace(
+        choices=[SimpleNamespace(message=SimpleNamespace(content=grader_reply))]
+    )
+
+    async def instant(**kwargs):
+        return response
+
+    grader = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=instant)))
+    exporter = SpanExporter(JsonlSink(os.devnull), max_queue=repeat)
+    traced_grader = TelemetryClient(grader, exporter, "grader")
+    loop = asyncio.new_event_loop()
+    try:
+        grading = cpu_time(
+            lambda: loop.run_until_complete(
+                evaluate_conversation_with_grader(conversation, grader, "bench")
+            ),
+            repeat,
+        )
+        untraced = cpu_time(lambda: loop.run_until_complete(instant()), repeat)
+        traced = cpu_time(
+            lambda: loop.run_until_complete(
+                traced_grader.chat.completions.create(messages=[])
+            ),
+            repeat,
+        )
+    finally:
+        loop.close()
+        exporter.close()
+
+    return {
+        "prompt_building": cpu_time(
+            lambda: (
+                MODERATOR_PROMPT.format(conversation_history=history),
+                PROMPT.format(conversation_text=transcript),
+            ),
+            repeat,
+        ),
+        "grader_prompt_and_parsing": grading,
+        "aggregate_results": cpu_time(lambda: aggregate_results(evaluations), repeat),
+        "json_serialization": cpu_time(
+            lambda: [json.dumps(c.dict()) for c in conversations]
+            + [json.dumps(e.dict()) for e in evaluations],
+            max(1, repeat // 10),
+        ),
+        # Extra CPU per traced call (including the exporter thread), and the
+        # part of it spent on the caller's path
+        "telemetry": {
+            "calls": repeat,
+            "per_call_us": traced["per_call_us"] - untraced["per_call_us"],
+            "emit_us": exporter.stats["emit_overhead_us"],
+            "dropped": exporter.stats["dropped"],
+        },
+    }
+
+
+async def _run_pipeline(
+    num_students: int,
+    num_scenarios: int,
+    max_turns: int,
+    latency: str,
+    concurrency: int,
+    grader_concurrency: int,
+    seed: int,
+) -> Dict[str, Any]:
+    students, scenarios, teacher = synthetic_grid(num_students, num_scenarios)
+    # The moderator lets every conversation run for the full number of turns
+    responder = FakeResponder(latency=latency, stop_after_turns=max_turns + 1, seed=seed)
+    call_latencies: Dict[str, List[float]] = {
+        role: [] for role in ("teacher", "student", "moderator", "grader")
+    }
+    clients = {
+        role: TimedClient(FakeChatClient(responder, role), latencies)
+        for role, latencies in call_latencies.items()
+    }
+    conversation_latencies: List[float] = []
+    evaluation_latencies: List[float] = []
+
+    async def generate(student, scenario):
+        start = time.perf_counter()
+        conversation = await generate_conversation(
+            student=student,
+            scenario=scenario,
+            teacher=teacher,
+            teacher_model=clients["teacher"],
+            student_model=clients["student"],
+            moderator_model=clients["moderator"],
+            student_model_name="bench-student",
+            teacher_model_name="bench-teacher",
+            moderator_model_name="bench-moderator",
+            max_turns=max_turns,
+        )
+        conversation_latencies.append(time.perf_counter() - start)
+        return conversation
+
+    async def evaluate(conversation):
+        start = time.perf_counter()
+        result = await evaluate_conversation_with_grader(
+            conversation, clients["grader"], "bench-grader"
+        )
+        evaluation_latencies.append(time.perf_counter() - start)
+        return result
+
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    conversations, evaluations = await run_pipeline(
+        students,
+        scenarios,
+        generate,
+        evaluate,
+        concurrency=concurrency,
+        grader_concurrency=grader_concurrency,
+    )
+    wall = time.perf_counter() - wall_start
+    pipeline_cpu = time.process_time() - cpu_start
+
+    return {
+        "conversations": conversations,
+        "evaluations": evaluations,
+        "throughput": {
+            "wall_seconds": wall,
+            "pipeline_cpu_seconds": pipeline_cpu,
+            "conversations": len(conversations),
+            "evaluations": len(evaluations),
+            "conversations_per_minute": len(conversations) / wall * 60 if wall else 0.0,
+            "grader_calls_per_second": len(call_latencies["grader"]) / wall if wall else 0.0,
+            "model_calls": sum(len(values) for values in call_latencies.values()),
+        },
+        "latency_seconds": {
+            **{f"{role}_call": latency_summary(values) for role, values in call_latencies.items()},
+            "conversation": latency_summary(conversation_latencies),
+            "evaluation": latency_summary(evaluation_latencies),
+        },
+    }
+
+
+def run_benchmark(
+    num_students: int = 5,
+    num_scenarios: int = 5,
+    max_turns: int = 10,
+    latency: str = "fixed:0",
+    concurrency: int = 25,
+    grader_concurrency: int = 5,
+    repeat: int = 200,
+    seed: int = 0,
+) -> Dict[str, Any]:
+    """
+    Runs the generate-and-grade pipeline on a synthetic grid against in-process
+    stub clients and returns throughput, per-stage latency, memory and CPU metrics.
+    """
+    pipeline = asyncio.run(
+        _run_pipeline(
+            num_students,
+            num_scenarios,
+            max_turns,
+            latency,
+            concurrency,
+            grader_concurrency,
+            seed,
+        )
+    )
+    return {
+        "parameters": {
+            "students": num_students,
+            "scenarios": num_scenarios,
+            "max_turns": max_turns,
+            "latency": latency,
+            "concurrency": concurrency,
+            "grader_concurrency": grader_concurrency,
+            "repeat": repeat,
+            "seed": seed,
+        },
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        },
+        "throughput": pipeline["throughput"],
+        "latency_seconds": pipeline["latency_seconds"],
+        "peak_rss_mb": peak_rss_mb(),
+        "own_code_cpu": measure_own_code(
+            pipeline["conversations"], pipeline["evaluations"], repeat
+        ),
+    }
+
+
+def write_benchmark(results: Dict[str, Any], file_path: str) -> None:
+    """
+    Saves benchmark results as JSON.
+    """
+    with open(file_path, "w") as f:
+        json.dump(results, f, indent=4)
@@ -0,0 +1,205 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from typing import Any, Dict, Optional
+from src.clients import ClientWrapper
+
+CACHE_MODES = ("read-write", "read-only", "off")
+
+# Request arguments that do not influence the completion and are left out of the key
+_TRANSPORT_ARGUMENTS = {"timeout", "extra_headers", "extra_query"}
+
+
+class ResponseCache:
+    """
+    A persistent SQLite cache of chat completion responses.
+
+    Entries are keyed on a hash of the endpoint and the full request (model,
+    messages and sampling parameters), plus an optional salt for client-side
+    settings that change the response, such as a streaming cutoff. Entries older
+    than `max_age_seconds` are evicted, and when the cache holds more than
+    `max_entries` the least recently used ones are dropped. In "read-only" mode nothing new is stored.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        mode: str = "read-write",
+        max_entries: Optional[int] = None,
+        max_age_seconds: Optional[float] = None,
+    ):
+        if mode not in CACHE_MODES:
+            raise ValueError(f"Unknown cache mode: {mode}")
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.mode = mode
+        self.max_entries = max_entries
+        self.max_age_seconds = max_age_seconds
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self._db = sqlite3.connect(path)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, response TEXT NOT NULL, "
+            "created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)"
+        )
+        self._db.commit()
+        self.evict()
+
+    @staticmethod
+    def make_key(
+        base_url: str, request: Dict[str, Any], salt: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """
+        Returns the content hash identifying a request to an endpoint.
+        """
+        payload = {
+            key: value
+            for key, value in request.items()
+            if key not in _TRANSPORT_ARGUMENTS
+        }
+        entry: Dict[str, Any] = {"base_url": base_url or "", "request": payload}
+        if salt:
+            entry["salt"] = salt
+        encoded = json.dumps(
+            entry,
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """
+        Returns the cached response for a key, or None on a miss.
+        """
+        if self.mode == "off":
+            return None
+        now = time.time()
+        row = self._db.execute(
+            "SELECT response, created FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or (
+            self.max_age_seconds is not None and now - row[1] > self.max_age_seconds
+        ):
+            self.misses += 1
+            return None
+        self.hits += 1
+        if self.mode == "read-write":
+            self._db.execute(
+                "UPDATE responses SET accessed = ? WHERE key = ?", (now, key)
+            )
+            self._db.commit()
+        return json.loads(row[0])
+
+    def put(self, key: str, response: Dict[str, Any]) -> None:
+        """
+        Stores a response unless the cache is read-only.
+        """
+        if self.mode != "read-write":
+            return
+        now = time.time()
+        self._db.execute(
+            "INSERT OR REPLACE INTO responses (key, response, created, accessed) "
+            "VALUES (?, ?, ?, ?)",
+            (key, json.dumps(response), now, now),
+        )
+        self._db.commit()
+        self.writes += 1
+
+    def evict(self) -> None:
+        """
+        Drops expired entries and trims the cache down to `max_entries`.
+        """
+        if self.mode != "read-write":
+            return
+        before = self._db.total_changes
+        if self.max_age_seconds is not None:
+            self._db.execute(
+                "DELETE FROM responses WHERE created < ?",
+                (time.time() - self.max_age_seconds,),
+            )
+        if self.max_entries is not None:
+            self._db.execute(
+                "DELETE FROM responses WHERE key IN ("
+                "SELECT key FROM responses ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+        self._db.commit()
+        self.evictions += self._db.total_changes - before
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Returns the hit/miss counters of this cache.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "writes": self.writes,
+            "evictions": self.evictions,
+        }
+
+    def close(self) -> None:
+        if self._db is None:
+            return
+        self.evict()
+        self._db.close()
+        self._db = None
+
+
+class CachedClient(ClientWrapper):
+    """
+    Serves `chat.completions.create` calls from a ResponseCache when possible.
+
+    Streaming requests are passed through uncached. `salt` is added to every
+    key, so responses shaped by client-side settings are kept apart.
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        cache: ResponseCache,
+        base_url: Optional[str],
+        salt: Optional[Dict[str, Any]] = None,
+    ):
+        super().__init__(client)
+        self.cache = cache
+        self.base_url = base_url or ""
+        self.salt = salt
+
+    async def create(self, **kwargs) -> Any:
+        if kwargs.get("stream"):
+            return await self.client.chat.completions.create(**kwargs)
+        key = ResponseCache.make_key(self.base_url, kwargs, self.salt)
+        cached = self.cache.get(key)
+        if cached is not None:
+            from openai.types.chat import ChatCompletion
+
+            return ChatCompletion.model_validate(cached)
+        response = await self.client.chat.completions.create(**kwargs)
+        self.cache.put(key, response.model_dump(mode="json"))
+        return response
+
+
+def with_cache(
+    client: Any,
+    cache: Optional[ResponseCache],
+    base_url: Optional[str],
+    salt: Optional[Dict[str, Any]] = None,
+) -> Any:
+    """
+    Wraps a client in a response cache, unless caching is disabled.
+    """
+    if cache is None or cache.mode == "off":
+        return client
+    return CachedClient(client, cache, base_url, salt)
@@ -0,0 +1,77 @@
+import json
+import os
+from typing import Generic, List, Type, TypeVar
+from pydantic import BaseModel, ValidationError
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+Record = TypeVar("Record", bound=BaseModel)
+
+
+def load_records(file_path: str, model: Type[Record]) -> List[Record]:
+    """
+    Loads the records of a JSONL file, skipping lines that cannot be parsed
+    (e.g. a line cut short by a crash).
+    """
+    if not os.path.exists(file_path):
+        return []
+    records = []
+    with open(file_path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                records.append(model(**json.loads(line)))
+            except (json.JSONDecodeError, ValidationError):
+                logger.warning(f"Skipping unreadable line {line_number} of {file_path}")
+    return records
+
+
+def write_atomic(file_path: str, text: str) -> None:
+    """
+    Replaces a file's content in one step, so readers never see a partial write.
+    """
+    tmp_path = f"{file_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, file_path)
+
+
+class JsonlCheckpoint(Generic[Record]):
+    """
+    An append-only JSONL file to which every record is written and fsync'd as
+    soon as it is available.
+
+    With `resume=True` the records already in the file are loaded into `records`
+    and kept; otherwise the file starts out empty.
+    """
+
+    def __init__(self, file_path: str, model: Type[Record], resume: bool = False):
+        self.file_path = file_path
+        self.records: List[Record] = load_records(file_path, model) if resume else []
+
+        # Rewrite the file with only the readable records so appends start on a clean line
+        write_atomic(
+            file_path, "".join(json.dumps(record.dict()) + "\n" for record in self.records)
+        )
+        self._file = open(file_path, "a", encoding="utf-8")
+
+    def append(self, record: Record) -> None:
+        """
+        Appends a record and forces it to disk.
+        """
+        self._file.write(json.dumps(record.dict()) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self) -> "JsonlCheckpoint[Record]":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
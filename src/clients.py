@@ -0,0 +1,23 @@
+from types import SimpleNamespace
+from typing import Any
+
+
+class ClientWrapper:
+    """
+    Base class for layers wrapped around an OpenAI-compatible client.
+
+    The wrapper exposes the same `chat.completions.create` entry point as the
+    client it wraps, so layers can be stacked. Subclasses override `create`,
+    which receives the keyword arguments of every completion call. Any other
+    attribute is looked up on the wrapped client.
+    """
+
+    def __init__(self, client: Any):
+        self.client = client
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.client, name)
+
+    async def create(self, **kwargs) -> Any:
+        return await self.client.chat.completions.create(**kwargs)
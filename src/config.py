@@ -2,6 +2,22 @@ import os
 from dotenv import load_dotenv
 
 
+def _get_int(name):
+    """
+    Reads an optional integer setting from the environment.
+    """
+    value = os.getenv(name)
+    return int(value) if value else None
+
+
+def _get_float(name):
+    """
+    Reads an optional decimal setting from the environment.
+    """
+    value = os.getenv(name)
+    return float(value) if value else None
+
+
 def load_config(env_file=".eduenv"):
     """
     Loads configuration from a .env file.
@@ -12,21 +28,49 @@ def load_config(env_file=".eduenv"):
             "api_key": os.getenv("STUDENT_API_KEY"),
             "base_url": os.getenv("STUDENT_BASE_URL"),
             "model": os.getenv("STUDENT_MODEL"),
+            "rpm": _get_int("STUDENT_RPM"),
+            "tpm": _get_int("STUDENT_TPM"),
+            "input_price": _get_float("STUDENT_INPUT_PRICE"),
+            "output_price": _get_float("STUDENT_OUTPUT_PRICE"),
+            "timeout": _get_float("STUDENT_TIMEOUT"),
+            "max_retries": _get_int("STUDENT_MAX_RETRIES"),
+            "deadline": _get_float("STUDENT_DEADLINE"),
         },
         "teacher": {
             "api_key": os.getenv("TEACHER_API_KEY"),
             "base_url": os.getenv("TEACHER_BASE_URL"),
             "model": os.getenv("TEACHER_MODEL"),
+            "rpm": _get_int("TEACHER_RPM"),
+            "tpm": _get_int("TEACHER_TPM"),
+            "input_price": _get_float("TEACHER_INPUT_PRICE"),
+            "output_price": _get_float("TEACHER_OUTPUT_PRICE"),
+            "timeout": _get_float("TEACHER_TIMEOUT"),
+            "max_retries": _get_int("TEACHER_MAX_RETRIES"),
+            "deadline": _get_float("TEACHER_DEADLINE"),
         },
         "grader": {
             "api_key": os.getenv("GRADER_API_KEY"),
             "base_url": os.getenv("GRADER_BASE_URL"),
             "model": os.getenv("GRADER_MODEL"),
+            "rpm": _get_int("GRADER_RPM"),
+            "tpm": _get_int("GRADER_TPM"),
+            "input_price": _get_float("GRADER_INPUT_PRICE"),
+            "output_price": _get_float("GRADER_OUTPUT_PRICE"),
+            "timeout": _get_float("GRADER_TIMEOUT"),
+            "max_retries": _get_int("GRADER_MAX_RETRIES"),
+            "deadline": _get_float("GRADER_DEADLINE"),
         },
         "moderator": {
             "api_key": os.getenv("MODERATOR_API_KEY"),
             "base_url": os.getenv("MODERATOR_BASE_URL"),
             "model": os.getenv("MODERATOR_MODEL"),
+            "rpm": _get_int("MODERATOR_RPM"),
+            "tpm": _get_int("MODERATOR_TPM"),
+            "input_price": _get_float("MODERATOR_INPUT_PRICE"),
+            "output_price": _get_float("MODERATOR_OUTPUT_PRICE"),
+            "timeout": _get_float("MODERATOR_TIMEOUT"),
+            "max_retries": _get_int("MODERATOR_MAX_RETRIES"),
+            "deadline": _get_float("MODERATOR_DEADLINE"),
         },
         "braintrust": {
             "api_key": os.getenv("BRAINTRUST_API_KEY"),
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 
 class Exchange(BaseModel):
@@ -50,6 +50,8 @@ class Scenario(BaseModel):
 
 class EvaluationResult(BaseModel):
     conversation_id: str
+    student: str = ""
+    scenario: str = ""
     rating: float
     reasoning: str
     first_mile_score: float = 0.0
@@ -62,3 +64,11 @@ class EvaluationResult(BaseModel):
     misconception_diagnosis_score: float = 0.0
     motivation_relevance_score: float = 0.0
     beliefs_attributions_score: float = 0.0
+    # Grader reply fields that were missing, unparseable or out of range
+    missing_fields: List[str] = []
+    # Scores filled in by follow-up requests to the grader, and how many were made
+    repaired_fields: List[str] = []
+    repair_calls: int = 0
+    # Number of gradings the scores are averaged over, and their standard deviations
+    samples: int = 1
+    score_stddev: Dict[str, float] = {}
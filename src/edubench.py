@@ -1,166 +1,839 @@
 import os
+import importlib.util
 import json
 import asyncio
+import threading
+import time
 import click
-import braintrust
-from braintrust.oai import wrap_openai
-from openai import AsyncOpenAI
-from src.config import load_config
+from typing import Optional, Tuple
+from src.runtime import ROLES, build_run_context, connection_limit
+from src.telemetry import TELEMETRY_SINKS
+from src.cache import CACHE_MODES, ResponseCache, with_cache
 from src.logger import get_logger
 from src.scenarios import load_all_students, load_all_scenarios, load_teacher
-from src.generator import generate_conversation
+from src.generator import conversation_id, generate_conversation, SharedOpeningTurns
+from src.moderation import HeuristicModerator
+from src.history import ContextPolicy
+from src.retry import RetryingClient
+from src.usage import TokenUsage, UsageTrackingClient, conversation_scope
+from src.runner import run_pipeline
+from src.tracing import span, start_tracing, stop_tracing
+from src.checkpoint import JsonlCheckpoint, write_atomic
+from src.datastructures import Conversation, EvaluationResult
 from src.evaluation import (
+    DIMENSIONS,
+    GRADER_OUTPUT_FORMATS,
+    GRADING_MODES,
+    SAMPLE_WAVE,
     evaluate_conversation_with_grader,
     calculate_student_talk_time,
     calculate_average_words_per_turn,
 )
+from src.aggregation import OnlineAggregator
 from src.reporting import aggregate_results, generate_markdown_report
 
 # Initialize logger
 logger = get_logger(__name__)
 
-# Load configuration
-config = load_config()
-
-# Initialize Braintrust
-braintrust.init_logger(project="EduBench", api_key=config["braintrust"]["api_key"])
-
-# Initialize OpenAI clients and wrap them with Braintrust
-student_client = wrap_openai(
-    AsyncOpenAI(
-        api_key=config["student"]["api_key"], base_url=config["student"]["base_url"]
-    )
-)
-teacher_client = wrap_openai(
-    AsyncOpenAI(
-        api_key=config["teacher"]["api_key"], base_url=config["teacher"]["base_url"]
-    )
-)
-grader_client = wrap_openai(
-    AsyncOpenAI(
-        api_key=config["grader"]["api_key"], base_url=config["grader"]["base_url"]
-    )
-)
-moderator_client = wrap_openai(
-    AsyncOpenAI(
-        api_key=config["moderator"]["api_key"],
-        base_url=config["moderator"]["base_url"],
-    )
-)
-
 
 @click.group()
 def cli():
     pass
 
 
-async def async_run(output_dir: str):
+async def async_run(
+    output_dir: str,
+    concurrency: int = 1,
+    grader_concurrency: int = 1,
+    queue_size: int = 0,
+    cache_mode: str = "off",
+    cache_path: str = ".edubench_cache.sqlite",
+    cache_max_entries: int = 100000,
+    cache_max_age_days: float = 30.0,
+    resume: bool = False,
+    pre_moderation: bool = False,
+    moderation_audit_rate: float = 0.0,
+    speculative_teacher: bool = False,
+    share_opening: bool = False,
+    opening_samples: int = 1,
+    teacher_context: str = "full",
+    student_context: str = "full",
+    moderator_context: str = "full",
+    trace: Optional[str] = None,
+    grader_output: str = "text",
+    grader_repairs: int = 1,
+    grading: str = "single",
+    grader_samples: int = 1,
+    grader_agreement: float = 0.5,
+    partial_report_interval: float = 60.0,
+    hedge: Tuple[str, ...] = (),
+    hedge_percentile: float = 95.0,
+    hedge_ratio: float = 0.1,
+    max_connections: int = 0,
+    keepalive_expiry: float = 60.0,
+    http2: bool = False,
+    stream: bool = False,
+    max_turn_chars: int = 0,
+    stop_sequences: Tuple[str, ...] = (),
+    telemetry: str = "remote",
+):
     """
     Runs the EduBench benchmark pipeline asynchronously.
+
+    With `trace`, the time spent in each stage is saved to that path as a
+    Chrome trace. While the run is in progress, a report of the results so far is
+    rewritten to report.partial.md every `partial_report_interval` seconds
+    (0 disables it).
+
+    Call attempts of the roles in `hedge` that run past the `hedge_percentile`-th
+    percentile of that role's latency are sent a second time, for at most
+    `hedge_ratio` of the attempts.
+
+    All model clients share one HTTP connection pool. Unless `max_connections`
+    is set, the pool is sized for the conversations and grader calls the run
+    keeps in flight.
+
+    With `stream`, teacher and student turns are streamed to measure their time
+    to first token and generation speed, and a turn is cut off once it reaches
+    `max_turn_chars` characters (0 for no limit) or one of `stop_sequences`.
+
+    Every model call is traced to the `telemetry` sink: "remote" (Braintrust),
+    "local" (spans.jsonl in the output directory) or "off".
     """
     os.makedirs(output_dir, exist_ok=True)
+    tracer = start_tracing() if trace else None
+
+    # Load configuration and create the model clients
+    if not max_connections:
+        if grading == "per-dimension":
+            grader_fanout = len(DIMENSIONS) + 1
+        else:
+            grader_fanout = min(grader_samples, SAMPLE_WAVE)
+        max_connections = connection_limit(concurrency, grader_concurrency, grader_fanout)
+        if hedge:
+            max_connections *= 2
+    context = None
+    cache = None
+    token_usage = None
+    try:
+        with span("load_config"):
+            context = build_run_context(
+                max_connections=max_connections,
+                keepalive_expiry=keepalive_expiry,
+                http2=http2,
+                telemetry=telemetry,
+                telemetry_path=os.path.join(output_dir, "spans.jsonl"),
+                resume=resume,
+                stream=stream,
+                max_turn_chars=max_turn_chars or None,
+                stop_sequences=stop_sequences,
+                hedge=hedge,
+                hedge_percentile=hedge_percentile,
+                hedge_ratio=hedge_ratio,
+            )
+        config = context.config
 
-    # Load all students and scenarios
-    students = load_all_students("data/students")
-    scenarios = load_all_scenarios("data/scenarios")
-    teacher = load_teacher("data/teacher/teacher.yaml")
+        # Serve repeated requests from the response cache
+        if cache_mode != "off":
+            cache = ResponseCache(
+                cache_path,
+                mode=cache_mode,
+                max_entries=cache_max_entries,
+                max_age_seconds=cache_max_age_days * 24 * 3600,
+            )
+        # Record every model call with its tokens, latency and cost. Cache hits
+        # are not calls.
+        calls_file = os.path.join(output_dir, "calls.jsonl")
+        token_usage = TokenUsage(
+            prices={
+                role: (config[role]["input_price"], config[role]["output_price"])
+                for role in ("student", "teacher", "grader", "moderator")
+            },
+            calls_path=calls_file,
+            resume=resume,
+        )
+        token_usage.prices["summarizer"] = token_usage.prices["moderator"]
+        clients = {
+            role: UsageTrackingClient(client, token_usage, role)
+            for role, client in context.clients.items()
+        }
 
-    # Run only specific cases for quicker benchmarking
-    target_students = ["student_traditional", "student_curious", "student_gamer", "student_quiet", "student_reflective"]
-    target_scenarios = ["scenario_fractions", "scenario_biology", "scenario_negative_order", "scenario_linear_equation", "scenario_evolution"]
+        # Replies cut off on the client are cached apart from uncut ones
+        student_model = with_cache(
+            clients["student"],
+            cache,
+            config["student"]["base_url"],
+            salt=context.cache_salt("student"),
+        )
+        teacher_model = with_cache(
+            clients["teacher"],
+            cache,
+            config["teacher"]["base_url"],
+            salt=context.cache_salt("teacher"),
+        )
+        grader_model = with_cache(clients["grader"], cache, config["grader"]["base_url"])
+        moderator_model = with_cache(
+            clients["moderator"], cache, config["moderator"]["base_url"]
+        )
+        summary_model = with_cache(
+            UsageTrackingClient(context.clients["moderator"], token_usage, "summarizer"),
+            cache,
+            config["moderator"]["base_url"],
+        )
+
+        # Load all students and scenarios
+        with span("load_data"):
+            students = load_all_students("data/students")
+            scenarios = load_all_scenarios("data/scenarios")
+            teacher = load_teacher("data/teacher/teacher.yaml")
+
+        # Run only specific cases for quicker benchmarking
+        target_students = ["student_traditional", "student_curious", "student_gamer", "student_quiet", "student_reflective"]
+        target_scenarios = ["scenario_fractions", "scenario_biology", "scenario_negative_order", "scenario_linear_equation", "scenario_evolution"]
     
-    students = [s for s in students if s.id in target_students]
-    scenarios = [s for s in scenarios if s.id in target_scenarios]
+        students = [s for s in students if s.id in target_students]
+        scenarios = [s for s in scenarios if s.id in target_scenarios]
 
-    # Generate conversations
-    conversations = []
-    for student in students:
-        for scenario in scenarios:
-            logger.info(
-                f"Generating conversation for student {student.id} and scenario {scenario.id}..."
+        # Decide obvious stopping points locally instead of asking the moderator model
+        pre_moderator = (
+            HeuristicModerator(audit_rate=moderation_audit_rate) if pre_moderation else None
+        )
+
+        # Generate each scenario's opening teacher turn once for all students
+        shared_openings = None
+        if share_opening:
+            shared_openings = SharedOpeningTurns(
+                teacher,
+                teacher_model,
+                context.model_name("teacher"),
+                samples=opening_samples,
+            )
+        student_indices = {student.id: i for i, student in enumerate(students)}
+
+        # Generation and grading of a single grid cell
+        async def generate(student, scenario):
+            opening_teacher_message = None
+            if shared_openings is not None:
+                opening_teacher_message = await shared_openings.get(
+                    scenario, student_indices[student.id]
+                )
+            cell_id = conversation_id(student, scenario)
+            with conversation_scope(cell_id), span("conversation", conversation=cell_id):
+                return await generate_conversation(
+                    student=student,
+                    scenario=scenario,
+                    teacher=teacher,
+                    teacher_model=teacher_model,
+                    student_model=student_model,
+                    moderator_model=moderator_model,
+                    teacher_model_name=context.model_name("teacher"),
+                    student_model_name=context.model_name("student"),
+                    moderator_model_name=context.model_name("moderator"),
+                    pre_moderator=pre_moderator,
+                    speculative=speculative_teacher,
+                    opening_teacher_message=opening_teacher_message,
+                    teacher_context=ContextPolicy.parse(teacher_context),
+                    student_context=ContextPolicy.parse(student_context),
+                    moderator_context=ContextPolicy.parse(moderator_context),
+                    summary_model=summary_model,
+                )
+
+        async def evaluate(conversation):
+            with conversation_scope(conversation.id), span(
+                "evaluation", conversation=conversation.id
+            ):
+                return await evaluate_conversation_with_grader(
+                    conversation=conversation,
+                    grader=grader_model,
+                    grader_model_name=context.model_name("grader"),
+                    output_format=grader_output,
+                    max_repairs=grader_repairs,
+                    mode=grading,
+                    samples=grader_samples,
+                    agreement_tolerance=grader_agreement,
+                )
+
+        # Aggregate results as they arrive and periodically save a partial report
+        scenarios_by_id = {scenario.id: scenario for scenario in scenarios}
+        online = OnlineAggregator(scenarios_by_id, expected=len(students) * len(scenarios))
+        partial_report_file = os.path.join(output_dir, "report.partial.md")
+        last_partial_report = time.monotonic()
+
+        def write_partial_report() -> None:
+            nonlocal last_partial_report
+            with span("partial_report"):
+                write_atomic(partial_report_file, generate_markdown_report(online.snapshot()))
+            last_partial_report = time.monotonic()
+
+        # Generate and evaluate conversations, checkpointing each one to disk as it completes
+        conversations_file_jsonl = os.path.join(output_dir, "conversations.jsonl")
+        evaluations_file = os.path.join(output_dir, "evaluations.jsonl")
+        with span("pipeline"), JsonlCheckpoint(
+            conversations_file_jsonl, Conversation, resume=resume
+        ) as conversations_out, JsonlCheckpoint(
+            evaluations_file, EvaluationResult, resume=resume
+        ) as evaluations_out:
+            if resume:
+                logger.info(
+                    f"Resuming with {len(conversations_out.records)} conversations and "
+                    f"{len(evaluations_out.records)} evaluations from {output_dir}"
+                )
+            for conversation in conversations_out.records:
+                online.add_conversation(conversation)
+            for result in evaluations_out.records:
+                online.add(result)
+
+            def on_conversation(conversation: Conversation) -> None:
+                conversations_out.append(conversation)
+                online.add_conversation(conversation)
+
+            def on_evaluation(result: EvaluationResult) -> None:
+                evaluations_out.append(result)
+                online.add(result)
+                if (
+                    partial_report_interval
+                    and time.monotonic() - last_partial_report >= partial_report_interval
+                ):
+                    write_partial_report()
+
+            conversations, evaluation_results = await run_pipeline(
+                students,
+                scenarios,
+                generate,
+                evaluate,
+                concurrency=concurrency,
+                grader_concurrency=grader_concurrency,
+                queue_size=queue_size,
+                on_conversation=on_conversation,
+                on_evaluation=on_evaluation,
+                completed_conversations=conversations_out.records,
+                completed_evaluations=evaluations_out.records,
             )
-            conversation = await generate_conversation(
-                student=student,
-                scenario=scenario,
-                teacher=teacher,
-                teacher_model=teacher_client,
-                student_model=student_client,
-                moderator_model=moderator_client,
-                teacher_model_name=config["teacher"]["model"] or "",
-                student_model_name=config["student"]["model"] or "",
-                moderator_model_name=config["moderator"]["model"] or "",
+        logger.info(
+            f"Generated {len(conversations)} conversations and saved them to {conversations_file_jsonl}"
+        )
+        logger.info(
+            f"Evaluated {len(evaluation_results)} conversations and saved results to {evaluations_file}"
+        )
+
+        # Save conversations to a JSON file for easier use
+        conversations_file_json = os.path.join(output_dir, "conversations.json")
+        with span("write_conversations"), open(conversations_file_json, "w") as f:
+            json.dump([c.dict() for c in conversations], f, indent=4)
+        logger.info(
+            f"Saved {len(conversations)} conversations to {conversations_file_json}"
+        )
+
+        token_usage.close()
+        if context.exporter is not None:
+            # Export the remaining spans
+            context.exporter.close()
+        logger.info(f"Saved {len(token_usage.calls)} model call records to {calls_file}")
+
+        if cache is not None:
+            cache.close()
+            stats = cache.stats()
+            logger.info(
+                f"Response cache: {stats['hits']} hits, {stats['misses']} misses "
+                f"({stats['hit_rate']:.1%} hit rate), {stats['evictions']} evicted"
             )
-            conversations.append(conversation)
 
-    # Save conversations to a JSONL file
-    conversations_file_jsonl = os.path.join(output_dir, "conversations.jsonl")
-    with open(conversations_file_jsonl, "w") as f:
+        # Aggregate results
+        with span("aggregate"):
+            aggregated_data = aggregate_results(evaluation_results, scenarios_by_id)
+
+        # Calculate statistical metrics and add to aggregated data
+        total_student_talk_time = 0.0
+        total_average_words_per_turn = 0.0
         for conversation in conversations:
-            f.write(json.dumps(conversation.dict()) + "\n")
-    logger.info(
-        f"Generated {len(conversations)} conversations and saved them to {conversations_file_jsonl}"
-    )
+            total_student_talk_time += calculate_student_talk_time(conversation)
+            total_average_words_per_turn += calculate_average_words_per_turn(conversation)
 
-    # Save conversations to a JSON file for easier use
-    conversations_file_json = os.path.join(output_dir, "conversations.json")
-    with open(conversations_file_json, "w") as f:
-        json.dump([c.dict() for c in conversations], f, indent=4)
-    logger.info(
-        f"Saved {len(conversations)} conversations to {conversations_file_json}"
-    )
+        if conversations:
+            aggregated_data["metrics"]["student_talk_time"] = total_student_talk_time / len(
+                conversations
+            )
+            aggregated_data["metrics"]["average_words_per_turn"] = (
+                total_average_words_per_turn / len(conversations)
+            )
 
-    # Evaluate conversations
-    evaluation_results = []
-    for conversation in conversations:
-        logger.info(f"Evaluating conversation {conversation.id}...")
-        evaluation_result = await evaluate_conversation_with_grader(
-            conversation=conversation,
-            grader=grader_client,
-            grader_model_name=config["grader"]["model"] or "",
-        )
-        evaluation_results.append(evaluation_result)
-
-    # Save evaluation results to a JSONL file
-    evaluations_file = os.path.join(output_dir, "evaluations.jsonl")
-    with open(evaluations_file, "w") as f:
-        for result in evaluation_results:
-            f.write(json.dumps(result.dict()) + "\n")
-    logger.info(
-        f"Evaluated {len(evaluation_results)} conversations and saved results to {evaluations_file}"
-    )
+        if pre_moderator is not None:
+            aggregated_data["moderation"] = pre_moderator.summary()
 
-    # Aggregate results
-    aggregated_data = aggregate_results(evaluation_results)
+        aggregated_data["token_usage"] = token_usage.summary()
+        aggregated_data["cost_latency"] = token_usage.cost_latency()
+        aggregated_data["call_policy"] = {
+            role: client.stats
+            for role, client in context.clients.items()
+            if isinstance(client, RetryingClient)
+        }
+        if context.exporter is not None:
+            aggregated_data["telemetry"] = {"sink": telemetry, **context.exporter.stats}
+        if context.streaming_clients:
+            aggregated_data["streaming"] = {
+                role: client.stats for role, client in context.streaming_clients.items()
+            }
+        if context.hedged_clients:
+            aggregated_data["hedging"] = {
+                role: client.stats for role, client in context.hedged_clients.items()
+            }
 
-    # Calculate statistical metrics and add to aggregated data
-    total_student_talk_time = 0.0
-    total_average_words_per_turn = 0.0
-    for conversation in conversations:
-        total_student_talk_time += calculate_student_talk_time(conversation)
-        total_average_words_per_turn += calculate_average_words_per_turn(conversation)
+        # Generate and save report
+        with span("report"):
+            report = generate_markdown_report(aggregated_data)
+            report_file = os.path.join(output_dir, "report.md")
+            write_atomic(report_file, report)
+        if os.path.exists(partial_report_file):
+            os.remove(partial_report_file)
+        logger.info(f"Generated report and saved to {report_file}")
+
+        if tracer is not None:
+            stop_tracing()
+            tracer.write(trace)
+            logger.info(f"Saved trace with {len(tracer.events)} events to {trace}")
+    finally:
+        # Also release everything when the run fails, so that later runs in
+        # the same process start clean
+        if tracer is not None:
+            stop_tracing()
+        if token_usage is not None:
+            token_usage.close()
+        if cache is not None:
+            cache.close()
+        if context is not None:
+            await context.aclose()
 
-    aggregated_data["metrics"]["student_talk_time"] = total_student_talk_time / len(
-        conversations
-    )
-    aggregated_data["metrics"]["average_words_per_turn"] = (
-        total_average_words_per_turn / len(conversations)
-    )
 
-    # Generate and save report
-    report = generate_markdown_report(aggregated_data)
-    report_file = os.path.join(output_dir, "report.md")
-    with open(report_file, "w") as f:
-        f.write(report)
-    logger.info(f"Generated report and saved to {report_file}")
+def validate_context_policy(ctx, param, value):
+    """
+    Checks a context policy option when the command line is parsed.
+    """
+    try:
+        ContextPolicy.parse(value)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+    return value
+
+
+def validate_http2(ctx, param, value):
+    """
+    Checks that HTTP/2 support is installed when --http2 is given.
+    """
+    if value and importlib.util.find_spec("h2") is None:
+        raise click.UsageError(
+            "--http2 needs the h2 package: pip install 'httpx[http2]'", ctx=ctx
+        )
+    return value
 
 
 @cli.command()
 @click.option("--output-dir", default="results", help="Directory to save results.")
-def run(output_dir: str):
+@click.option(
+    "--concurrency",
+    default=1,
+    type=click.IntRange(min=1),
+    help="Maximum number of conversations generated at the same time.",
+)
+@click.option(
+    "--grader-concurrency",
+    default=1,
+    type=click.IntRange(min=1),
+    help="Number of grader workers evaluating finished conversations.",
+)
+@click.option(
+    "--queue-size",
+    default=0,
+    type=click.IntRange(min=0),
+    help="Finished conversations that may wait for grading (0: one per grader worker).",
+)
+@click.option(
+    "--cache",
+    "cache_mode",
+    default="off",
+    type=click.Choice(CACHE_MODES),
+    help="Response cache mode for all model calls.",
+)
+@click.option(
+    "--cache-path",
+    default=".edubench_cache.sqlite",
+    help="SQLite file holding cached responses.",
+)
+@click.option(
+    "--cache-max-entries",
+    default=100000,
+    type=click.IntRange(min=1),
+    help="Least recently used responses beyond this count are evicted.",
+)
+@click.option(
+    "--cache-max-age-days",
+    default=30.0,
+    type=click.FloatRange(min=0),
+    help="Cached responses older than this are evicted.",
+)
+@click.option(
+    "--resume",
+    is_flag=True,
+    help="Skip conversations and evaluations already saved in the output directory.",
+)
+@click.option(
+    "--pre-moderation",
+    is_flag=True,
+    help="Decide obvious stopping points locally before asking the moderator model.",
+)
+@click.option(
+    "--moderation-audit-rate",
+    default=0.0,
+    type=click.FloatRange(min=0, max=1),
+    help="Share of local moderation decisions also checked by the moderator model.",
+)
+@click.option(
+    "--speculative-teacher",
+    is_flag=True,
+    help="Request the next teacher turn while the moderator model decides whether to stop.",
+)
+@click.option(
+    "--share-opening",
+    is_flag=True,
+    help="Generate each scenario's opening teacher turn once and share it across students.",
+)
+@click.option(
+    "--opening-samples",
+    default=1,
+    type=click.IntRange(min=1),
+    help="Number of shared opening teacher turns per scenario (with --share-opening).",
+)
+@click.option(
+    "--teacher-context",
+    default="full",
+    callback=validate_context_policy,
+    help='History in teacher prompts: "full", "last:K" (last K messages) or "summary:K:M" (plus a summary refreshed every M turns).',
+)
+@click.option(
+    "--student-context",
+    default="full",
+    callback=validate_context_policy,
+    help="History in student prompts (same format as --teacher-context).",
+)
+@click.option(
+    "--moderator-context",
+    default="full",
+    callback=validate_context_policy,
+    help="History in moderator prompts (same format as --teacher-context).",
+)
+@click.option(
+    "--trace",
+    default=None,
+    type=click.Path(dir_okay=False),
+    help="Save a per-stage timing trace to this file (open in ui.perfetto.dev or chrome://tracing).",
+)
+@click.option(
+    "--grader-output",
+    default="text",
+    type=click.Choice(GRADER_OUTPUT_FORMATS),
+    help="Ask the grader for labelled text, or for JSON matching a schema (needs structured-output support).",
+)
+@click.option(
+    "--grader-repairs",
+    default=1,
+    type=click.IntRange(min=0),
+    help="Follow-up requests for missing or out-of-range grader scores per conversation (0 disables).",
+)
+@click.option(
+    "--grading",
+    default="single",
+    type=click.Choice(GRADING_MODES),
+    help="Grade all dimensions in one call, or each dimension in its own concurrent call.",
+)
+@click.option(
+    "--grader-samples",
+    default=1,
+    type=click.IntRange(min=1),
+    help="Maximum gradings per conversation; more are only made while scores disagree.",
+)
+@click.option(
+    "--grader-agreement",
+    default=0.5,
+    type=click.FloatRange(min=0),
+    help="Largest score spread across gradings that counts as agreement.",
+)
+@click.option(
+    "--partial-report-interval",
+    default=60.0,
+    type=click.FloatRange(min=0),
+    help="Seconds between rewrites of report.partial.md during the run (0 disables it).",
+)
+@click.option(
+    "--hedge",
+    multiple=True,
+    type=click.Choice(ROLES),
+    help="Send a duplicate of this role's slow calls and keep the first response (repeatable).",
+)
+@click.option(
+    "--hedge-percentile",
+    default=95.0,
+    type=click.FloatRange(min=1, max=100),
+    help="Latency percentile of a role after which its calls are hedged.",
+)
+@click.option(
+    "--hedge-ratio",
+    default=0.1,
+    type=click.FloatRange(min=0, max=1),
+    help="Largest share of a role's calls that may be hedged.",
+)
+@click.option(
+    "--max-connections",
+    default=0,
+    type=click.IntRange(min=0),
+    help="Size of the shared HTTP connection pool (0: sized from the concurrency settings).",
+)
+@click.option(
+    "--keepalive-expiry",
+    default=60.0,
+    type=click.FloatRange(min=0),
+    help="Seconds an idle connection is kept open for reuse.",
+)
+@click.option(
+    "--http2",
+    is_flag=True,
+    callback=validate_http2,
+    help="Use HTTP/2 where the provider supports it (needs the h2 package).",
+)
+@click.option(
+    "--stream",
+    is_flag=True,
+    help="Stream teacher and student turns, measuring time to first token and tokens per second.",
+)
+@click.option(
+    "--max-turn-chars",
+    default=0,
+    type=click.IntRange(min=0),
+    help="Cut off streamed turns at this many characters (0: no limit).",
+)
+@click.option(
+    "--stop-sequence",
+    "stop_sequences",
+    multiple=True,
+    help="Cut off a streamed turn before this text (repeatable).",
+)
+@click.option(
+    "--telemetry",
+    default="remote",
+    type=click.Choice(TELEMETRY_SINKS),
+    help="Where call traces go: Braintrust (remote), spans.jsonl in the output directory (local) or nowhere (off).",
+)
+def run(
+    output_dir: str,
+    concurrency: int,
+    grader_concurrency: int,
+    queue_size: int,
+    cache_mode: str,
+    cache_path: str,
+    cache_max_entries: int,
+    cache_max_age_days: float,
+    resume: bool,
+    pre_moderation: bool,
+    moderation_audit_rate: float,
+    speculative_teacher: bool,
+    share_opening: bool,
+    opening_samples: int,
+    teacher_context: str,
+    student_context: str,
+    moderator_context: str,
+    trace: Optional[str],
+    grader_output: str,
+    grader_repairs: int,
+    grading: str,
+    grader_samples: int,
+    grader_agreement: float,
+    partial_report_interval: float,
+    hedge: Tuple[str, ...],
+    hedge_percentile: float,
+    hedge_ratio: float,
+    max_connections: int,
+    keepalive_expiry: float,
+    http2: bool,
+    stream: bool,
+    max_turn_chars: int,
+    stop_sequences: Tuple[str, ...],
+    telemetry: str,
+):
     """
     Runs the EduBench benchmark pipeline.
     """
-    asyncio.run(async_run(output_dir))
+    if (max_turn_chars or stop_sequences) and not stream:
+        raise click.UsageError("--max-turn-chars and --stop-sequence require --stream")
+    if grading == "per-dimension" and grader_output != "text":
+        raise click.UsageError("--grading per-dimension requires --grader-output text")
+    asyncio.run(
+        async_run(
+            output_dir,
+            concurrency=concurrency,
+            grader_concurrency=grader_concurrency,
+            queue_size=queue_size,
+            cache_mode=cache_mode,
+            cache_path=cache_path,
+            cache_max_entries=cache_max_entries,
+            cache_max_age_days=cache_max_age_days,
+            resume=resume,
+            pre_moderation=pre_moderation,
+            moderation_audit_rate=moderation_audit_rate,
+            speculative_teacher=speculative_teacher,
+            share_opening=share_opening,
+            opening_samples=opening_samples,
+            teacher_context=teacher_context,
+            student_context=student_context,
+            moderator_context=moderator_context,
+            trace=trace,
+            grader_output=grader_output,
+            grader_repairs=grader_repairs,
+            grading=grading,
+            grader_samples=grader_samples,
+            grader_agreement=grader_agreement,
+            partial_report_interval=partial_report_interval,
+            hedge=hedge,
+            hedge_percentile=hedge_percentile,
+            hedge_ratio=hedge_ratio,
+            max_connections=max_connections,
+            keepalive_expiry=keepalive_expiry,
+            http2=http2,
+            stream=stream,
+            max_turn_chars=max_turn_chars,
+            stop_sequences=stop_sequences,
+            telemetry=telemetry,
+        )
+    )
+
+
+@cli.command()
+@click.option("--students", default=5, type=click.IntRange(min=1), help="Synthetic students.")
+@click.option("--scenarios", default=5, type=click.IntRange(min=1), help="Synthetic scenarios.")
+@click.option("--turns", default=10, type=click.IntRange(min=1), help="Turns per conversation.")
+@click.option(
+    "--latency",
+    default="fixed:0",
+    help='Simulated latency per model call (see fake-server --latency).',
+)
+@click.option("--concurrency", default=25, type=click.IntRange(min=1), help="Conversations in flight.")
+@click.option(
+    "--grader-concurrency", default=5, type=click.IntRange(min=1), help="Grader workers."
+)
+@click.option(
+    "--repeat",
+    default=200,
+    type=click.IntRange(min=1),
+    help="Repetitions for the CPU time measurements of EduBench's own code.",
+)
+@click.option("--seed", default=0, type=int, help="Seed for simulated latency.")
+@click.option(
+    "--output", default="bench_results.json", help="File to save the benchmark results to."
+)
+def bench(
+    students: int,
+    scenarios: int,
+    turns: int,
+    latency: str,
+    concurrency: int,
+    grader_concurrency: int,
+    repeat: int,
+    seed: int,
+    output: str,
+):
+    """
+    Benchmarks the pipeline on a synthetic grid against stub model clients.
+    """
+    from src.bench import run_benchmark, write_benchmark
+
+    try:
+        results = run_benchmark(
+            num_students=students,
+            num_scenarios=scenarios,
+            max_turns=turns,
+            latency=latency,
+            concurrency=concurrency,
+            grader_concurrency=grader_concurrency,
+            repeat=repeat,
+            seed=seed,
+        )
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint="--latency")
+    write_benchmark(results, output)
+
+    throughput = results["throughput"]
+    click.echo(f"Conversations/min: {throughput['conversations_per_minute']:.1f}")
+    click.echo(f"Grader calls/sec: {throughput['grader_calls_per_second']:.2f}")
+    for stage, summary in results["latency_seconds"].items():
+        click.echo(
+            f"{stage}: p50 {summary['p50'] * 1000:.1f} ms, "
+            f"p95 {summary['p95'] * 1000:.1f} ms, p99 {summary['p99'] * 1000:.1f} ms"
+        )
+    if results["peak_rss_mb"] is not None:
+        click.echo(f"Peak RSS: {results['peak_rss_mb']:.1f} MiB")
+    for name, measurement in results["own_code_cpu"].items():
+        click.echo(f"{name}: {measurement['per_call_us']:.1f} us CPU per call")
+    telemetry = results["own_code_cpu"].get("telemetry")
+    if telemetry:
+        click.echo(f"telemetry on the call path: {telemetry['emit_us']:.1f} us per call")
+    click.echo(f"Saved benchmark results to {output}")
+
+
+@cli.command("fake-server")
+@click.option("--host", default="127.0.0.1", help="Interface to listen on.")
+@click.option("--port", default=8765, type=int, help="Port to listen on.")
+@click.option(
+    "--latency",
+    default="fixed:0",
+    help='Latency per call in seconds: "fixed:S", "uniform:LOW:HIGH" or "lognormal:MEDIAN:SIGMA".',
+)
+@click.option(
+    "--stop-after-turns",
+    default=3,
+    type=click.IntRange(min=1),
+    help="Teacher turns after which the fake moderator answers STOP.",
+)
+@click.option(
+    "--rate-limit-rate",
+    default=0.0,
+    type=click.FloatRange(min=0, max=1),
+    help="Share of calls failing with HTTP 429.",
+)
+@click.option(
+    "--server-error-rate",
+    default=0.0,
+    type=click.FloatRange(min=0, max=1),
+    help="Share of calls failing with HTTP 500.",
+)
+@click.option("--seed", default=None, type=int, help="Seed for latency and errors.")
+def fake_server(
+    host: str,
+    port: int,
+    latency: str,
+    stop_after_turns: int,
+    rate_limit_rate: float,
+    server_error_rate: float,
+    seed: int,
+):
+    """
+    Serves an offline OpenAI-compatible backend for all four roles.
+    """
+    from src.fake_backend import FakeResponder, FakeServer
+
+    try:
+        responder = FakeResponder(
+            latency=latency,
+            stop_after_turns=stop_after_turns,
+            rate_limit_rate=rate_limit_rate,
+            server_error_rate=server_error_rate,
+            seed=seed,
+        )
+    except ValueError as e:
+        raise click.BadParameter(str(e), param_hint="--latency")
+    server = FakeServer(responder, host=host, port=port).start()
+    for role in ROLES:
+        click.echo(f"{role.upper()}_BASE_URL={server.base_url(role)}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.stop()
 
 
 if __name__ == "__main__":
@@ -1,9 +1,16 @@
-import json
-from typing import Any
-from openai import AsyncOpenAI
+import asyncio
+import re
+import statistics
+from typing import Any, Dict, List, Optional, Tuple
+from pydantic import ConfigDict, ValidationError, create_model
 from src.datastructures import Conversation, EvaluationResult
+from src.logger import get_logger
+from src.tracing import span, traced
 
-PROMPT = """
+logger = get_logger(__name__)
+
+# The conversation under evaluation, shared as a stable prefix by all grading prompts
+PROMPT_PREFIX = """
 You are evaluating a teacher's effectiveness in a dialog. Here is the data:
 [BEGIN DATA]
 ************
@@ -11,60 +18,53 @@ You are evaluating a teacher's effectiveness in a dialog. Here is the data:
 {conversation_text}
 ************
 [END DATA]
+"""
 
-In addition to overall teaching effectiveness, score the teacher on these dimensions:
-
-1) First-Mile Diagnostics
+# One rubric block per dimension, in the order of DIMENSIONS below
+RUBRIC_BLOCKS = [
+    """1) First-Mile Diagnostics
 What it is: Did the teacher ask 2–4 focused diagnostic questions before teaching, state/reflect the learner’s goal, map constraints (deadline, required format/tools), and confirm the starting point (“what’s already clear / where you’re stuck?”)?
 Rubric (0–5):
-0 = no inquiry; 1 = one generic question; 2 = vague/leading questions; 3 = 2+ relevant questions, partial reflection; 4 = clear 3–4 question block + explicit goal reflection; 5 = exemplary: compact diagnosis + summary + agreed short plan.
-
-2) Retrieval Practice (“testing effect”)
+0 = no inquiry; 1 = one generic question; 2 = vague/leading questions; 3 = 2+ relevant questions, partial reflection; 4 = clear 3–4 question block + explicit goal reflection; 5 = exemplary: compact diagnosis + summary + agreed short plan.""",
+    """2) Retrieval Practice (“testing effect”)
 What it is: Did the teacher build frequent low-stakes opportunities for students to recall from memory (short quizzes, free recall, chat prompts) rather than only re-reading?
 Rubric (0–5):
-0 = no retrieval; 1 = ad-hoc single recall; 2 = occasional recall w/o feedback; 3 = weekly low-stakes with brief feedback; 4 = planned daily retrieval + item analysis; 5 = spiraled retrieval with cumulative quizzing that drives re-teaching.
-
-3) Reflect & Revisit (self-checks + scheduled review)
+0 = no retrieval; 1 = ad-hoc single recall; 2 = occasional recall w/o feedback; 3 = weekly low-stakes with brief feedback; 4 = planned daily retrieval + item analysis; 5 = spiraled retrieval with cumulative quizzing that drives re-teaching.""",
+    """3) Reflect & Revisit (self-checks + scheduled review)
 What it is: Did the teacher guide learners to plan, monitor, and evaluate their learning and schedule purposeful revisits across days/weeks?
 Rubric (0–5):
-0 = none; 1 = “all clear?” only; 2 = reflection without a plan; 3 = reflection + one concrete step; 4 = plan + self-rating + scheduled revisit, with at least occasional mid-task self-checks; 5 = plan + self-rating + spaced schedule tuned by performance (gaps adjusted after misses) and plus regular mid-task self-checks and visible follow-through.
-
-4) Interleaved Practice (mix problem types)
+0 = none; 1 = “all clear?” only; 2 = reflection without a plan; 3 = reflection + one concrete step; 4 = plan + self-rating + scheduled revisit, with at least occasional mid-task self-checks; 5 = plan + self-rating + spaced schedule tuned by performance (gaps adjusted after misses) and plus regular mid-task self-checks and visible follow-through.""",
+    """4) Interleaved Practice (mix problem types)
 What it is: Did the teacher alternate different problem types/concepts rather than blocking by one type?
 Rubric (0–5):
-0 = fully blocked; 1 = token mix; 2 = some mixing without cues; 3 = regular interleaving with rationale; 4 = interleaving + strategy labeling; 5 = interleaving adjusted to common mis-selections.
-
-5) Guided Examples & Productive Struggle
+0 = fully blocked; 1 = token mix; 2 = some mixing without cues; 3 = regular interleaving with rationale; 4 = interleaving + strategy labeling; 5 = interleaving adjusted to common mis-selections.""",
+    """5) Guided Examples & Productive Struggle
 What it is: Did the teacher teach with targeted worked examples and a hint ladder (nudge → cue → partial step), then fade support so learners explain steps and solve on their own? Did they mix in light “desirable difficulties” (brief retrieval before reveal; occasional variation in problem type)?
 Rubric (0–5):
-0 = answer dump; 1 = one hint; 2 = sporadic prompts, no fading; 3 = clear hint ladder or self-explain; 4 = both self-explain and planned fading; 5 = plus brief retrieval/variation and a quick note on why the approach helps
-
-6) High-Quality Feedback (task/process-focused, usable)
+0 = answer dump; 1 = one hint; 2 = sporadic prompts, no fading; 3 = clear hint ladder or self-explain; 4 = both self-explain and planned fading; 5 = plus brief retrieval/variation and a quick note on why the approach helps""",
+    """6) High-Quality Feedback (task/process-focused, usable)
 What it is: Did the teacher provide timely comments that specify where the work is, what quality looks like, and how to improve—rather than grades alone?
 Rubric (0–5):
-0 = grades only; 1 = vague praise/critique; 2 = some specifics but no space to use; 3 = specific + limited revision; 4 = clear, timely, with revision cycles; 5 = iterative feedback with student-generated next steps.
-
-7) Socratic Reasoning (disciplined questioning)
+0 = grades only; 1 = vague praise/critique; 2 = some specifics but no space to use; 3 = specific + limited revision; 4 = clear, timely, with revision cycles; 5 = iterative feedback with student-generated next steps.""",
+    """7) Socratic Reasoning (disciplined questioning)
 What it is: Did the teacher use structured sequences of clarifying, probing-evidence, assumptions, implications, and viewpoint questions to make the student’s thinking visible—without spamming?
 Rubric (0–5):
-0 = monologue; 1 = yes/no checks; 2 = unfocused barrage; 3 = mixed quality; 4 = consistent sequencing and pacing; 5 = masterful selection that surfaces assumptions + drives revision.
-
-8) Misconception Diagnosis
+0 = monologue; 1 = yes/no checks; 2 = unfocused barrage; 3 = mixed quality; 4 = consistent sequencing and pacing; 5 = masterful selection that surfaces assumptions + drives revision.""",
+    """8) Misconception Diagnosis
 What it is: Did the teacher go beyond “incorrect” to which mental model produced the error (e.g., overgeneralizing a prior rule), then reframe it?
 Rubric (0–5):
-0 = simple correction; 1 = rephrase only; 2 = one probe; 3 = probe + contrast; 4 = +reframe and successful check; 5 = +plan to prevent recurrence.
-
-9) Motivation & Relevance (autonomy-supportive framing)
+0 = simple correction; 1 = rephrase only; 2 = one probe; 3 = probe + contrast; 4 = +reframe and successful check; 5 = +plan to prevent recurrence.""",
+    """9) Motivation & Relevance (autonomy-supportive framing)
 What it is: Did the teacher make the work feel meaningful, connected to the learner’s interests/values, and give them some real choices (how/what/when) while keeping a clear learning goal?
 Rubric (0–5):
-0 = no attempt to connect or give choice; 1 = generic “this is important” claim, no personalization; 2 = one off-hand relevance comment or trivial choice (e.g., emoji color); 3 = at least one concrete link to learner goals/interests or one meaningful choice; 4 = both a clear relevance link and at least one meaningful choice in the flow; 5 = exemplary: relevance woven through the dialogue, two or more meaningful choices, and language consistently autonomy-supportive.
-
-10) Beliefs & Attributions (ability, effort, strategies)
+0 = no attempt to connect or give choice; 1 = generic “this is important” claim, no personalization; 2 = one off-hand relevance comment or trivial choice (e.g., emoji color); 3 = at least one concrete link to learner goals/interests or one meaningful choice; 4 = both a clear relevance link and at least one meaningful choice in the flow; 5 = exemplary: relevance woven through the dialogue, two or more meaningful choices, and language consistently autonomy-supportive.""",
+    """10) Beliefs & Attributions (ability, effort, strategies)
 What it is: Did the teacher shape how learners explain success and failure—away from “I’m just bad at this” and toward “with time, strategies, and effort I can improve,” while staying honest about difficulty?
 Rubric (0–5):
-0 = no attention to beliefs/attributions; 1 = occasional empty praise/criticism (“You’re smart”, “You’re bad at this”) that reinforces fixed ability; 2 = mixed signals (some strategy talk, some ability labels); 3 = mostly strategy/effort-focused language, but few explicit reframes of learner self-blame; 4 = consistent effort/strategy framing and regular reframes when learner goes to “I can’t.”; 5 = exemplary: beliefs are explicitly surfaced, reframed, and the learner can articulate “what I can do to improve” by the end.
+0 = no attention to beliefs/attributions; 1 = occasional empty praise/criticism (“You’re smart”, “You’re bad at this”) that reinforces fixed ability; 2 = mixed signals (some strategy talk, some ability labels); 3 = mostly strategy/effort-focused language, but few explicit reframes of learner self-blame; 4 = consistent effort/strategy framing and regular reframes when learner goes to “I can’t.”; 5 = exemplary: beliefs are explicitly surfaced, reframed, and the learner can articulate “what I can do to improve” by the end.""",
+]
 
-Provide your answer in the following structured format:
+PROMPT_FORMAT = """Provide your answer in the following structured format:
 OverallRating: <numeric_rating> (1-10)
 OverallReasoning: <your_reasoning>
 FirstMileDiagnosticsScore: <score> (0-5)
@@ -89,103 +89,464 @@ BeliefsAttributionsScore: <score> (0-5)
 BeliefsAttributionsReasoning: <your_reasoning_for_beliefs_attributions>
 """
 
+PROMPT = (
+    PROMPT_PREFIX
+    + "\nIn addition to overall teaching effectiveness, score the teacher on these dimensions:\n\n"
+    + "\n\n".join(RUBRIC_BLOCKS)
+    + "\n\n"
+    + PROMPT_FORMAT
+)
+
+# Per-dimension grading: the shared prefix followed by one rubric block, or the overall rating
+DIMENSION_PROMPT = """
+Score the teacher on this dimension only:
+
+{rubric}
+
+Provide your answer in the following structured format:
+{label}Score: <score> (0-5)
+{label}Reasoning: <your_reasoning>
+"""
+
+OVERALL_PROMPT = """
+Rate the teacher's overall teaching effectiveness.
+
+Provide your answer in the following structured format:
+OverallRating: <numeric_rating> (1-10)
+OverallReasoning: <your_reasoning>
+"""
+
+GRADER_OUTPUT_FORMATS = ("text", "json-schema")
+GRADING_MODES = ("single", "per-dimension")
+# Concurrent gradings per wave when sampling the grader several times
+SAMPLE_WAVE = 2
+
+# Rubric dimensions: (label in the grader reply, EvaluationResult field prefix, display name)
+DIMENSIONS = [
+    ("FirstMileDiagnostics", "first_mile", "First-Mile Diagnostics"),
+    ("RetrievalPractice", "retrieval", "Retrieval Practice"),
+    ("ReflectRevisit", "reflect_revisit", "Reflect & Revisit"),
+    ("InterleavedPractice", "interleaved_practice", "Interleaved Practice"),
+    ("GuidedExamples", "guided_examples", "Guided Examples & Productive Struggle"),
+    ("HighQualityFeedback", "high_quality_feedback", "High-Quality Feedback"),
+    ("SocraticReasoning", "socratic_reasoning", "Socratic Reasoning"),
+    ("MisconceptionDiagnosis", "misconception_diagnosis", "Misconception Diagnosis"),
+    ("MotivationRelevance", "motivation_relevance", "Motivation & Relevance"),
+    ("BeliefsAttributions", "beliefs_attributions", "Beliefs & Attributions"),
+]
+
+# Grader reply labels and the argument each one is parsed into
+GRADER_FIELDS = {
+    "OverallRating": "rating",
+    "OverallReasoning": "reasons",
+    **{f"{label}Score": f"{key}_score" for label, key, _ in DIMENSIONS},
+    **{f"{label}Reasoning": f"{key}_reasoning" for label, key, _ in DIMENSIONS},
+}
+
+# Labels of the rating and the dimension scores
+SCORE_LABELS = [label for label in GRADER_FIELDS if not label.endswith("Reasoning")]
+
+# A "Label: value" line, tolerating markdown emphasis and bulleted or numbered
+# list markers around the label
+FIELD_LINE = re.compile(r"^\s*(?:\d+[.)])?[\s*#>-]*([A-Za-z]+)[\s*]*:[\s*]*(.*?)\s*$")
+NUMBER = re.compile(r"-?\d+(?:\.\d+)?")
+
+# Structured grader output, requested as a JSON schema in the "json-schema" format
+GraderOutput = create_model(
+    "GraderOutput",
+    __config__=ConfigDict(extra="forbid"),
+    **{
+        key: (float if key == "rating" or key.endswith("_score") else str, ...)
+        for key in GRADER_FIELDS.values()
+    },
+)
+GRADER_RESPONSE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "evaluation",
+        "strict": True,
+        "schema": GraderOutput.model_json_schema(),
+    },
+}
+JSON_PROMPT = (
+    PROMPT[: PROMPT.index("Provide your answer")]
+    + "Provide your answer as a JSON object with the overall rating (1-10) and reasoning, "
+    "and a score (0-5) and reasoning for each dimension.\n"
+)
+
+# Valid score ranges of the overall rating and the dimension scores
+RATING_RANGE = (1.0, 10.0)
+SCORE_RANGE = (0.0, 5.0)
+
+REPAIR_PROMPT = """
+Here is your evaluation of a tutoring conversation:
+************
+{grader_reply}
+************
+
+It lacks a valid value for these fields: {fields}.
+The overall rating is a number from 1 to 10, and each dimension score is a number from 0 to 5.
+Answer with only these fields, one per line, in the same format:
+{field_lines}
+"""
+
+
+def parse_score(value: Optional[str]) -> Optional[float]:
+    """
+    Returns the first number in a score field (e.g. "4", "4/5", "**4** (0-5)"), or None.
+    """
+    match = NUMBER.search(value) if value else None
+    return float(match.group()) if match else None
+
+
+def parse_grader_output(content: str) -> Tuple[Dict[str, Any], List[str]]:
+    """
+    Parses a grader reply in the `Label: value` format in a single pass over its lines.
+
+    Reasoning may continue over several lines. Returns the parsed arguments and
+    the labels of missing or unparseable fields, which default to 0.0 (scores)
+    or "" (reasoning).
+    """
+    values: Dict[str, str] = {}
+    current = None
+    for line in content.splitlines():
+        match = FIELD_LINE.match(line)
+        if match and match.group(1) in GRADER_FIELDS:
+            label = match.group(1)
+            current = None
+            if label not in values:
+                values[label] = match.group(2)
+                if label.endswith("Reasoning"):
+                    current = label
+        elif current is not None and line.strip():
+            values[current] += "\n" + line.strip()
+
+    arguments: Dict[str, Any] = {}
+    missing: List[str] = []
+    for label, key in GRADER_FIELDS.items():
+        value = values.get(label)
+        if label.endswith("Reasoning"):
+            found = bool(value)
+            arguments[key] = value or ""
+        else:
+            score = parse_score(value)
+            found = score is not None
+            arguments[key] = score if found else 0.0
+        if not found:
+            missing.append(label)
+    return arguments, missing
+
+
+def parse_grader_reply(content: Optional[str]) -> Tuple[Dict[str, Any], List[str]]:
+    """
+    Parses a grader reply, either a JSON object or the `Label: value` format.
+    """
+    content = content or ""
+    if content.lstrip().startswith("{"):
+        try:
+            return GraderOutput.model_validate_json(content).model_dump(), []
+        except ValidationError:
+            pass
+    return parse_grader_output(content)
+
+
+async def _grader_reply(
+    grader: Any, grader_model_name: str, prompt: str, temperature: float = 0, **request: Any
+) -> str:
+    response = await grader.chat.completions.create(
+        model=grader_model_name,
+        messages=[{"role": "user", "content": prompt}],
+        temperature=temperature,
+        **request,
+    )
+    return response.choices[0].message.content or ""
+
+
+async def _gather_or_cancel(awaitables: List[Any]) -> List[Any]:
+    """
+    Runs awaitables concurrently; if one fails, cancels the others and re-raises.
+    """
+    tasks = [asyncio.ensure_future(awaitable) for awaitable in awaitables]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+
+def invalid_scores(arguments: Dict[str, Any], missing_fields: List[str]) -> List[str]:
+    """
+    Returns the labels of the rating and scores that are missing or out of range.
+    """
+    invalid = []
+    for label, key in GRADER_FIELDS.items():
+        if label.endswith("Reasoning"):
+            continue
+        low, high = RATING_RANGE if key == "rating" else SCORE_RANGE
+        if label in missing_fields or not low <= arguments[key] <= high:
+            invalid.append(label)
+    return invalid
+
+
+async def repair_scores(
+    grader: Any, grader_model_name: str, grader_reply: str, labels: List[str]
+) -> Dict[str, float]:
+    """
+    Asks the grader again for just the given score fields, with its earlier reply
+    as context. Returns the valid scores of the answer by label.
+    """
+    with span("grader_repair", "model", fields=len(labels)):
+        reply = await _grader_reply(
+            grader,
+            grader_model_name,
+            REPAIR_PROMPT.format(
+                grader_reply=grader_reply,
+                fields=", ".join(labels),
+                field_lines="\n".join(f"{label}: <score>" for label in labels),
+            ),
+        )
+    arguments, missing = parse_grader_output(reply)
+    valid = set(labels) - set(invalid_scores(arguments, missing))
+    return {label: arguments[GRADER_FIELDS[label]] for label in labels if label in valid}
+
+
+def build_evaluation_result(
+    conversation_id: str,
+    arguments: Dict[str, Any],
+    missing_fields: List[str],
+    repaired_fields: Optional[List[str]] = None,
+    repair_calls: int = 0,
+) -> EvaluationResult:
+    """
+    Builds an EvaluationResult from parsed grader arguments.
+    """
+    reasoning = f"Overall: {arguments['reasons']}"
+    for _, key, name in DIMENSIONS:
+        reasoning += (
+            f"\n{name} ({arguments[f'{key}_score']}): {arguments[f'{key}_reasoning']}"
+        )
+    return EvaluationResult(
+        conversation_id=conversation_id,
+        rating=arguments["rating"],
+        reasoning=reasoning,
+        missing_fields=missing_fields,
+        repaired_fields=repaired_fields or [],
+        repair_calls=repair_calls,
+        **{f"{key}_score": arguments[f"{key}_score"] for _, key, _ in DIMENSIONS},
+    )
+
+
+async def request_grades(
+    conversation_text: str,
+    grader: Any,
+    grader_model_name: str,
+    output_format: str = "text",
+    mode: str = "single",
+    temperature: float = 0,
+    seed: Optional[int] = None,
+) -> str:
+    """
+    Asks the grader to grade a transcript and returns its reply.
+
+    In "per-dimension" mode the overall rating and each dimension are requested
+    concurrently with short prompts that start with the same transcript prefix,
+    so providers can reuse its cached prompt tokens; the replies are joined.
+    """
+    request: Dict[str, Any] = {"temperature": temperature}
+    if seed is not None:
+        request["seed"] = seed
+    if mode == "single":
+        structured = output_format == "json-schema"
+        prompt = JSON_PROMPT if structured else PROMPT
+        if structured:
+            request["response_format"] = GRADER_RESPONSE_FORMAT
+        with span("grader_call", "model"):
+            return await _grader_reply(
+                grader,
+                grader_model_name,
+                prompt.format(conversation_text=conversation_text),
+                **request,
+            )
+
+    prefix = PROMPT_PREFIX.format(conversation_text=conversation_text)
+    prompts = {"Overall": prefix + OVERALL_PROMPT}
+    for (label, _, _), rubric in zip(DIMENSIONS, RUBRIC_BLOCKS):
+        prompts[label] = prefix + DIMENSION_PROMPT.format(rubric=rubric, label=label)
+    replies = await _gather_or_cancel(
+        [
+            traced(
+                "grader_call",
+                _grader_reply(grader, grader_model_name, prompt, **request),
+                "model",
+                dimension=label,
+            )
+            for label, prompt in prompts.items()
+        ]
+    )
+    return "\n".join(replies)
+
+
+async def _grade_sample(
+    conversation_text: str,
+    grader: Any,
+    grader_model_name: str,
+    output_format: str,
+    mode: str,
+    max_repairs: int,
+    temperature: float = 0,
+    seed: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Grades a transcript once, repairing invalid scores, and returns the parsed
+    arguments with the missing and repaired fields.
+    """
+    content = await request_grades(
+        conversation_text, grader, grader_model_name, output_format, mode, temperature, seed
+    )
+    with span("parse_grader_output"):
+        arguments, missing_fields = parse_grader_reply(content)
+
+    repaired_fields: List[str] = []
+    repair_calls = 0
+    invalid = invalid_scores(arguments, missing_fields)
+    while invalid and repair_calls < max_repairs:
+        repair_calls += 1
+        repaired = await repair_scores(grader, grader_model_name, content, invalid)
+        for label, score in repaired.items():
+            arguments[GRADER_FIELDS[label]] = score
+            repaired_fields.append(label)
+        invalid = [label for label in invalid if label not in repaired]
+    missing_fields = [label for label in missing_fields if label not in repaired_fields]
+    for label in invalid:
+        key = GRADER_FIELDS[label]
+        low, high = RATING_RANGE if key == "rating" else SCORE_RANGE
+        arguments[key] = min(max(arguments[key], low), high)
+        if label not in missing_fields:
+            missing_fields.append(label)
+    return {
+        "arguments": arguments,
+        "missing_fields": missing_fields,
+        "repaired_fields": repaired_fields,
+        "repair_calls": repair_calls,
+    }
+
+
+def _valid_scores(samples: List[Dict[str, Any]], label: str) -> List[float]:
+    return [
+        sample["arguments"][GRADER_FIELDS[label]]
+        for sample in samples
+        if label not in sample["missing_fields"]
+    ]
+
+
+def scores_agree(samples: List[Dict[str, Any]], tolerance: float) -> bool:
+    """
+    Returns whether the rating and every dimension score of the samples lie
+    within `tolerance` of each other.
+    """
+    for label in SCORE_LABELS:
+        scores = _valid_scores(samples, label)
+        if scores and max(scores) - min(scores) > tolerance:
+            return False
+    return True
+
 
 async def evaluate_conversation_with_grader(
     conversation: Conversation,
     grader: Any,
     grader_model_name: str,
+    output_format: str = "text",
+    max_repairs: int = 1,
+    mode: str = "single",
+    samples: int = 1,
+    agreement_tolerance: float = 0.5,
+    sample_temperature: float = 0.7,
 ) -> EvaluationResult:
     """
     Evaluates a single conversation using a grader LLM.
+
+    With `output_format="json-schema"`, the grader is asked for structured output
+    matching GraderOutput, which is validated directly instead of parsed from text.
+    With `mode="per-dimension"`, each rubric dimension is graded by its own
+    concurrent call (see request_grades).
+
+    A rating or score that is missing or out of range is asked for again in a
+    short follow-up request, up to `max_repairs` times. Scores that stay invalid
+    are clamped into range and listed in `missing_fields`.
+
+    With `samples` > 1, the conversation is graded several times at
+    `sample_temperature`, in concurrent waves of two, until the rating and all
+    dimension scores agree within `agreement_tolerance` or `samples` gradings
+    were made. Scores are then the mean over the samples, and their standard
+    deviations are kept in `score_stddev`.
     """
+    if output_format not in GRADER_OUTPUT_FORMATS:
+        raise ValueError(f"Unknown grader output format: {output_format}")
+    if mode not in GRADING_MODES:
+        raise ValueError(f"Unknown grading mode: {mode}")
+    if mode == "per-dimension" and output_format != "text":
+        raise ValueError("Per-dimension grading only supports the text output format")
     conversation_text = "\n".join(
         f"[{exchange.speaker}]: {exchange.message}"
         for exchange in conversation.exchanges
     )
 
-    response = await grader.chat.completions.create(
-        model=grader_model_name,
-        messages=[
-            {
-                "role": "user",
-                "content": PROMPT.format(conversation_text=conversation_text),
-            }
-        ],
-        temperature=0,
-    )
-    # Expecting a structured response in JSON or similar
-    # Try to parse the response content for the required fields
-    content = response.choices[0].message.content
-    try:
-        arguments = json.loads(content)
-    except Exception:
-        import re
-        def extract_field(field, text):
-            match = re.search(rf"{field}:\s*(.*)", text)
-            return match.group(1).strip() if match else None
-        def parse_score(val, default=0.0):
-            if not val:
-                return default
-            val = val.strip()
-            if "/" in val:
-                val = val.split("/")[0]
-            try:
-                return float(val)
-            except Exception:
-                return default
-        arguments = {
-            "rating": parse_score(extract_field("OverallRating", content)),
-            "reasons": extract_field("OverallReasoning", content) or "",
-            "first_mile_score": parse_score(extract_field("FirstMileDiagnosticsScore", content)),
-            "first_mile_reasoning": extract_field("FirstMileDiagnosticsReasoning", content) or "",
-            "retrieval_score": parse_score(extract_field("RetrievalPracticeScore", content)),
-            "retrieval_reasoning": extract_field("RetrievalPracticeReasoning", content) or "",
-            "reflect_revisit_score": parse_score(extract_field("ReflectRevisitScore", content)),
-            "reflect_revisit_reasoning": extract_field("ReflectRevisitReasoning", content) or "",
-            "interleaved_practice_score": parse_score(extract_field("InterleavedPracticeScore", content)),
-            "interleaved_practice_reasoning": extract_field("InterleavedPracticeReasoning", content) or "",
-            "guided_examples_score": parse_score(extract_field("GuidedExamplesScore", content)),
-            "guided_examples_reasoning": extract_field("GuidedExamplesReasoning", content) or "",
-            "high_quality_feedback_score": parse_score(extract_field("HighQualityFeedbackScore", content)),
-            "high_quality_feedback_reasoning": extract_field("HighQualityFeedbackReasoning", content) or "",
-            "socratic_reasoning_score": parse_score(extract_field("SocraticReasoningScore", content)),
-            "socratic_reasoning_reasoning": extract_field("SocraticReasoningReasoning", content) or "",
-            "misconception_diagnosis_score": parse_score(extract_field("MisconceptionDiagnosisScore", content)),
-            "misconception_diagnosis_reasoning": extract_field("MisconceptionDiagnosisReasoning", content) or "",
-            "motivation_relevance_score": parse_score(extract_field("MotivationRelevanceScore", content)),
-            "motivation_relevance_reasoning": extract_field("MotivationRelevanceReasoning", content) or "",
-            "beliefs_attributions_score": parse_score(extract_field("BeliefsAttributionsScore", content)),
-            "beliefs_attributions_reasoning": extract_field("BeliefsAttributionsReasoning", content) or "",
-        }
-
-    combined_reasoning = (
-        f"Overall: {arguments['reasons']}\n"
-        f"First-Mile Diagnostics ({arguments['first_mile_score']}): {arguments['first_mile_reasoning']}\n"
-        f"Retrieval Practice ({arguments['retrieval_score']}): {arguments['retrieval_reasoning']}\n"
-        f"Reflect & Revisit ({arguments['reflect_revisit_score']}): {arguments['reflect_revisit_reasoning']}\n"
-        f"Interleaved Practice ({arguments['interleaved_practice_score']}): {arguments['interleaved_practice_reasoning']}\n"
-        f"Guided Examples & Productive Struggle ({arguments['guided_examples_score']}): {arguments['guided_examples_reasoning']}\n"
-        f"High-Quality Feedback ({arguments['high_quality_feedback_score']}): {arguments['high_quality_feedback_reasoning']}\n"
-        f"Socratic Reasoning ({arguments['socratic_reasoning_score']}): {arguments['socratic_reasoning_reasoning']}\n"
-        f"Misconception Diagnosis ({arguments['misconception_diagnosis_score']}): {arguments['misconception_diagnosis_reasoning']}\n"
-        f"Motivation & Relevance ({arguments['motivation_relevance_score']}): {arguments['motivation_relevance_reasoning']}\n"
-        f"Beliefs & Attributions ({arguments['beliefs_attributions_score']}): {arguments['beliefs_attributions_reasoning']}"
-    )
-    return EvaluationResult(
-        conversation_id=conversation.id,
-        rating=arguments["rating"],
-        reasoning=combined_reasoning,
-        first_mile_score=arguments["first_mile_score"],
-        retrieval_score=arguments["retrieval_score"],
-        reflect_revisit_score=arguments["reflect_revisit_score"],
-        interleaved_practice_score=arguments["interleaved_practice_score"],
-        guided_examples_score=arguments["guided_examples_score"],
-        high_quality_feedback_score=arguments["high_quality_feedback_score"],
-        socratic_reasoning_score=arguments["socratic_reasoning_score"],
-        misconception_diagnosis_score=arguments["misconception_diagnosis_score"],
-        motivation_relevance_score=arguments["motivation_relevance_score"],
-        beliefs_attributions_score=arguments["beliefs_attributions_score"],
+    graded: List[Dict[str, Any]] = []
+    while len(graded) < samples:
+        wave = 1 if samples == 1 else min(SAMPLE_WAVE, samples - len(graded))
+        graded += await _gather_or_cancel(
+            [
+                _grade_sample(
+                    conversation_text,
+                    grader,
+                    grader_model_name,
+                    output_format,
+                    mode,
+                    max_repairs,
+                    # Repeated samples need sampling noise, and distinct seeds keep
+                    # them from being served from the response cache
+                    temperature=0 if samples == 1 else sample_temperature,
+                    seed=None if samples == 1 else len(graded) + i,
+                )
+                for i in range(wave)
+            ]
+        )
+        if scores_agree(graded, agreement_tolerance):
+            break
+
+    # Scores are averaged over the samples where they are valid
+    arguments = dict(graded[0]["arguments"])
+    missing_fields = [
+        label
+        for label in graded[0]["missing_fields"]
+        if label not in SCORE_LABELS or not _valid_scores(graded, label)
+    ]
+    score_stddev: Dict[str, float] = {}
+    for label in SCORE_LABELS:
+        scores = _valid_scores(graded, label)
+        if scores:
+            arguments[GRADER_FIELDS[label]] = statistics.mean(scores)
+        if len(graded) > 1:
+            score_stddev[GRADER_FIELDS[label]] = (
+                statistics.stdev(scores) if len(scores) > 1 else 0.0
+            )
+    repaired_fields = [label for sample in graded for label in sample["repaired_fields"]]
+    repair_calls = sum(sample["repair_calls"] for sample in graded)
+
+    if missing_fields:
+        logger.warning(
+            f"Grader reply for {conversation.id} is missing {', '.join(missing_fields)}"
+        )
+    result = build_evaluation_result(
+        conversation.id, arguments, missing_fields, repaired_fields, repair_calls
     )
+    result.student = conversation.student
+    result.scenario = conversation.scenario
+    result.samples = len(graded)
+    result.score_stddev = score_stddev
+    return result
 
 
 def calculate_student_talk_time(conversation: Conversation) -> float:
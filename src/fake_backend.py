@@ -0,0 +1,369 @@
+import asyncio
+import hashlib
+import json
+import random
+import threading
+import time
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional
+from src.evaluation import DIMENSIONS, parse_grader_output
+from src.ratelimit import CHARS_PER_TOKEN
+from src.runtime import ROLES
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+class FakeAPIError(Exception):
+    """
+    An injected error, carrying the HTTP status the fake backend responds with.
+    """
+
+    def __init__(self, status: int, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+def parse_latency(spec: str) -> Callable[[random.Random], float]:
+    """
+    Parses a latency distribution in seconds: "fixed:S", "uniform:LOW:HIGH" or
+    "lognormal:MEDIAN:SIGMA".
+    """
+    name, *params = spec.split(":")
+    try:
+        values = [float(param) for param in params]
+    except ValueError:
+        raise ValueError(f"Invalid latency distribution: {spec}")
+    if name == "fixed" and len(values) == 1:
+        return lambda rng: values[0]
+    if name == "uniform" and len(values) == 2:
+        return lambda rng: rng.uniform(values[0], values[1])
+    if name == "lognormal" and len(values) == 2:
+        median, sigma = values
+        return lambda rng: median * rng.lognormvariate(0, sigma)
+    raise ValueError(f"Invalid latency distribution: {spec}")
+
+
+class FakeResponder:
+    """
+    Produces canned chat completions for each role, with simulated latency and
+    injectable errors.
+
+    Replies come from `scripts` (a list of replies per role, used in turn) or
+    from built-in templates: the moderator stops after `stop_after_turns`
+    teacher turns, and the grader answers in the `OverallRating:`/`...Score:`
+    format (or as a JSON object when a `response_format` is requested) with
+    scores derived from a hash of the transcript. `rate_limit_rate`
+    and `server_error_rate` are the probabilities of failing a call with a 429
+    or a 500.
+    """
+
+    def __init__(
+        self,
+        scripts: Optional[Dict[str, List[str]]] = None,
+        latency: str = "fixed:0",
+        stop_after_turns: int = 3,
+        rate_limit_rate: float = 0.0,
+        server_error_rate: float = 0.0,
+        seed: Optional[int] = None,
+    ):
+        self.scripts = scripts or {}
+        self.latency = parse_latency(latency)
+        self.stop_after_turns = stop_after_turns
+        self.rate_limit_rate = rate_limit_rate
+        self.server_error_rate = server_error_rate
+        self.random = random.Random(seed)
+        self.calls: Dict[str, int] = {role: 0 for role in ROLES}
+
+    def reply(self, role: str, messages: List[dict]) -> str:
+        """
+        Returns the reply text of a role to a chat history.
+        """
+        script = self.scripts.get(role)
+        if script:
+            return script[(self.calls[role] - 1) % len(script)]
+        prompt = (messages[-1].get("content") or "") if messages else ""
+        if role == "teacher":
+            turn = sum(1 for m in messages if m["role"] == "assistant") + 1
+            return f"Good question. What do you already know about this? (teacher turn {turn})"
+        if role == "student":
+            turn = sum(1 for m in messages if m["role"] == "user")
+            return f"I think I see, but I am not sure about the next step. (student turn {turn})"
+        if role == "moderator":
+            if prompt.lstrip().startswith("Summarize"):
+                return "The student is working through the problem with the teacher."
+            teacher_turns = prompt.count("\nTeacher:")
+            return "STOP" if teacher_turns >= self.stop_after_turns else "CONTINUE"
+        if role == "grader":
+            return self.grade(prompt)
+        raise ValueError(f"Unknown role: {role}")
+
+    def grade(self, prompt: str) -> str:
+        """
+        Returns a grader reply with scores derived from the prompt.
+        """
+        digest = hashlib.sha256(prompt.encode("utf-8")).digest()
+        lines = [
+            f"OverallRating: {digest[0] % 10 + 1}",
+            "OverallReasoning: Generated by the offline backend.",
+        ]
+        for i, (label, _, _) in enumerate(DIMENSIONS, start=1):
+            lines.append(f"{label}Score: {digest[i] % 6}")
+            lines.append(f"{label}Reasoning: Generated by the offline backend.")
+        # Answer only the fields the prompt asks for (e.g. a single dimension)
+        requested = [line for line in lines if line.split(":")[0] + ":" in prompt]
+        return "\n".join(requested or lines)
+
+    async def complete(self, role: str, request: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Answers a chat completion request after the simulated latency.
+
+        Raises FakeAPIError for injected errors.
+        """
+        self.calls[role] += 1
+        # Pick the reply before waiting, so concurrent calls take scripted replies in order
+        messages = request.get("messages", [])
+        content = self.reply(role, messages)
+        if role == "grader" and request.get("response_format") and not self.scripts.get(role):
+            # Structured output: the same grades as a JSON object
+            content = json.dumps(parse_grader_output(content)[0])
+
+        await asyncio.sleep(max(0.0, self.latency(self.random)))
+        draw = self.random.random()
+        if draw < self.rate_limit_rate:
+            raise FakeAPIError(429, "Rate limit reached", retry_after=1.0)
+        if draw < self.rate_limit_rate + self.server_error_rate:
+            raise FakeAPIError(500, "Internal server error")
+
+        prompt_tokens = sum(len(m.get("content") or "") for m in messages) // CHARS_PER_TOKEN
+        completion_tokens = len(content) // CHARS_PER_TOKEN + 1
+        return {
+            "id": f"chatcmpl-fake-{role}-{self.calls[role]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model") or f"fake-{role}",
+            "choices": [
+                {
+                    "index": 0,
+                    "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": content},
+                }
+            ],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+
+def stream_chunks(
+    completion: Dict[str, Any], include_usage: bool = False
+) -> List[Dict[str, Any]]:
+    """
+    Splits a chat completion into the chunks of a streamed response: one per
+    word of the reply, then the finish reason and, optionally, the usage.
+    """
+    base = {
+        "id": completion["id"],
+        "object": "chat.completion.chunk",
+        "created": completion["created"],
+        "model": completion["model"],
+    }
+    content = completion["choices"][0]["message"]["content"]
+    words = content.split(" ")
+    pieces = [word + " " for word in words[:-1]] + [words[-1]]
+    chunks = [
+        {**base, "choices": [{"index": 0, "delta": {"role": "assistant", "content": ""}}]}
+    ]
+    chunks += [
+        {**base, "choices": [{"index": 0, "delta": {"content": piece}}]}
+        for piece in pieces
+        if piece
+    ]
+    chunks.append(
+        {**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+    )
+    if include_usage:
+        chunks.append({**base, "choices": [], "usage": completion["usage"]})
+    return chunks
+
+
+class FakeChatClient:
+    """
+    An in-process stand-in for an AsyncOpenAI client of one role.
+    """
+
+    def __init__(self, responder: FakeResponder, role: str):
+        from openai.types.chat import ChatCompletion
+
+        self.responder = responder
+        self.role = role
+        self.completion_type = ChatCompletion
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, **kwargs) -> Any:
+        completion = await self.responder.complete(self.role, kwargs)
+        if kwargs.get("stream"):
+            from openai.types.chat import ChatCompletionChunk
+
+            include_usage = bool((kwargs.get("stream_options") or {}).get("include_usage"))
+            return FakeStream(
+                [
+                    ChatCompletionChunk.model_validate(chunk)
+                    for chunk in stream_chunks(completion, include_usage)
+                ]
+            )
+        return self.completion_type.model_validate(completion)
+
+
+class FakeStream:
+    """
+    An async iterator over the chunks of a streamed fake completion.
+    """
+
+    def __init__(self, chunks: List[Any]):
+        self.chunks = chunks
+        self.closed = False
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for chunk in self.chunks:
+            if self.closed:
+                return
+            yield chunk
+            await asyncio.sleep(0)
+
+    async def close(self) -> None:
+        self.closed = True
+
+
+class FakeServer:
+    """
+    A local OpenAI-compatible HTTP server backed by a FakeResponder.
+
+    Each role is served under its own base URL, `http://HOST:PORT/<role>/v1`,
+    so roles can be pointed at it through the usual `<ROLE>_BASE_URL` settings.
+    The server runs its own event loop in a background thread.
+    """
+
+    def __init__(self, responder: FakeResponder, host: str = "127.0.0.1", port: int = 0):
+        self.responder = responder
+        self.host = host
+        self.port = port
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stopping: Optional[asyncio.Event] = None
+        self._thread: Optional[threading.Thread] = None
+        self._startup_error: Optional[Exception] = None
+
+    def base_url(self, role: str) -> str:
+        return f"http://{self.host}:{self.port}/{role}/v1"
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = (await reader.readline()).decode("latin-1").strip()
+                    if not line:
+                        break
+                    name, _, value = line.partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                status, payload, extra_headers = await self._route(method, path, body)
+                content_type = "application/json"
+                if isinstance(payload, list):
+                    # A streamed completion as server-sent events
+                    content_type = "text/event-stream"
+                    data = "".join(
+                        f"data: {json.dumps(chunk)}\n\n" for chunk in payload
+                    ).encode("utf-8") + b"data: [DONE]\n\n"
+                else:
+                    data = json.dumps(payload).encode("utf-8")
+                head = [
+                    f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}",
+                    f"Content-Type: {content_type}",
+                    f"Content-Length: {len(data)}",
+                    *(f"{name}: {value}" for name, value in extra_headers.items()),
+                ]
+                writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + data)
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _route(self, method: str, path: str, body: bytes):
+        parts = path.split("?")[0].strip("/").split("/")
+        if method != "POST" or len(parts) != 4 or parts[1:] != ["v1", "chat", "completions"]:
+            return 404, {"error": {"message": f"Not found: {method} {path}"}}, {}
+        role = parts[0]
+        if role not in ROLES:
+            return 404, {"error": {"message": f"Unknown role: {role}"}}, {}
+        try:
+            request = json.loads(body)
+            completion = await self.responder.complete(role, request)
+            if request.get("stream"):
+                include_usage = bool((request.get("stream_options") or {}).get("include_usage"))
+                return 200, stream_chunks(completion, include_usage), {}
+            return 200, completion, {}
+        except FakeAPIError as e:
+            extra = {"Retry-After": str(e.retry_after)} if e.retry_after else {}
+            return e.status, {"error": {"message": str(e), "type": "fake_error"}}, extra
+
+    async def _serve(self, started: threading.Event) -> None:
+        self._loop = asyncio.get_running_loop()
+        self._stopping = asyncio.Event()
+        try:
+            server = await asyncio.start_server(self._handle, self.host, self.port)
+        except Exception as e:
+            # Hand the error to `start` instead of leaving it waiting
+            self._startup_error = e
+            started.set()
+            return
+        self.port = server.sockets[0].getsockname()[1]
+        started.set()
+        async with server:
+            await self._stopping.wait()
+
+    def start(self, timeout: float = 10.0) -> "FakeServer":
+        """
+        Starts serving in a background thread and returns once the port is bound.
+        Raises the startup error if the server cannot listen, or RuntimeError if
+        it does not start within `timeout` seconds.
+        """
+        started = threading.Event()
+        self._startup_error = None
+        self._thread = threading.Thread(
+            target=asyncio.run, args=(self._serve(started),), daemon=True
+        )
+        self._thread.start()
+        if not started.wait(timeout=timeout):
+            raise RuntimeError(f"Fake backend did not start within {timeout} s")
+        if self._startup_error is not None:
+            self._thread.join()
+            self._loop = None
+            raise self._startup_error
+        logger.info(f"Fake backend listening on http://{self.host}:{self.port}")
+        return self
+
+    def stop(self) -> None:
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._stopping.set)
+            self._thread.join()
+            self._loop = None
+
+    def __enter__(self) -> "FakeServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
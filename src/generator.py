@@ -1,6 +1,16 @@
-from typing import Any
+import asyncio
+from typing import Any, Dict, List, Optional, Tuple
 from src.datastructures import Student, Scenario, Conversation, Exchange, Teacher
-from openai import AsyncOpenAI
+from src.moderation import HeuristicModerator
+from src.history import (
+    ContextPolicy,
+    needs_summary,
+    summarize,
+    window_exchanges,
+    window_messages,
+)
+from src.tracing import span, traced
+from src.usage import conversation_scope
 
 MODERATOR_PROMPT = """
 You are a moderator for a conversation between a student and a teacher.
@@ -17,6 +27,144 @@ Answer with only one word: "STOP" or "CONTINUE".
 """
 
 
+def conversation_id(student: Student, scenario: Scenario) -> str:
+    """
+    Returns the id of the conversation between a student and a scenario.
+    """
+    return f"{student.id}_{scenario.id}"
+
+
+async def _discard(task: Optional[asyncio.Task]) -> None:
+    """
+    Cancels a speculative request that is no longer needed.
+    """
+    if task is not None:
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+
+async def should_stop(
+    moderator_model: Any,
+    moderator_model_name: str,
+    exchanges: List[Exchange],
+    policy: Optional[ContextPolicy] = None,
+    summary: Optional[str] = None,
+) -> bool:
+    """
+    Asks the moderator model whether the conversation should stop.
+    """
+    conversation_history = window_exchanges(
+        exchanges, policy or ContextPolicy(), summary
+    )
+    moderator_response = await moderator_model.chat.completions.create(
+        model=moderator_model_name,
+        messages=[
+            {
+                "role": "user",
+                "content": MODERATOR_PROMPT.format(
+                    conversation_history=conversation_history
+                ),
+            }
+        ],
+        max_tokens=5,
+    )
+    moderator_decision = moderator_response.choices[0].message.content.strip().upper()
+    return "STOP" in moderator_decision
+
+
+def opening_teacher_messages(teacher: Teacher, scenario: Scenario) -> List[dict]:
+    """
+    Returns the teacher's first request, which only depends on the scenario.
+    """
+    return [
+        {"role": "system", "content": teacher.system_prompt},
+        {"role": "user", "content": scenario.initial_message},
+    ]
+
+
+async def generate_opening_turn(
+    scenario: Scenario,
+    teacher: Teacher,
+    teacher_model: Any,
+    teacher_model_name: str,
+    temperature: Optional[float] = None,
+    seed: Optional[int] = None,
+) -> str:
+    """
+    Generates the teacher's reply to the scenario's initial student message,
+    sampled with `temperature` and `seed` when given.
+    """
+    request: Dict[str, Any] = {}
+    if temperature is not None:
+        request["temperature"] = temperature
+    if seed is not None:
+        request["seed"] = seed
+    with span("opening_teacher_turn", "model", scenario=scenario.id):
+        teacher_response = await teacher_model.chat.completions.create(
+            model=teacher_model_name,
+            messages=opening_teacher_messages(teacher, scenario),
+            **request,
+        )
+    return teacher_response.choices[0].message.content
+
+
+class SharedOpeningTurns:
+    """
+    Generates the opening teacher turn of each scenario once and shares it
+    between all students.
+
+    With `samples` > 1, that many openings are generated per scenario at
+    `sample_temperature`, each with its sample index as seed so that they are
+    distinct requests, and students are assigned to them round-robin by their
+    index in the grid. The first caller starts the request and later callers
+    wait for the same result; a failed request is retried by the next caller.
+    The requests are attributed to the "shared-opening" conversation rather
+    than to the first caller's.
+    """
+
+    def __init__(
+        self,
+        teacher: Teacher,
+        teacher_model: Any,
+        teacher_model_name: str,
+        samples: int = 1,
+        sample_temperature: float = 0.7,
+    ):
+        self.teacher = teacher
+        self.teacher_model = teacher_model
+        self.teacher_model_name = teacher_model_name
+        self.samples = max(1, samples)
+        self.sample_temperature = sample_temperature
+        self._openings: Dict[Tuple[str, int], asyncio.Future] = {}
+
+    async def get(self, scenario: Scenario, student_index: int = 0) -> str:
+        """
+        Returns the opening teacher turn of a scenario for the given student.
+        """
+        sample = student_index % self.samples
+        key = (scenario.id, sample)
+        opening = self._openings.get(key)
+        if opening is None:
+            with conversation_scope("shared-opening"):
+                opening = asyncio.ensure_future(
+                    generate_opening_turn(
+                        scenario,
+                        self.teacher,
+                        self.teacher_model,
+                        self.teacher_model_name,
+                        temperature=None if self.samples == 1 else self.sample_temperature,
+                        seed=None if self.samples == 1 else sample,
+                    )
+                )
+            self._openings[key] = opening
+        try:
+            return await asyncio.shield(opening)
+        except Exception:
+            if self._openings.get(key) is opening:
+                del self._openings[key]
+            raise
+
+
 async def generate_conversation(
     student: Student,
     scenario: Scenario,
@@ -28,9 +176,31 @@ async def generate_conversation(
     teacher_model_name: str,
     moderator_model_name: str,
     max_turns: int = 10,
+    pre_moderator: Optional[HeuristicModerator] = None,
+    speculative: bool = False,
+    opening_teacher_message: Optional[str] = None,
+    teacher_context: Optional[ContextPolicy] = None,
+    student_context: Optional[ContextPolicy] = None,
+    moderator_context: Optional[ContextPolicy] = None,
+    summary_model: Any = None,
+    summary_model_name: Optional[str] = None,
 ) -> Conversation:
     """
     Generates a conversation between a student and a teacher.
+
+    If a `pre_moderator` is given, it decides obvious stopping points locally and
+    the moderator model is only asked when the heuristic is unsure.
+
+    With `speculative=True`, the next teacher turn is requested while the moderator
+    model decides whether to stop, and discarded if it does. The transcript is the
+    same as without speculation.
+
+    If `opening_teacher_message` is given, it is used as the teacher's first turn
+    instead of requesting one (see SharedOpeningTurns).
+
+    The context policies bound how much of the history each role's prompt
+    contains (the full history by default). Rolling summaries are written by
+    `summary_model`, which defaults to the moderator model.
     """
     exchanges: list[Exchange] = []
 
@@ -38,62 +208,104 @@ async def generate_conversation(
     student_message = scenario.initial_message
     exchanges.append(Exchange(speaker="Student", message=student_message))
 
-    # System prompts for student and teacher
-    student_system_prompt = student.system_prompt
-    teacher_system_prompt = teacher.system_prompt
-
     # Initialize message histories for both models
     student_messages = [
-        {"role": "system", "content": student_system_prompt},
-    ]
-    teacher_messages = [
-        {"role": "system", "content": teacher_system_prompt},
-        {"role": "user", "content": student_message},
+        {"role": "system", "content": student.system_prompt},
     ]
+    teacher_messages = opening_teacher_messages(teacher, scenario)
 
-    for _ in range(max_turns):
+    # Context policies and the rolling summary of turns that fell out of the window
+    teacher_context = teacher_context or ContextPolicy()
+    student_context = student_context or ContextPolicy()
+    moderator_context = moderator_context or ContextPolicy()
+    policies = [teacher_context, student_context, moderator_context]
+    summary_keep = min(
+        (policy.k for policy in policies if policy.mode == "summary"), default=0
+    )
+    summary: Optional[str] = None
+
+    next_teacher_response: Optional[asyncio.Task] = None
+    for turn in range(max_turns):
         # Teacher's turn
-        teacher_response = await teacher_model.chat.completions.create(
-            model=teacher_model_name,
-            messages=teacher_messages,
-        )
-        teacher_message = teacher_response.choices[0].message.content
+        if turn == 0 and opening_teacher_message is not None:
+            teacher_message = opening_teacher_message
+        else:
+            if next_teacher_response is not None:
+                with span("wait_speculative_teacher_turn", turn=turn):
+                    teacher_response = await next_teacher_response
+                next_teacher_response = None
+            else:
+                with span("teacher_turn", "model", turn=turn):
+                    teacher_response = await teacher_model.chat.completions.create(
+                        model=teacher_model_name,
+                        messages=window_messages(teacher_messages, teacher_context, summary),
+                    )
+            teacher_message = teacher_response.choices[0].message.content
         exchanges.append(Exchange(speaker="Teacher", message=teacher_message))
         student_messages.append({"role": "assistant", "content": student_message})
         student_messages.append({"role": "user", "content": teacher_message})
         teacher_messages.append({"role": "assistant", "content": teacher_message})
 
         # Student's turn
-        student_response = await student_model.chat.completions.create(
-            model=student_model_name,
-            messages=student_messages,
-        )
+        with span("student_turn", "model", turn=turn):
+            student_response = await student_model.chat.completions.create(
+                model=student_model_name,
+                messages=window_messages(student_messages, student_context, summary),
+            )
         student_message = student_response.choices[0].message.content
         exchanges.append(Exchange(speaker="Student", message=student_message))
         teacher_messages.append({"role": "user", "content": student_message})
 
+        # Refresh the rolling summary before the moderator and next teacher turn use it
+        if needs_summary(policies, turn):
+            with span("summary", "model", turn=turn):
+                summary = await summarize(
+                    summary_model or moderator_model,
+                    summary_model_name or moderator_model_name,
+                    exchanges,
+                    keep=summary_keep,
+                )
+
         # Moderator's turn
-        conversation_history = "\n".join(
-            [f"{ex.speaker}: {ex.message}" for ex in exchanges]
-        )
-        moderator_response = await moderator_model.chat.completions.create(
-            model=moderator_model_name,
-            messages=[
-                {
-                    "role": "user",
-                    "content": MODERATOR_PROMPT.format(
-                        conversation_history=conversation_history
-                    ),
-                }
-            ],
-            max_tokens=5,
-        )
-        moderator_decision = moderator_response.choices[0].message.content.strip().upper()
-        if "STOP" in moderator_decision:
+        with span("local_moderator_check", turn=turn):
+            local_decision = pre_moderator.decide(exchanges) if pre_moderator else None
+        if local_decision is None or pre_moderator.should_audit():
+            if speculative and local_decision is None and turn + 1 < max_turns:
+                # Start the next teacher turn while the moderator decides
+                next_teacher_response = asyncio.create_task(
+                    traced(
+                        "speculative_teacher_turn",
+                        teacher_model.chat.completions.create(
+                            model=teacher_model_name,
+                            messages=list(
+                                window_messages(teacher_messages, teacher_context, summary)
+                            ),
+                        ),
+                        "model",
+                        turn=turn + 1,
+                    )
+                )
+            try:
+                with span("moderator_check", "model", turn=turn):
+                    remote_decision = await should_stop(
+                        moderator_model,
+                        moderator_model_name,
+                        exchanges,
+                        policy=moderator_context,
+                        summary=summary,
+                    )
+            except BaseException:
+                await _discard(next_teacher_response)
+                raise
+            if pre_moderator:
+                pre_moderator.record_remote(local_decision, remote_decision)
+        stop = local_decision if local_decision is not None else remote_decision
+        if stop:
+            await _discard(next_teacher_response)
             break
 
     return Conversation(
-        id=f"{student.id}_{scenario.id}",
+        id=conversation_id(student, scenario),
         student=student.id,
         scenario=scenario.id,
         exchanges=exchanges,
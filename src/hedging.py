@@ -0,0 +1,96 @@
+import asyncio
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+from src.clients import ClientWrapper
+from src.usage import current_call, percentile
+
+
+class HedgedClient(ClientWrapper):
+    """
+    Cuts tail latency by sending a duplicate of a slow call.
+
+    Once `min_samples` latencies of the role have been observed, a call still
+    running after the `quantile`-th percentile of the last `window` latencies
+    gets a second, identical request. The first successful response wins and
+    the other request is cancelled. At most `max_ratio` of the calls are
+    hedged, so the extra cost stays bounded. Duplicates are counted on the
+    in-flight call record.
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        quantile: float = 95.0,
+        max_ratio: float = 0.1,
+        min_samples: int = 20,
+        window: int = 200,
+    ):
+        super().__init__(client)
+        self.quantile = quantile
+        self.max_ratio = max_ratio
+        self.min_samples = min_samples
+        self.latencies: Deque[float] = deque(maxlen=window)
+        self.calls = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    def threshold(self) -> Optional[float]:
+        """
+        Returns how long a call may run before it is hedged, or None while too
+        few latencies have been observed.
+        """
+        if len(self.latencies) < self.min_samples:
+            return None
+        return percentile(list(self.latencies), self.quantile)
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "hedge_rate": self.hedged / self.calls if self.calls else 0.0,
+            "threshold_seconds": self.threshold(),
+        }
+
+    async def _leg(self, kwargs: Dict[str, Any]) -> Any:
+        start = time.perf_counter()
+        response = await self.client.chat.completions.create(**kwargs)
+        self.latencies.append(time.perf_counter() - start)
+        return response
+
+    async def create(self, **kwargs) -> Any:
+        self.calls += 1
+        threshold = self.threshold()
+        if threshold is None:
+            return await self._leg(kwargs)
+
+        primary = asyncio.ensure_future(self._leg(kwargs))
+        legs = {primary}
+        try:
+            done, _ = await asyncio.wait(legs, timeout=threshold)
+            if done or self.hedged + 1 > self.max_ratio * self.calls:
+                return await primary
+            self.hedged += 1
+            call = current_call.get()
+            if call is not None:
+                call["hedges"] = call.get("hedges", 0) + 1
+            hedge = asyncio.ensure_future(self._leg(kwargs))
+            legs.add(hedge)
+            error: Optional[BaseException] = None
+            while legs:
+                done, legs = await asyncio.wait(legs, return_when=asyncio.FIRST_COMPLETED)
+                for leg in done:
+                    if leg.exception() is None:
+                        self.hedge_wins += int(leg is hedge)
+                        return leg.result()
+                    if error is None or leg is primary:
+                        error = leg.exception()
+            raise error
+        finally:
+            # Cancel the losing request (or both, if the caller was cancelled)
+            for leg in legs:
+                leg.cancel()
+            if legs:
+                await asyncio.gather(*legs, return_exceptions=True)
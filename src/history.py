@@ -0,0 +1,122 @@
+from typing import Any, List, Optional
+from pydantic import BaseModel
+from src.datastructures import Exchange
+
+CONTEXT_MODES = ("full", "last", "summary")
+
+SUMMARY_PROMPT = """
+Summarize the following part of a tutoring conversation between a student and a teacher.
+Keep what the student has understood, what they still struggle with, and any open questions.
+Answer with at most 150 words.
+
+{conversation_history}
+"""
+
+
+class ContextPolicy(BaseModel):
+    """
+    How much of the conversation a role sees in its prompt.
+
+    "full" sends the whole history, "last" only the last `k` messages, and
+    "summary" the last `k` messages preceded by a rolling summary of the
+    earlier ones, refreshed every `summary_every` turns.
+    """
+
+    mode: str = "full"
+    k: int = 6
+    summary_every: int = 4
+
+    @classmethod
+    def parse(cls, spec: str) -> "ContextPolicy":
+        """
+        Parses a policy spec: "full", "last:K" or "summary:K:M".
+        """
+        parts = spec.split(":")
+        mode = parts[0]
+        if mode not in CONTEXT_MODES:
+            raise ValueError(f"Unknown context policy: {spec}")
+        try:
+            numbers = [int(part) for part in parts[1:]]
+        except ValueError:
+            raise ValueError(f"Invalid context policy: {spec}")
+        if (mode == "full" and numbers) or (mode == "last" and len(numbers) != 1) or (
+            mode == "summary" and len(numbers) != 2
+        ):
+            raise ValueError(f"Invalid context policy: {spec}")
+        if any(number < 1 for number in numbers):
+            raise ValueError(f"Context policy sizes must be positive: {spec}")
+        policy = cls(mode=mode)
+        if numbers:
+            policy.k = numbers[0]
+        if len(numbers) > 1:
+            policy.summary_every = numbers[1]
+        return policy
+
+
+def window_messages(
+    messages: List[dict], policy: ContextPolicy, summary: Optional[str] = None
+) -> List[dict]:
+    """
+    Applies a context policy to a chat history starting with its system prompt.
+    """
+    if policy.mode == "full" or len(messages) - 1 <= policy.k:
+        return messages
+    windowed = [messages[0]]
+    if policy.mode == "summary" and summary:
+        windowed.append(
+            {
+                "role": "system",
+                "content": f"Summary of the earlier conversation:\n{summary}",
+            }
+        )
+    return windowed + messages[-policy.k :]
+
+
+def window_exchanges(
+    exchanges: List[Exchange], policy: ContextPolicy, summary: Optional[str] = None
+) -> str:
+    """
+    Applies a context policy to a transcript, returning it as "Speaker: message" lines.
+    """
+    lines = [f"{ex.speaker}: {ex.message}" for ex in exchanges]
+    if policy.mode == "full" or len(lines) <= policy.k:
+        return "\n".join(lines)
+    prefix = []
+    if policy.mode == "summary" and summary:
+        prefix = [f"Summary of the earlier conversation: {summary}"]
+    return "\n".join(prefix + lines[-policy.k :])
+
+
+def needs_summary(policies: List[ContextPolicy], turn: int) -> bool:
+    """
+    Returns whether the rolling summary is due after the given (0-based) turn.
+    """
+    return any(
+        policy.mode == "summary" and (turn + 1) % policy.summary_every == 0
+        for policy in policies
+    )
+
+
+async def summarize(
+    model: Any, model_name: str, exchanges: List[Exchange], keep: int
+) -> Optional[str]:
+    """
+    Summarizes all but the last `keep` exchanges of a conversation.
+    """
+    earlier = exchanges[:-keep] if keep else exchanges
+    if not earlier:
+        return None
+    conversation_history = "\n".join(f"{ex.speaker}: {ex.message}" for ex in earlier)
+    response = await model.chat.completions.create(
+        model=model_name,
+        messages=[
+            {
+                "role": "user",
+                "content": SUMMARY_PROMPT.format(
+                    conversation_history=conversation_history
+                ),
+            }
+        ],
+        temperature=0,
+    )
+    return response.choices[0].message.content.strip()
@@ -0,0 +1,148 @@
+import random
+import re
+from collections import Counter
+from typing import Any, Dict, List, Optional, Set
+from src.datastructures import Exchange
+
+# A farewell only ends the dialogue when it closes a short student reply
+GOODBYE_PATTERN = re.compile(
+    r"\b(good ?bye|bye( for now)?|see (you|ya) (later|soon|tomorrow|next time)|"
+    r"talk (to you )?(later|soon)|have a (good|great|nice) (day|one|night|evening))"
+    r"\W*$",
+    re.IGNORECASE,
+)
+# Thanks only ends the dialogue when the rest of the reply is filler
+THANKS_PATTERN = re.compile(r"\b(thanks|thank you|thx|ty)\b", re.IGNORECASE)
+THANKS_FILLER = {
+    "a", "again", "alot", "awesome", "cool", "for", "got", "great", "help", "helped",
+    "helps", "it", "lot", "makes", "much", "now", "oh", "ok", "okay", "perfect",
+    "really", "sense", "so", "super", "that", "the", "this", "very", "wow", "yes",
+}
+WORD_PATTERN = re.compile(r"\w+")
+
+
+def shingles(text: str, n: int = 3) -> Set[str]:
+    """
+    Returns the set of word n-grams of a text.
+    """
+    words = WORD_PATTERN.findall(text.lower())
+    if len(words) < n:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i : i + n]) for i in range(len(words) - n + 1)}
+
+
+def similarity(a: Set[str], b: Set[str]) -> float:
+    """
+    Returns the Jaccard similarity of two shingle sets.
+    """
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+class HeuristicModerator:
+    """
+    Decides the obvious moderator cases locally, without a model call.
+
+    `decide` returns True (stop) for an empty student reply, a short reply
+    ending in a goodbye, a reply of thanks and filler only, and when the latest
+    student or teacher turn of at least `repeat_min_words` words nearly repeats
+    an earlier turn of the same speaker (the conversation is going in circles).
+    Short turns such as "I don't know" or "Great job!" are normal tutoring and
+    never count as repeats.
+    It returns None when unsure, in which case the remote moderator is consulted.
+
+    A share `audit_rate` of the local decisions is also sent to the remote
+    moderator to measure how often both agree.
+    """
+
+    def __init__(
+        self,
+        duplicate_threshold: float = 0.8,
+        thanks_max_words: int = 8,
+        goodbye_max_words: int = 12,
+        repeat_min_words: int = 6,
+        audit_rate: float = 0.0,
+        seed: Optional[int] = None,
+    ):
+        self.duplicate_threshold = duplicate_threshold
+        self.thanks_max_words = thanks_max_words
+        self.goodbye_max_words = goodbye_max_words
+        self.repeat_min_words = repeat_min_words
+        self.audit_rate = audit_rate
+        self._random = random.Random(seed)
+        self.decisions: Counter = Counter()
+        self.remote_calls = 0
+        self.audits = 0
+        self.agreements = 0
+
+    def _is_repeat(self, exchanges: List[Exchange], speaker: str) -> bool:
+        turns = [ex.message for ex in exchanges if ex.speaker == speaker]
+        if len(turns) < 2 or len(WORD_PATTERN.findall(turns[-1])) < self.repeat_min_words:
+            return False
+        latest = shingles(turns[-1])
+        return any(
+            similarity(latest, shingles(earlier)) >= self.duplicate_threshold
+            for earlier in turns[:-1]
+        )
+
+    def decide(self, exchanges: List[Exchange]) -> Optional[bool]:
+        """
+        Returns True if the conversation should stop, or None if unsure.
+        """
+        reason = None
+        message = (exchanges[-1].message or "").strip()
+        if not message:
+            reason = "empty_reply"
+        elif (
+            GOODBYE_PATTERN.search(message)
+            and "?" not in message
+            and len(message.split()) <= self.goodbye_max_words
+        ):
+            reason = "goodbye"
+        elif (
+            THANKS_PATTERN.search(message)
+            and "?" not in message
+            and len(message.split()) <= self.thanks_max_words
+            and set(WORD_PATTERN.findall(THANKS_PATTERN.sub(" ", message.lower())))
+            <= THANKS_FILLER
+        ):
+            reason = "thanks"
+        elif self._is_repeat(exchanges, "Student") or self._is_repeat(
+            exchanges, "Teacher"
+        ):
+            reason = "repetition"
+
+        self.decisions[reason or "unsure"] += 1
+        return True if reason else None
+
+    def should_audit(self) -> bool:
+        """
+        Returns whether a local decision should also be checked remotely.
+        """
+        return self.audit_rate > 0 and self._random.random() < self.audit_rate
+
+    def record_remote(self, local_decision: Optional[bool], remote_decision: bool) -> None:
+        """
+        Records a remote moderator call and, for audits, whether it agreed.
+        """
+        self.remote_calls += 1
+        if local_decision is not None:
+            self.audits += 1
+            self.agreements += int(local_decision == remote_decision)
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Returns the decision counts, saved calls and agreement rate.
+        """
+        turns = sum(self.decisions.values())
+        local = turns - self.decisions["unsure"]
+        return {
+            "turns": turns,
+            "local_decisions": local,
+            "remote_calls": self.remote_calls,
+            "calls_saved": turns - self.remote_calls,
+            "audits": self.audits,
+            "agreement_rate": self.agreements / self.audits if self.audits else None,
+            "reasons": {k: v for k, v in self.decisions.items() if k != "unsure"},
+        }
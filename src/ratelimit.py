@@ -0,0 +1,110 @@
+import asyncio
+import time
+from typing import Any, Callable, Dict, Optional
+
+# Rough characters-per-token ratio used to estimate prompt size before a call
+CHARS_PER_TOKEN = 4
+
+
+class TokenBucket:
+    """
+    A token bucket that refills continuously at `per_minute` tokens per minute.
+
+    The bucket holds at most one minute worth of tokens. Its level may go negative
+    when a call turns out to use more tokens than estimated; the debt is repaid
+    by the refill before anything else is admitted.
+    """
+
+    def __init__(self, per_minute: float, clock: Callable[[], float] = time.monotonic):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.level = self.capacity
+        self.clock = clock
+        self.updated = clock()
+
+    def _refill(self) -> None:
+        now = self.clock()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """
+        Returns the number of seconds until `amount` tokens are available.
+        """
+        self._refill()
+        # A single request larger than the bucket is admitted once the bucket is full
+        needed = min(amount, self.capacity)
+        if self.level >= needed:
+            return 0.0
+        return (needed - self.level) / self.rate
+
+    def consume(self, amount: float) -> None:
+        """
+        Takes `amount` tokens, or gives tokens back when it is negative. The
+        level may go below zero (a debt) but never above capacity.
+        """
+        self._refill()
+        self.level = min(self.capacity, self.level - amount)
+
+
+class RateLimiter:
+    """
+    Admits calls under a requests-per-minute and a tokens-per-minute quota.
+
+    Either limit may be None to leave that dimension unthrottled. Waiting callers
+    are admitted in arrival order.
+    """
+
+    def __init__(
+        self,
+        rpm: Optional[int] = None,
+        tpm: Optional[int] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.requests = TokenBucket(rpm, clock) if rpm else None
+        self.tokens = TokenBucket(tpm, clock) if tpm else None
+        self.throttled_calls = 0
+        self.throttled_seconds = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, tokens: int) -> None:
+        """
+        Waits until one request and `tokens` tokens fit within the quotas.
+        """
+        async with self._lock:
+            waited = 0.0
+            while True:
+                wait = max(
+                    self.requests.wait_time(1) if self.requests else 0.0,
+                    self.tokens.wait_time(tokens) if self.tokens else 0.0,
+                )
+                if wait <= 0:
+                    break
+                await asyncio.sleep(wait)
+                waited += wait
+            if self.requests:
+                self.requests.consume(1)
+            if self.tokens:
+                self.tokens.consume(tokens)
+            if waited:
+                self.throttled_calls += 1
+                self.throttled_seconds += waited
+
+    def settle(self, estimated: int, actual: Any) -> None:
+        """
+        Corrects the token bucket once the real token usage of a call is known.
+        """
+        if self.tokens and isinstance(actual, int):
+            self.tokens.consume(actual - estimated)
+
+
+def estimate_tokens(request: Dict[str, Any]) -> int:
+    """
+    Estimates the tokens a completion request will use: prompt plus completion budget.
+    """
+    prompt_chars = sum(
+        len(message.get("content") or "") for message in request.get("messages", [])
+    )
+    completion_budget = request.get("max_tokens") or request.get("max_completion_tokens") or 0
+    return prompt_chars // CHARS_PER_TOKEN + 1 + completion_budget
+
@@ -1,67 +1,71 @@
-from typing import List, Dict, Any
-from src.datastructures import EvaluationResult
+from collections import Counter
+from typing import List, Dict, Any, Optional
+from src.aggregation import SCORE_FIELDS, ResultTable, aggregate_groups
+from src.datastructures import EvaluationResult, Scenario
+from src.evaluation import DIMENSIONS
 
 
-def aggregate_results(evaluation_results: List[EvaluationResult]) -> Dict[str, Any]:
+# Display names of the score fields
+SCORE_NAMES = {"rating": "Overall Rating"}
+SCORE_NAMES.update({f"{key}_score": name for _, key, name in DIMENSIONS})
+
+
+def aggregate_results(
+    evaluation_results: List[EvaluationResult],
+    scenarios: Optional[Dict[str, Scenario]] = None,
+    bootstrap_resamples: int = 1000,
+    confidence: float = 0.95,
+) -> Dict[str, Any]:
     """
     Aggregates evaluation results and statistical metrics.
+
+    Besides the overall means, this computes bootstrap confidence intervals of
+    every score and the same summary per student, scenario, subject and grade
+    band (subject and grade band are looked up in `scenarios`).
     """
-    total_rating = 0.0
-    total_first_mile = 0.0
-    total_retrieval = 0.0
-    total_reflect_revisit = 0.0
-    total_interleaved_practice = 0.0
-    total_guided_examples = 0.0
-    total_high_quality_feedback = 0.0
-    total_socratic_reasoning = 0.0
-    total_misconception_diagnosis = 0.0
-    total_motivation_relevance = 0.0
-    total_beliefs_attributions = 0.0
+    table = ResultTable.from_results(evaluation_results, scenarios)
+    means = table.means()
+    missing_fields: Counter = Counter()
+    repaired_fields: Counter = Counter()
+    repair_calls = 0
+    total_samples = 0
+    stddev_totals: Counter = Counter()
+    sampled = 0
     for result in evaluation_results:
-        total_rating += result.rating
-        total_first_mile += getattr(result, "first_mile_score", 0.0)
-        total_retrieval += getattr(result, "retrieval_score", 0.0)
-        total_reflect_revisit += getattr(result, "reflect_revisit_score", 0.0)
-        total_interleaved_practice += getattr(result, "interleaved_practice_score", 0.0)
-        total_guided_examples += getattr(result, "guided_examples_score", 0.0)
-        total_high_quality_feedback += getattr(result, "high_quality_feedback_score", 0.0)
-        total_socratic_reasoning += getattr(result, "socratic_reasoning_score", 0.0)
-        total_misconception_diagnosis += getattr(result, "misconception_diagnosis_score", 0.0)
-        total_motivation_relevance += getattr(result, "motivation_relevance_score", 0.0)
-        total_beliefs_attributions += getattr(result, "beliefs_attributions_score", 0.0)
+        total_samples += result.samples
+        if result.score_stddev:
+            sampled += 1
+            stddev_totals.update(result.score_stddev)
+        missing_fields.update(result.missing_fields)
+        repaired_fields.update(result.repaired_fields)
+        repair_calls += result.repair_calls
 
     n = len(evaluation_results)
-    average_rating = total_rating / n if n else 0.0
-    average_first_mile = total_first_mile / n if n else 0.0
-    average_retrieval = total_retrieval / n if n else 0.0
-    average_reflect_revisit = total_reflect_revisit / n if n else 0.0
-    average_interleaved_practice = total_interleaved_practice / n if n else 0.0
-    average_guided_examples = total_guided_examples / n if n else 0.0
-    average_high_quality_feedback = total_high_quality_feedback / n if n else 0.0
-    average_socratic_reasoning = total_socratic_reasoning / n if n else 0.0
-    average_misconception_diagnosis = total_misconception_diagnosis / n if n else 0.0
-    average_motivation_relevance = total_motivation_relevance / n if n else 0.0
-    average_beliefs_attributions = total_beliefs_attributions / n if n else 0.0
-
     metrics = {
         "student_talk_time": 0.0,
         "average_words_per_turn": 0.0,
-        "average_first_mile_score": average_first_mile,
-        "average_retrieval_score": average_retrieval,
-        "average_reflect_revisit_score": average_reflect_revisit,
-        "average_interleaved_practice_score": average_interleaved_practice,
-        "average_guided_examples_score": average_guided_examples,
-        "average_high_quality_feedback_score": average_high_quality_feedback,
-        "average_socratic_reasoning_score": average_socratic_reasoning,
-        "average_misconception_diagnosis_score": average_misconception_diagnosis,
-        "average_motivation_relevance_score": average_motivation_relevance,
-        "average_beliefs_attributions_score": average_beliefs_attributions,
+        **{f"average_{field}": means[field] for field in SCORE_FIELDS if field != "rating"},
     }
 
     return {
-        "average_rating": average_rating,
+        "average_rating": means["rating"],
         "num_evaluations": n,
         "metrics": metrics,
+        "confidence": confidence,
+        "ci_method": "bootstrap",
+        "confidence_intervals": table.bootstrap_ci(bootstrap_resamples, confidence),
+        "groups": aggregate_groups(
+            table, resamples=bootstrap_resamples, confidence=confidence
+        ),
+        "missing_fields": dict(missing_fields),
+        "repairs": {"calls": repair_calls, "fields": dict(repaired_fields)},
+        "sampling": {
+            "average_samples": total_samples / n if n else 0.0,
+            "sampled_evaluations": sampled,
+            "average_stddev": {
+                key: total / sampled for key, total in stddev_totals.items()
+            },
+        },
     }
 
 
@@ -72,19 +76,165 @@ def generate_markdown_report(aggregated_data: Dict[str, Any]) -> str:
     report = "# EduBench Evaluation Report\n\n"
     report += "## Summary\n"
     report += f"- Average Rating: {aggregated_data['average_rating']:.2f}\n"
-    report += f"- Number of Evaluations: {aggregated_data['num_evaluations']}\n\n"
+    report += f"- Number of Evaluations: {aggregated_data['num_evaluations']}\n"
+    progress = aggregated_data.get("progress")
+    if progress:
+        expected = f" of {progress['expected']}" if progress["expected"] else ""
+        report += f"- Partial Report: {progress['evaluations']}{expected} conversations graded so far\n"
+    report += "\n"
 
     report += "## Statistical Metrics\n"
     report += f"- Student Talk Time: {aggregated_data['metrics']['student_talk_time']:.2%}\n"
     report += f"- Average Words per Turn: {aggregated_data['metrics']['average_words_per_turn']:.2f}\n"
-    report += f"- Average First-Mile Diagnostics Score: {aggregated_data['metrics']['average_first_mile_score']:.2f}\n"
-    report += f"- Average Retrieval Practice Score: {aggregated_data['metrics']['average_retrieval_score']:.2f}\n"
-    report += f"- Average Reflect & Revisit Score: {aggregated_data['metrics']['average_reflect_revisit_score']:.2f}\n"
-    report += f"- Average Interleaved Practice Score: {aggregated_data['metrics']['average_interleaved_practice_score']:.2f}\n"
-    report += f"- Average Guided Examples & Productive Struggle Score: {aggregated_data['metrics']['average_guided_examples_score']:.2f}\n"
-    report += f"- Average High-Quality Feedback Score: {aggregated_data['metrics']['average_high_quality_feedback_score']:.2f}\n"
-    report += f"- Average Socratic Reasoning Score: {aggregated_data['metrics']['average_socratic_reasoning_score']:.2f}\n"
-    report += f"- Average Misconception Diagnosis Score: {aggregated_data['metrics']['average_misconception_diagnosis_score']:.2f}\n"
-    report += f"- Average Motivation & Relevance Score: {aggregated_data['metrics']['average_motivation_relevance_score']:.2f}\n"
-    report += f"- Average Beliefs & Attributions Score: {aggregated_data['metrics']['average_beliefs_attributions_score']:.2f}\n"
+    for _, key, name in DIMENSIONS:
+        report += f"- Average {name} Score: {aggregated_data['metrics'][f'average_{key}_score']:.2f}\n"
+
+    intervals = aggregated_data.get("confidence_intervals")
+    if intervals and aggregated_data["num_evaluations"] > 1:
+        report += (
+            f"\n## Confidence Intervals ({aggregated_data['confidence']:.0%}, "
+            f"{aggregated_data.get('ci_method', 'bootstrap')})\n"
+        )
+        for field, (low, high) in intervals.items():
+            report += f"- {SCORE_NAMES[field]}: {low:.2f} – {high:.2f}\n"
+
+    for key, groups in (aggregated_data.get("groups") or {}).items():
+        report += f"\n## Results by {key.replace('_', ' ').title()}\n"
+        report += "| Group | N | Average Rating | Rating CI | Average Dimension Score |\n"
+        report += "|---|---|---|---|---|\n"
+        for group, summary in groups.items():
+            low, high = summary["ci"]["rating"]
+            dimension_scores = [
+                summary["means"][field] for field in SCORE_FIELDS if field != "rating"
+            ]
+            report += (
+                f"| {group} | {summary['n']} | {summary['means']['rating']:.2f} | "
+                f"{low:.2f} – {high:.2f} | "
+                f"{sum(dimension_scores) / len(dimension_scores):.2f} |\n"
+            )
+
+    missing_fields = aggregated_data.get("missing_fields")
+    repairs = aggregated_data.get("repairs")
+    if missing_fields or (repairs and repairs["calls"]):
+        report += "\n## Grader Output\n"
+        if repairs and repairs["calls"]:
+            report += f"- Repair Requests: {repairs['calls']}\n"
+            report += f"- Scores Repaired: {sum(repairs['fields'].values())}\n"
+            for field, count in sorted(repairs["fields"].items()):
+                report += f"- Repaired {field}: {count}\n"
+        if missing_fields:
+            report += "\nFields still missing, unparseable or out of range (missing scores count as 0, others are clamped):\n"
+            for field, count in sorted(missing_fields.items()):
+                report += f"- {field}: {count}\n"
+
+    sampling = aggregated_data.get("sampling")
+    if sampling and sampling["sampled_evaluations"]:
+        report += "\n## Grader Agreement\n"
+        report += f"- Average Gradings per Conversation: {sampling['average_samples']:.2f}\n"
+        report += f"- Conversations Graded More Than Once: {sampling['sampled_evaluations']}\n\n"
+        report += "| Score | Average Std Dev Across Gradings |\n"
+        report += "|---|---|\n"
+        for key, stddev in sampling["average_stddev"].items():
+            report += f"| {SCORE_NAMES.get(key, key)} | {stddev:.2f} |\n"
+
+    moderation = aggregated_data.get("moderation")
+    if moderation:
+        report += "\n## Moderation\n"
+        report += f"- Moderator Checks: {moderation['turns']}\n"
+        report += f"- Decided Locally: {moderation['local_decisions']}\n"
+        report += f"- Moderator Calls: {moderation['remote_calls']}\n"
+        report += f"- Moderator Calls Saved: {moderation['calls_saved']}\n"
+        if moderation["agreement_rate"] is not None:
+            report += f"- Agreement with Moderator Model: {moderation['agreement_rate']:.2%} ({moderation['audits']} audits)\n"
+        for reason, count in sorted(moderation["reasons"].items()):
+            report += f"- Local Stops ({reason}): {count}\n"
+
+    token_usage = aggregated_data.get("token_usage")
+    if token_usage:
+        report += "\n## Token Usage\n"
+        report += "| Role | Calls | Prompt Tokens | Completion Tokens | Avg Prompt Tokens per Call |\n"
+        report += "|---|---|---|---|---|\n"
+        for role, usage in token_usage.items():
+            report += (
+                f"| {role} | {usage['calls']} | {usage['prompt_tokens']} | "
+                f"{usage['completion_tokens']} | {usage['average_prompt_tokens']:.0f} |\n"
+            )
+
+    cost_latency = aggregated_data.get("cost_latency")
+    if cost_latency and cost_latency["calls"]:
+        report += "\n## Cost & Latency\n"
+        report += f"- Model Calls: {cost_latency['calls']}\n"
+        report += f"- Total Call Time: {cost_latency['latency_seconds']:.1f} s\n"
+        report += f"- Total Cost: {_format_cost(cost_latency['cost'])}\n\n"
+        report += "| Role | Calls | Errors | Cancelled | Retries | Call Time (s) | Share of Call Time | p50 Latency (s) | p95 Latency (s) | Cost |\n"
+        report += "|---|---|---|---|---|---|---|---|---|---|\n"
+        for role, stats in cost_latency["roles"].items():
+            report += (
+                f"| {role} | {stats['calls']} | {stats['errors']} | {stats['cancelled']} | "
+                f"{stats['retries']} | "
+                f"{stats['latency_seconds']:.1f} | {stats['latency_share']:.1%} | "
+                f"{stats['p50_latency_seconds']:.2f} | {stats['p95_latency_seconds']:.2f} | "
+                f"{_format_cost(stats['cost'])} |\n"
+            )
+        conversations = cost_latency["conversations"]
+        if conversations:
+            latencies = [c["latency_seconds"] for c in conversations.values()]
+            report += f"\n- Average Call Time per Conversation: {sum(latencies) / len(latencies):.1f} s\n"
+            costs = [c["cost"] for c in conversations.values() if c["cost"] is not None]
+            if costs:
+                report += f"- Average Cost per Conversation: {_format_cost(sum(costs) / len(costs))}\n"
+            slowest = max(conversations.items(), key=lambda item: item[1]["latency_seconds"])
+            report += f"- Slowest Conversation: {slowest[0]} ({slowest[1]['latency_seconds']:.1f} s)\n"
+
+    call_policy = aggregated_data.get("call_policy")
+    if call_policy:
+        report += "\n## Retries & Timeouts\n"
+        report += "| Role | Retries | Timeouts | Failed Calls | Circuit Opens | Paused (s) |\n"
+        report += "|---|---|---|---|---|---|\n"
+        for role, stats in call_policy.items():
+            report += (
+                f"| {role} | {stats['retries']} | {stats['timeouts']} | {stats['failures']} | "
+                f"{stats['circuit_opens']} | {stats['paused_seconds']:.1f} |\n"
+            )
+
+    telemetry = aggregated_data.get("telemetry")
+    if telemetry:
+        report += "\n## Telemetry\n"
+        report += f"- Sink: {telemetry['sink']}\n"
+        report += f"- Spans Exported: {telemetry['exported']} of {telemetry['emitted']}\n"
+        report += f"- Spans Dropped (queue full): {telemetry['dropped']}\n"
+        report += f"- Spans Lost (export failed): {telemetry['failed']}\n"
+        report += f"- Overhead per Call: {telemetry['emit_overhead_us']:.1f} µs\n"
+        report += f"- Export Time (background): {telemetry['export_seconds']:.2f} s\n"
+
+    streaming = aggregated_data.get("streaming")
+    if streaming:
+        report += "\n## Streaming\n"
+        report += "| Role | Calls | p50 Time to First Token (s) | p95 Time to First Token (s) | p50 Tokens/s | Cut Off |\n"
+        report += "|---|---|---|---|---|---|\n"
+        for role, stats in streaming.items():
+            report += (
+                f"| {role} | {stats['calls']} | {stats['p50_ttft_seconds']:.2f} | "
+                f"{stats['p95_ttft_seconds']:.2f} | {stats['p50_tokens_per_second']:.1f} | "
+                f"{stats['cut_off']} |\n"
+            )
+
+    hedging = aggregated_data.get("hedging")
+    if hedging:
+        report += "\n## Hedged Requests\n"
+        report += "| Role | Calls | Hedged | Hedge Rate | Hedge Wins | Hedge After (s) |\n"
+        report += "|---|---|---|---|---|---|\n"
+        for role, stats in hedging.items():
+            threshold = stats["threshold_seconds"]
+            report += (
+                f"| {role} | {stats['calls']} | {stats['hedged']} | {stats['hedge_rate']:.1%} | "
+                f"{stats['hedge_wins']} | {'n/a' if threshold is None else f'{threshold:.2f}'} |\n"
+            )
     return report
+
+
+def _format_cost(cost) -> str:
+    """
+    Formats a cost in dollars, or "n/a" when no prices are configured.
+    """
+    return "n/a" if cost is None else f"${cost:.4f}"
@@ -0,0 +1,246 @@
+import asyncio
+import random
+import time
+from typing import Any, Callable, Dict, Optional
+from src.clients import ClientWrapper
+from src.logger import get_logger
+from src.ratelimit import RateLimiter, estimate_tokens
+from src.usage import current_call
+
+logger = get_logger(__name__)
+
+# HTTP statuses worth retrying: timeouts, conflicts, rate limits and server errors
+RETRYABLE_STATUSES = {408, 409, 429}
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised when a role's circuit stays open past the deadline of a call.
+    """
+
+
+def error_status(error: BaseException) -> Optional[int]:
+    """
+    Returns the HTTP status of an API error, if it carries one.
+    """
+    status = getattr(error, "status_code", None) or getattr(error, "status", None)
+    return status if isinstance(status, int) else None
+
+
+def is_retryable(error: BaseException) -> bool:
+    """
+    Tells whether a failed call may succeed if tried again.
+    """
+    if isinstance(error, (asyncio.TimeoutError, ConnectionError)):
+        return True
+    status = error_status(error)
+    if status is not None:
+        return status in RETRYABLE_STATUSES or status >= 500
+    from openai import APIConnectionError
+
+    return isinstance(error, APIConnectionError)
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """
+    Returns the delay in seconds the server asked for before retrying, if any.
+    """
+    value = getattr(error, "retry_after", None)
+    if isinstance(value, (int, float)):
+        return float(value)
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        if headers.get("retry-after"):
+            return float(headers["retry-after"])
+    except ValueError:
+        pass
+    return None
+
+
+class RetryPolicy:
+    """
+    How a role's calls are timed out and retried.
+
+    Each attempt is cut off after `timeout` seconds, and a call is retried at
+    most `max_retries` times within an overall `deadline` (None for no limit).
+    The delay before retry n is drawn uniformly from [0, base_delay * 2^n],
+    capped at `max_delay` ("full jitter"), and is never shorter than the
+    Retry-After the server sent.
+    """
+
+    def __init__(
+        self,
+        timeout: Optional[float] = 120.0,
+        max_retries: int = 4,
+        deadline: Optional[float] = None,
+        base_delay: float = 0.5,
+        max_delay: float = 30.0,
+    ):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.deadline = deadline
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def backoff(self, retry: int, error: BaseException, rng: random.Random) -> float:
+        """
+        Returns the delay before the given retry (0-based) after an error.
+        """
+        delay = rng.uniform(0, min(self.max_delay, self.base_delay * 2**retry))
+        return max(delay, retry_after(error) or 0.0)
+
+
+class CircuitBreaker:
+    """
+    Pauses a role after `failure_threshold` consecutive failed calls.
+
+    While the circuit is open, calls wait out the `cooldown` instead of being
+    sent. Calls after the cooldown are trials: a failure opens the circuit
+    again straight away, a success closes it.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        cooldown: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.clock = clock
+        self.failures = 0
+        self.open_until = 0.0
+        self.opened = 0
+        self._trial = False
+
+    def wait_time(self) -> float:
+        """
+        Returns the number of seconds until the circuit lets calls through.
+        """
+        return max(0.0, self.open_until - self.clock())
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self._trial = False
+
+    def record_failure(self) -> None:
+        if self.wait_time() > 0:
+            return
+        self.failures += 1
+        if self._trial or self.failures >= self.failure_threshold:
+            self.open_until = self.clock() + self.cooldown
+            self.opened += 1
+            self.failures = 0
+            self._trial = True
+
+
+class RetryingClient(ClientWrapper):
+    """
+    Applies a RetryPolicy and a CircuitBreaker to the calls of one role.
+
+    With a `limiter`, every attempt is first admitted by the rate limiter. The
+    attempt timeout only starts once the call is admitted, so waiting for the
+    local quota never times out a call or counts against the circuit.
+
+    Retries are counted on the in-flight call record, so they show up in the
+    per-call usage records. `stats` tallies retries, attempt timeouts, circuit
+    openings and the time spent waiting on an open circuit.
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        policy: RetryPolicy,
+        breaker: Optional[CircuitBreaker] = None,
+        role: str = "",
+        seed: Optional[int] = None,
+        limiter: Optional[RateLimiter] = None,
+    ):
+        super().__init__(client)
+        self.policy = policy
+        self.limiter = limiter
+        self.breaker = breaker or CircuitBreaker()
+        self.role = role
+        self.random = random.Random(seed)
+        self.counts = {"retries": 0, "timeouts": 0, "failures": 0, "paused_seconds": 0.0}
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        return {**self.counts, "circuit_opens": self.breaker.opened}
+
+    async def _attempt(self, kwargs: Dict[str, Any], start: float) -> Any:
+        if self.limiter is not None:
+            estimated = estimate_tokens(kwargs)
+            await self.limiter.acquire(estimated)
+        timeout = self.policy.timeout
+        if self.policy.deadline is not None:
+            remaining = self.policy.deadline - (time.monotonic() - start)
+            timeout = remaining if timeout is None else min(timeout, remaining)
+        try:
+            response = await asyncio.wait_for(
+                self.client.chat.completions.create(**kwargs), timeout
+            )
+        except asyncio.TimeoutError:
+            self.counts["timeouts"] += 1
+            raise
+        if self.limiter is not None:
+            usage = getattr(response, "usage", None)
+            self.limiter.settle(estimated, getattr(usage, "total_tokens", None))
+        return response
+
+    async def create(self, **kwargs) -> Any:
+        start = time.monotonic()
+        deadline = self.policy.deadline
+        retry = 0
+        while True:
+            pause = self.breaker.wait_time()
+            if pause:
+                if deadline is not None and time.monotonic() - start + pause > deadline:
+                    raise CircuitOpenError(f"The {self.role} circuit is open")
+                self.counts["paused_seconds"] += pause
+                await asyncio.sleep(pause)
+            try:
+                response = await self._attempt(kwargs, start)
+            except Exception as e:
+                if not is_retryable(e):
+                    raise
+                self.breaker.record_failure()
+                delay = self.policy.backoff(retry, e, self.random)
+                elapsed = time.monotonic() - start
+                if retry >= self.policy.max_retries or (
+                    deadline is not None and elapsed + delay >= deadline
+                ):
+                    self.counts["failures"] += 1
+                    raise
+                retry += 1
+                self.counts["retries"] += 1
+                call = current_call.get()
+                if call is not None:
+                    call["retries"] += 1
+                logger.warning(
+                    f"{self.role} call failed ({e!r}), retry {retry} in {delay:.1f}s"
+                )
+                await asyncio.sleep(delay)
+                continue
+            self.breaker.record_success()
+            return response
+
+
+def with_retries(client: Any, role_config: Dict[str, Any], role: str = "") -> RetryingClient:
+    """
+    Wraps a client in the retry policy, circuit breaker and, if the role config
+    sets an RPM or TPM quota, the rate limiter of its role config.
+    """
+    policy = RetryPolicy()
+    if role_config.get("timeout") is not None:
+        policy.timeout = role_config["timeout"] or None
+    if role_config.get("max_retries") is not None:
+        policy.max_retries = role_config["max_retries"]
+    if role_config.get("deadline") is not None:
+        policy.deadline = role_config["deadline"] or None
+    limiter = None
+    if role_config.get("rpm") or role_config.get("tpm"):
+        limiter = RateLimiter(rpm=role_config.get("rpm"), tpm=role_config.get("tpm"))
+    return RetryingClient(client, policy, role=role, limiter=limiter)
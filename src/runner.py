@@ -0,0 +1,137 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from src.datastructures import Student, Scenario, Conversation, EvaluationResult
+from src.generator import conversation_id
+from src.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+async def run_grid(
+    students: List[Student],
+    scenarios: List[Scenario],
+    generate: Callable[[Student, Scenario], Awaitable[Conversation]],
+    concurrency: int = 1,
+    on_conversation: Optional[Callable[[Conversation], Awaitable[None]]] = None,
+) -> List[Conversation]:
+    """
+    Generates a conversation for every (student, scenario) cell concurrently.
+
+    At most `concurrency` conversations are in flight at once. A failing cell is
+    logged and skipped without aborting the others, and the returned conversations
+    keep the (student, scenario) order of the grid. If given, `on_conversation` is
+    awaited with each conversation as soon as it is generated.
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    cells: List[Tuple[Student, Scenario]] = [
+        (student, scenario) for student in students for scenario in scenarios
+    ]
+
+    async def run_cell(student: Student, scenario: Scenario) -> Conversation:
+        async with semaphore:
+            logger.info(
+                f"Generating conversation for student {student.id} and scenario {scenario.id}..."
+            )
+            conversation = await generate(student, scenario)
+        if on_conversation is not None:
+            await on_conversation(conversation)
+        return conversation
+
+    outcomes: List[Any] = await asyncio.gather(
+        *(run_cell(student, scenario) for student, scenario in cells),
+        return_exceptions=True,
+    )
+
+    conversations = []
+    for (student, scenario), outcome in zip(cells, outcomes):
+        if isinstance(outcome, BaseException):
+            if isinstance(outcome, (KeyboardInterrupt, SystemExit)):
+                raise outcome
+            logger.error(
+                f"Conversation for student {student.id} and scenario {scenario.id} failed: {outcome!r}"
+            )
+            continue
+        conversations.append(outcome)
+    return conversations
+
+
+async def run_pipeline(
+    students: List[Student],
+    scenarios: List[Scenario],
+    generate: Callable[[Student, Scenario], Awaitable[Conversation]],
+    evaluate: Callable[[Conversation], Awaitable[EvaluationResult]],
+    concurrency: int = 1,
+    grader_concurrency: int = 1,
+    queue_size: int = 0,
+    on_conversation: Optional[Callable[[Conversation], None]] = None,
+    on_evaluation: Optional[Callable[[EvaluationResult], None]] = None,
+    completed_conversations: Optional[List[Conversation]] = None,
+    completed_evaluations: Optional[List[EvaluationResult]] = None,
+) -> Tuple[List[Conversation], List[EvaluationResult]]:
+    """
+    Generates and grades the student x scenario grid as a streaming pipeline.
+
+    Every finished conversation is put on a bounded queue (`queue_size`, 0 means
+    one slot per grader worker) and graded by a pool of `grader_concurrency`
+    workers, so grading overlaps with generation. The callbacks are invoked as
+    soon as each conversation or evaluation is ready. A failed grading call is
+    logged and skipped. Both returned lists follow the grid order.
+
+    Conversations and evaluations from an interrupted run can be passed in as
+    `completed_conversations` and `completed_evaluations`: those cells are
+    neither generated nor graded again, and the callbacks are not invoked for them.
+    """
+    workers = max(1, grader_concurrency)
+    queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size or workers)
+    resumed = {c.id: c for c in completed_conversations or []}
+    evaluations: Dict[str, EvaluationResult] = {
+        e.conversation_id: e for e in completed_evaluations or []
+    }
+
+    async def generate_or_resume(student: Student, scenario: Scenario) -> Conversation:
+        conversation = resumed.get(conversation_id(student, scenario))
+        if conversation is not None:
+            return conversation
+        return await generate(student, scenario)
+
+    async def enqueue(conversation: Conversation) -> None:
+        if conversation.id not in resumed and on_conversation is not None:
+            on_conversation(conversation)
+        if conversation.id not in evaluations:
+            await queue.put(conversation)
+
+    async def grade() -> None:
+        while True:
+            conversation = await queue.get()
+            try:
+                if conversation is None:
+                    return
+                logger.info(f"Evaluating conversation {conversation.id}...")
+                result = await evaluate(conversation)
+                evaluations[conversation.id] = result
+                if on_evaluation is not None:
+                    on_evaluation(result)
+            except Exception as e:
+                logger.error(f"Evaluation of conversation {conversation.id} failed: {e!r}")
+            finally:
+                queue.task_done()
+
+    grader_tasks = [asyncio.create_task(grade()) for _ in range(workers)]
+    try:
+        conversations = await run_grid(
+            students,
+            scenarios,
+            generate_or_resume,
+            concurrency=concurrency,
+            on_conversation=enqueue,
+        )
+        for _ in grader_tasks:
+            await queue.put(None)
+        await asyncio.gather(*grader_tasks)
+    finally:
+        for task in grader_tasks:
+            task.cancel()
+
+    return conversations, [
+        evaluations[c.id] for c in conversations if c.id in evaluations
+    ]
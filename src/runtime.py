@@ -0,0 +1,152 @@
+from typing import Any, Dict, Optional, Sequence, Tuple
+from src.config import load_config
+from src.hedging import HedgedClient
+from src.retry import with_retries
+from src.streaming import StreamingClient
+from src.telemetry import SpanExporter, TelemetryClient, make_exporter
+
+ROLES = ("student", "teacher", "grader", "moderator")
+# Roles whose turns are streamed with `stream`
+STREAMED_ROLES = ("teacher", "student")
+
+
+class RunContext:
+    """
+    The configuration and model clients of a benchmark run.
+
+    Each run builds its own context and closes it with `aclose` when it ends,
+    since the HTTP connection pool is bound to the run's event loop.
+    """
+
+    def __init__(
+        self,
+        config: Dict[str, Any],
+        clients: Dict[str, Any],
+        http_client: Any = None,
+        exporter: Optional[SpanExporter] = None,
+        streaming_clients: Optional[Dict[str, StreamingClient]] = None,
+        hedged_clients: Optional[Dict[str, HedgedClient]] = None,
+    ):
+        self.config = config
+        self.clients = clients
+        self.http_client = http_client
+        self.exporter = exporter
+        self.streaming_clients = streaming_clients or {}
+        self.hedged_clients = hedged_clients or {}
+
+    def model_name(self, role: str) -> str:
+        return self.config[role]["model"] or ""
+
+    def cache_salt(self, role: str) -> Optional[Dict[str, Any]]:
+        """
+        Returns the client-side settings that shape a role's replies, to keep
+        them apart in the response cache.
+        """
+        streaming = self.streaming_clients.get(role)
+        return streaming.cutoff if streaming is not None else None
+
+    async def aclose(self) -> None:
+        """
+        Exports the remaining spans and closes the HTTP connection pool.
+        """
+        if self.exporter is not None:
+            self.exporter.close()
+        if self.http_client is not None:
+            await self.http_client.aclose()
+
+
+def connection_limit(concurrency: int, grader_concurrency: int, grader_fanout: int = 1) -> int:
+    """
+    Returns the connection pool size for a run: up to two calls per conversation
+    in flight (a speculative teacher turn alongside the moderator) plus the
+    concurrent calls of every grader worker.
+    """
+    return 2 * concurrency + grader_fanout * grader_concurrency
+
+
+def build_run_context(
+    env_file: str = ".eduenv",
+    max_connections: Optional[int] = None,
+    keepalive_expiry: float = 60.0,
+    http2: bool = False,
+    telemetry: str = "remote",
+    telemetry_path: str = "spans.jsonl",
+    resume: bool = False,
+    stream: bool = False,
+    max_turn_chars: Optional[int] = None,
+    stop_sequences: Sequence[str] = (),
+    hedge: Sequence[str] = (),
+    hedge_percentile: float = 95.0,
+    hedge_ratio: float = 0.1,
+) -> RunContext:
+    """
+    Loads the configuration and builds one rate-limited client per role, with
+    the retry policy and circuit breaker of that role. The SDK's own retries are
+    turned off, and every attempt, retries included, waits for the rate limiter.
+
+    Roles with the same base URL and API key share one OpenAI client, and all
+    clients share one HTTP connection pool of `max_connections` connections
+    (the SDK default when None), kept alive for `keepalive_expiry` seconds.
+    `http2` needs the `h2` package.
+
+    Every call is traced to the `telemetry` sink: "remote" (Braintrust), "local"
+    (the JSONL file `telemetry_path`, appended to with `resume`) or "off".
+    Spans are exported from a background thread, off the calls' path.
+
+    With `stream`, teacher and student calls are streamed and assembled right
+    above the OpenAI client, cut off at `max_turn_chars` characters or one of
+    `stop_sequences`, so timeouts, retries and spans cover the whole reply.
+
+    Attempts of the roles in `hedge` are hedged below the retry layer, once they
+    are admitted by the rate limiter, so neither limiter waits nor retry backoff
+    count towards the hedge threshold or trigger a duplicate request.
+
+    The OpenAI package is only imported here, so that importing the CLI stays
+    cheap and works without credentials.
+    """
+    from openai import DEFAULT_CONNECTION_LIMITS, AsyncOpenAI, DefaultAsyncHttpxClient
+
+    config = load_config(env_file)
+    exporter = make_exporter(
+        telemetry, config["braintrust"]["api_key"], telemetry_path, resume=resume
+    )
+
+    # The SDK's HTTP client with its default timeouts, and pool limits for this run
+    limits = type(DEFAULT_CONNECTION_LIMITS)(
+        max_connections=max_connections or DEFAULT_CONNECTION_LIMITS.max_connections,
+        max_keepalive_connections=(
+            max_connections or DEFAULT_CONNECTION_LIMITS.max_keepalive_connections
+        ),
+        keepalive_expiry=keepalive_expiry,
+    )
+    http_client = DefaultAsyncHttpxClient(limits=limits, http2=http2)
+
+    openai_clients: Dict[Tuple[Optional[str], Optional[str]], Any] = {}
+    clients = {}
+    streaming_clients = {}
+    hedged_clients = {}
+    for role in ROLES:
+        key = (config[role]["base_url"], config[role]["api_key"])
+        if key not in openai_clients:
+            openai_clients[key] = AsyncOpenAI(
+                api_key=config[role]["api_key"],
+                base_url=config[role]["base_url"],
+                max_retries=0,
+                http_client=http_client,
+            )
+        client = openai_clients[key]
+        if stream and role in STREAMED_ROLES:
+            client = streaming_clients[role] = StreamingClient(
+                client, max_chars=max_turn_chars, stop=stop_sequences
+            )
+        if exporter is not None:
+            client = TelemetryClient(client, exporter, role)
+        if role in hedge:
+            client = hedged_clients[role] = HedgedClient(
+                client, quantile=hedge_percentile, max_ratio=hedge_ratio
+            )
+        clients[role] = with_retries(client, config[role], role)
+    return RunContext(
+        config, clients, http_client, exporter, streaming_clients, hedged_clients
+    )
+
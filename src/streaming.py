@@ -0,0 +1,133 @@
+import inspect
+import time
+from typing import Any, Dict, List, Optional, Sequence
+from src.clients import ClientWrapper
+from src.ratelimit import CHARS_PER_TOKEN
+from src.usage import percentile
+
+
+def _cut(text: str, max_chars: Optional[int], stop: Sequence[str]):
+    """
+    Returns the text up to the first stop sequence or `max_chars` characters,
+    and the finish reason if it was cut.
+    """
+    cut, reason = len(text), None
+    for sequence in stop:
+        index = text.find(sequence)
+        if index != -1 and index < cut:
+            cut, reason = index, "stop"
+    if max_chars is not None and max_chars < cut:
+        cut, reason = max_chars, "length"
+    return text[:cut], reason
+
+
+class StreamingClient(ClientWrapper):
+    """
+    Requests completions as streams and assembles them into ordinary responses.
+
+    Callers see the same ChatCompletion as without streaming, so transcripts do
+    not change, while the client measures the time to the first token and the
+    generation speed of every call. A reply is cut off on the client side once
+    it reaches `max_chars` characters or one of the `stop` sequences (which is
+    not included), and the rest of the stream is abandoned.
+    """
+
+    def __init__(
+        self,
+        client: Any,
+        max_chars: Optional[int] = None,
+        stop: Sequence[str] = (),
+    ):
+        super().__init__(client)
+        self.max_chars = max_chars
+        self.stop = list(stop)
+        self.ttft: List[float] = []
+        self.tokens_per_second: List[float] = []
+        self.calls = 0
+        self.cut_off = 0
+
+    @property
+    def cutoff(self) -> Optional[Dict[str, Any]]:
+        """
+        The client-side cutoff settings, or None when replies are never cut.
+        """
+        if self.max_chars is None and not self.stop:
+            return None
+        return {"max_chars": self.max_chars, "stop": self.stop}
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "p50_ttft_seconds": percentile(self.ttft, 50),
+            "p95_ttft_seconds": percentile(self.ttft, 95),
+            "p50_tokens_per_second": percentile(self.tokens_per_second, 50),
+            "cut_off": self.cut_off,
+        }
+
+    async def create(self, **kwargs) -> Any:
+        from openai.types.chat import ChatCompletion
+
+        start = time.perf_counter()
+        stream = await self.client.chat.completions.create(
+            **kwargs, stream=True, stream_options={"include_usage": True}
+        )
+        self.calls += 1
+        parts: List[str] = []
+        first_token: Optional[float] = None
+        finish_reason = "stop"
+        chunk = None
+        usage = None
+        try:
+            async for chunk in stream:
+                if chunk.usage is not None:
+                    usage = chunk.usage
+                if not chunk.choices:
+                    continue
+                choice = chunk.choices[0]
+                if choice.delta.content:
+                    if first_token is None:
+                        first_token = time.perf_counter()
+                    parts.append(choice.delta.content)
+                    if self.max_chars is not None or self.stop:
+                        text, reason = _cut("".join(parts), self.max_chars, self.stop)
+                        if reason is not None:
+                            parts, finish_reason = [text], reason
+                            self.cut_off += 1
+                            break
+                if choice.finish_reason:
+                    finish_reason = choice.finish_reason
+        finally:
+            # Stop receiving a reply that was cut off
+            close = getattr(stream, "close", None)
+            if close is not None and inspect.isawaitable(closing := close()):
+                await closing
+        end = time.perf_counter()
+
+        content = "".join(parts)
+        if first_token is not None:
+            self.ttft.append(first_token - start)
+            # A reply that was cut off has no final usage chunk
+            tokens = (
+                usage.completion_tokens
+                if usage is not None
+                else len(content) // CHARS_PER_TOKEN + 1
+            )
+            if end > first_token:
+                self.tokens_per_second.append(tokens / (end - first_token))
+        return ChatCompletion.model_validate(
+            {
+                "id": getattr(chunk, "id", None) or "chatcmpl-stream",
+                "object": "chat.completion",
+                "created": getattr(chunk, "created", None) or int(time.time()),
+                "model": getattr(chunk, "model", None) or kwargs.get("model") or "",
+                "choices": [
+                    {
+                        "index": 0,
+                        "finish_reason": finish_reason,
+                        "message": {"role": "assistant", "content": content},
+                    }
+                ],
+                "usage": usage.model_dump() if usage is not None else None,
+            }
+        )
@@ -0,0 +1,237 @@
+import json
+import queue
+import threading
+import time
+from typing import Any, Dict, List, Optional
+from src.clients import ClientWrapper
+from src.logger import get_logger
+from src.usage import current_conversation
+
+logger = get_logger(__name__)
+
+TELEMETRY_SINKS = ("remote", "local", "off")
+
+
+class JsonlSink:
+    """
+    Writes spans to a local JSONL file, replacing it unless `resume` is set, in
+    which case the spans are appended to those of the interrupted run.
+    """
+
+    def __init__(self, file_path: str, resume: bool = False):
+        self.file_path = file_path
+        self.resume = resume
+        self._file = None
+
+    def export(self, spans: List[Dict[str, Any]]) -> None:
+        if self._file is None:
+            self._file = open(self.file_path, "a" if self.resume else "w")
+        self._file.write("".join(json.dumps(span) + "\n" for span in spans))
+        self._file.flush()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class BraintrustSink:
+    """
+    Logs spans to the EduBench project in Braintrust.
+
+    The Braintrust package is imported and the logger initialized on the first
+    export, i.e. on the exporter's thread, so a slow or unreachable backend never
+    holds up the run.
+    """
+
+    def __init__(self, api_key: Optional[str]):
+        self.api_key = api_key
+        self._logger = None
+
+    def export(self, spans: List[Dict[str, Any]]) -> None:
+        if self._logger is None:
+            import braintrust
+
+            self._logger = braintrust.init_logger(project="EduBench", api_key=self.api_key)
+        for span in spans:
+            self._logger.log(
+                input=span["input"],
+                output=span["output"],
+                error=span["error"],
+                metadata={
+                    "role": span["role"],
+                    "model": span["model"],
+                    "conversation_id": span["conversation_id"],
+                },
+                metrics={
+                    name: span[name]
+                    for name in ("start", "end", "prompt_tokens", "completion_tokens")
+                    if span[name] is not None
+                },
+            )
+
+    def close(self) -> None:
+        if self._logger is not None:
+            self._logger.flush()
+
+
+class SpanExporter:
+    """
+    Exports spans from a background thread, in batches.
+
+    `emit` only puts a span on a bounded queue, so callers never wait for the
+    sink; when the queue is full the span is dropped and counted. The exporter
+    thread writes up to `batch_size` spans at a time to the sink, at least every
+    `flush_interval` seconds. A failing sink is logged and its batch counted as
+    lost. `stats` reports the spans emitted, exported and dropped, and the time
+    spent emitting on the callers' side, i.e. the overhead on the calls.
+    """
+
+    def __init__(
+        self,
+        sink: Any,
+        max_queue: int = 10000,
+        batch_size: int = 100,
+        flush_interval: float = 1.0,
+    ):
+        self.sink = sink
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue[Optional[Dict[str, Any]]]" = queue.Queue(maxsize=max_queue)
+        self.counts = {
+            "emitted": 0,
+            "exported": 0,
+            "dropped": 0,
+            "failed": 0,
+            "batches": 0,
+            "emit_seconds": 0.0,
+            "export_seconds": 0.0,
+        }
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="span-exporter", daemon=True)
+        self._thread.start()
+
+    @property
+    def stats(self) -> Dict[str, Any]:
+        emitted = self.counts["emitted"]
+        return {
+            **self.counts,
+            "emit_overhead_us": self.counts["emit_seconds"] / emitted * 1e6 if emitted else 0.0,
+        }
+
+    def emit(self, span: Dict[str, Any]) -> None:
+        """
+        Queues a span for export without blocking.
+        """
+        start = time.perf_counter()
+        self.counts["emitted"] += 1
+        try:
+            if self._closed:
+                raise queue.Full
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.counts["dropped"] += 1
+        self.counts["emit_seconds"] += time.perf_counter() - start
+
+    def _export(self, batch: List[Dict[str, Any]]) -> None:
+        start = time.perf_counter()
+        try:
+            self.sink.export(batch)
+            self.counts["exported"] += len(batch)
+        except Exception as e:
+            self.counts["failed"] += len(batch)
+            logger.warning(f"Exporting {len(batch)} spans failed: {e!r}")
+        self.counts["batches"] += 1
+        self.counts["export_seconds"] += time.perf_counter() - start
+
+    def _run(self) -> None:
+        batch: List[Dict[str, Any]] = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            try:
+                span = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+            except queue.Empty:
+                pass
+            else:
+                if span is None:
+                    break
+                batch.append(span)
+            if len(batch) >= self.batch_size or time.monotonic() >= deadline:
+                if batch:
+                    self._export(batch)
+                    batch = []
+                deadline = time.monotonic() + self.flush_interval
+        if batch:
+            self._export(batch)
+
+    def close(self) -> None:
+        """
+        Exports the queued spans and stops the exporter thread.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+        try:
+            self.sink.close()
+        except Exception as e:
+            logger.warning(f"Closing the span sink failed: {e!r}")
+
+
+class TelemetryClient(ClientWrapper):
+    """
+    Emits a span for every completion call of a role to a SpanExporter.
+    """
+
+    def __init__(self, client: Any, exporter: SpanExporter, role: str):
+        super().__init__(client)
+        self.exporter = exporter
+        self.role = role
+
+    async def create(self, **kwargs) -> Any:
+        start = time.time()
+        response = None
+        error = None
+        try:
+            response = await self.client.chat.completions.create(**kwargs)
+            return response
+        except BaseException as e:
+            error = repr(e)
+            raise
+        finally:
+            usage = getattr(response, "usage", None)
+            choices = getattr(response, "choices", None)
+            self.exporter.emit(
+                {
+                    "role": self.role,
+                    "model": kwargs.get("model"),
+                    "conversation_id": current_conversation.get(),
+                    "start": start,
+                    "end": time.time(),
+                    "input": kwargs.get("messages"),
+                    "output": choices[0].message.content if choices else None,
+                    "prompt_tokens": getattr(usage, "prompt_tokens", None),
+                    "completion_tokens": getattr(usage, "completion_tokens", None),
+                    "error": error,
+                }
+            )
+
+
+def make_exporter(
+    sink: str,
+    api_key: Optional[str] = None,
+    file_path: str = "spans.jsonl",
+    resume: bool = False,
+) -> Optional[SpanExporter]:
+    """
+    Returns an exporter for a sink name ("remote", "local" or "off"), or None
+    when telemetry is off. With `resume`, the local sink appends to its file.
+    """
+    if sink == "off":
+        return None
+    if sink == "remote":
+        return SpanExporter(BraintrustSink(api_key))
+    if sink == "local":
+        return SpanExporter(JsonlSink(file_path, resume=resume))
+    raise ValueError(f"Unknown telemetry sink: {sink}")
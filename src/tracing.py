@@ -0,0 +1,122 @@
+import asyncio
+import json
+import os
+import time
+import weakref
+from contextlib import contextmanager, nullcontext
+from typing import Any, Awaitable, Dict, Iterator, List, Optional
+
+# Returned by `span` while tracing is off, so disabled spans cost a global lookup
+_DISABLED = nullcontext()
+
+_tracer: Optional["Tracer"] = None
+
+
+class Tracer:
+    """
+    Collects timed spans as Chrome trace events.
+
+    Every asyncio task gets its own track, so overlapping conversations and
+    grader calls show up side by side. The trace opens in Perfetto
+    (ui.perfetto.dev) or chrome://tracing.
+    """
+
+    def __init__(self):
+        self.events: List[Dict[str, Any]] = []
+        self._start = time.perf_counter_ns()
+        self._pid = os.getpid()
+        self._tracks: "weakref.WeakKeyDictionary[asyncio.Task, int]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._next_track = 1
+        self._metadata("process_name", 0, "edubench")
+        self._metadata("thread_name", 0, "main")
+
+    def _metadata(self, name: str, tid: int, value: str) -> None:
+        self.events.append(
+            {"name": name, "ph": "M", "pid": self._pid, "tid": tid, "args": {"name": value}}
+        )
+
+    def _track(self) -> int:
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            task = None
+        if task is None:
+            return 0
+        tid = self._tracks.get(task)
+        if tid is None:
+            tid = self._next_track
+            self._next_track += 1
+            self._tracks[task] = tid
+            self._metadata("thread_name", tid, task.get_name())
+        return tid
+
+    def _now(self) -> float:
+        return (time.perf_counter_ns() - self._start) / 1000
+
+    @contextmanager
+    def span(self, name: str, category: str, args: Dict[str, Any]) -> Iterator[None]:
+        """
+        Records the time spent in the block as a complete ("X") event.
+        """
+        tid = self._track()
+        start = self._now()
+        try:
+            yield
+        finally:
+            self.events.append(
+                {
+                    "name": name,
+                    "cat": category,
+                    "ph": "X",
+                    "ts": start,
+                    "dur": self._now() - start,
+                    "pid": self._pid,
+                    "tid": tid,
+                    "args": args,
+                }
+            )
+
+    def write(self, file_path: str) -> None:
+        """
+        Saves the trace as a trace-event JSON file.
+        """
+        with open(file_path, "w") as f:
+            json.dump({"traceEvents": self.events, "displayTimeUnit": "ms"}, f)
+
+
+def start_tracing() -> Tracer:
+    """
+    Starts collecting spans and returns the tracer.
+    """
+    global _tracer
+    _tracer = Tracer()
+    return _tracer
+
+
+def stop_tracing() -> Optional[Tracer]:
+    """
+    Stops collecting spans and returns the tracer, if tracing was on.
+    """
+    global _tracer
+    tracer, _tracer = _tracer, None
+    return tracer
+
+
+def span(name: str, category: str = "stage", **args: Any):
+    """
+    Returns a context manager timing a stage, or a no-op one when tracing is off.
+    """
+    tracer = _tracer
+    if tracer is None:
+        return _DISABLED
+    return tracer.span(name, category, args)
+
+
+async def traced(name: str, awaitable: Awaitable, category: str = "stage", **args: Any) -> Any:
+    """
+    Awaits an awaitable inside a span, e.g. to trace a coroutine run as its own task.
+    """
+    with span(name, category, **args):
+        return await awaitable
@@ -0,0 +1,288 @@
+import asyncio
+import json
+import math
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from src.clients import ClientWrapper
+from src.ratelimit import CHARS_PER_TOKEN
+
+# The conversation the calls of the current task belong to
+current_conversation: ContextVar[Optional[str]] = ContextVar(
+    "current_conversation", default=None
+)
+# The in-flight call record, so inner client layers can annotate it (e.g. retries)
+current_call: ContextVar[Optional[Dict[str, Any]]] = ContextVar(
+    "current_call", default=None
+)
+
+
+@contextmanager
+def conversation_scope(conversation_id: str) -> Iterator[None]:
+    """
+    Attributes the model calls made inside the block to a conversation.
+    """
+    token = current_conversation.set(conversation_id)
+    try:
+        yield
+    finally:
+        current_conversation.reset(token)
+
+
+def percentile(values: List[float], q: float) -> float:
+    """
+    Returns the q-th percentile (0-100) of a list using the nearest-rank method.
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = min(len(ordered), max(1, math.ceil(q / 100 * len(ordered))))
+    return ordered[rank - 1]
+
+
+def _get_usage(response: Any, name: str) -> Optional[int]:
+    value = getattr(getattr(response, "usage", None), name, None)
+    return value if isinstance(value, int) else None
+
+
+class TokenUsage:
+    """
+    Records every model call and tallies calls and token usage per role.
+
+    Token counts come from the `usage` of each response. When a response carries
+    no usage, the prompt size is estimated from its characters instead. Each
+    call is kept with its role, model, latency, retries, hedged duplicate
+    requests, cost and conversation id and, when `calls_path` is set, appended
+    to that JSONL file. Calls that were cancelled, such as a discarded
+    speculative teacher turn, are kept without tokens or cost and are left out
+    of the latencies. With `resume`, the calls already in the file are loaded
+    and kept.
+
+    `prices` maps a role to its (input, output) price per million tokens; roles
+    without prices have no cost.
+    """
+
+    def __init__(
+        self,
+        prices: Optional[Dict[str, Tuple[Optional[float], Optional[float]]]] = None,
+        calls_path: Optional[str] = None,
+        resume: bool = False,
+    ):
+        self.prices = prices or {}
+        self.roles: Dict[str, Dict[str, int]] = {}
+        self.calls: List[Dict[str, Any]] = []
+        self._file = None
+        if calls_path:
+            if resume and os.path.exists(calls_path):
+                with open(calls_path) as f:
+                    for line in f:
+                        try:
+                            self._tally(json.loads(line))
+                        except (ValueError, KeyError, TypeError):
+                            continue
+            self._file = open(calls_path, "a" if resume else "w")
+
+    def cost(self, role: str, prompt_tokens: int, completion_tokens: int) -> Optional[float]:
+        """
+        Returns the cost of a call, or None if the role has no prices.
+        """
+        input_price, output_price = self.prices.get(role, (None, None))
+        if input_price is None and output_price is None:
+            return None
+        return (
+            prompt_tokens * (input_price or 0.0) + completion_tokens * (output_price or 0.0)
+        ) / 1e6
+
+    def record(
+        self,
+        role: str,
+        request: Dict[str, Any],
+        response: Any,
+        latency: float = 0.0,
+        retries: int = 0,
+        error: Optional[str] = None,
+        cancelled: bool = False,
+        hedges: int = 0,
+    ) -> Dict[str, Any]:
+        """
+        Records a call and returns its record. `response` is None for failed and
+        cancelled calls, which are recorded with no tokens.
+        """
+        prompt_tokens = _get_usage(response, "prompt_tokens")
+        completion_tokens = _get_usage(response, "completion_tokens") or 0
+        details = getattr(getattr(response, "usage", None), "prompt_tokens_details", None)
+        cached_tokens = getattr(details, "cached_tokens", None)
+        # Failed and cancelled calls are not billed
+        estimated = prompt_tokens is None and error is None and not cancelled
+        if error is not None or cancelled:
+            prompt_tokens = 0
+        elif estimated:
+            prompt_tokens = sum(
+                len(message.get("content") or "")
+                for message in request.get("messages", [])
+            ) // CHARS_PER_TOKEN
+        call = {
+            "timestamp": time.time(),
+            "role": role,
+            "model": request.get("model"),
+            "conversation_id": current_conversation.get(),
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "cached_tokens": cached_tokens if isinstance(cached_tokens, int) else 0,
+            "estimated": estimated,
+            "latency_seconds": latency,
+            "retries": retries,
+            "hedges": hedges,
+            "cost": None if cancelled else self.cost(role, prompt_tokens, completion_tokens),
+            "error": error,
+            "cancelled": cancelled,
+        }
+        self._tally(call)
+        if self._file is not None:
+            self._file.write(json.dumps(call) + "\n")
+            self._file.flush()
+        return call
+
+    def _tally(self, call: Dict[str, Any]) -> None:
+        totals = self.roles.setdefault(
+            call["role"],
+            {
+                "calls": 0,
+                "prompt_tokens": 0,
+                "completion_tokens": 0,
+                "cached_tokens": 0,
+                "estimated_calls": 0,
+            },
+        )
+        totals["calls"] += 1
+        totals["prompt_tokens"] += call["prompt_tokens"]
+        totals["completion_tokens"] += call["completion_tokens"]
+        totals["cached_tokens"] += call["cached_tokens"]
+        totals["estimated_calls"] += int(call["estimated"])
+        self.calls.append(call)
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Returns the per-role totals with the average prompt size per call.
+        """
+        return {
+            role: {
+                **totals,
+                "average_prompt_tokens": totals["prompt_tokens"] / totals["calls"],
+            }
+            for role, totals in self.roles.items()
+        }
+
+    def cost_latency(self) -> Dict[str, Any]:
+        """
+        Returns latency, retry and cost rollups per role and per conversation.
+        """
+        finished = [call for call in self.calls if not call.get("cancelled", False)]
+        total_latency = sum(call["latency_seconds"] for call in finished)
+        costs = [call["cost"] for call in self.calls if call["cost"] is not None]
+
+        roles: Dict[str, Dict[str, Any]] = {}
+        for role in self.roles:
+            calls = [call for call in self.calls if call["role"] == role]
+            latencies = [call["latency_seconds"] for call in finished if call["role"] == role]
+            role_costs = [call["cost"] for call in calls if call["cost"] is not None]
+            roles[role] = {
+                "calls": len(calls),
+                "errors": sum(1 for call in calls if call["error"]),
+                "cancelled": sum(1 for call in calls if call.get("cancelled", False)),
+                "retries": sum(call["retries"] for call in calls),
+                "latency_seconds": sum(latencies),
+                "latency_share": sum(latencies) / total_latency if total_latency else 0.0,
+                "p50_latency_seconds": percentile(latencies, 50),
+                "p95_latency_seconds": percentile(latencies, 95),
+                "cost": sum(role_costs) if role_costs else None,
+            }
+
+        conversations: Dict[str, Dict[str, Any]] = {}
+        for call in finished:
+            if call["conversation_id"] is None:
+                continue
+            totals = conversations.setdefault(
+                call["conversation_id"],
+                {
+                    "calls": 0,
+                    "prompt_tokens": 0,
+                    "completion_tokens": 0,
+                    "latency_seconds": 0.0,
+                    "cost": None,
+                },
+            )
+            totals["calls"] += 1
+            totals["prompt_tokens"] += call["prompt_tokens"]
+            totals["completion_tokens"] += call["completion_tokens"]
+            totals["latency_seconds"] += call["latency_seconds"]
+            if call["cost"] is not None:
+                totals["cost"] = (totals["cost"] or 0.0) + call["cost"]
+
+        return {
+            "calls": len(self.calls),
+            "latency_seconds": total_latency,
+            "cost": sum(costs) if costs else None,
+            "roles": roles,
+            "conversations": conversations,
+        }
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class UsageTrackingClient(ClientWrapper):
+    """
+    Records the token usage, latency and outcome of every completion call under a role.
+
+    A call cancelled by the caller is recorded as cancelled rather than failed.
+    """
+
+    def __init__(self, client: Any, usage: TokenUsage, role: str):
+        super().__init__(client)
+        self.usage = usage
+        self.role = role
+
+    async def create(self, **kwargs) -> Any:
+        call = {"retries": 0, "hedges": 0}
+        token = current_call.set(call)
+        start = time.perf_counter()
+        try:
+            response = await self.client.chat.completions.create(**kwargs)
+        except asyncio.CancelledError:
+            self.usage.record(
+                self.role,
+                kwargs,
+                None,
+                latency=time.perf_counter() - start,
+                retries=call["retries"],
+                hedges=call["hedges"],
+                cancelled=True,
+            )
+            raise
+        except BaseException as e:
+            self.usage.record(
+                self.role,
+                kwargs,
+                None,
+                latency=time.perf_counter() - start,
+                retries=call["retries"],
+                hedges=call["hedges"],
+                error=type(e).__name__,
+            )
+            raise
+        finally:
+            current_call.reset(token)
+        self.usage.record(
+            self.role,
+            kwargs,
+            response,
+            latency=time.perf_counter() - start,
+            retries=call["retries"],
+            hedges=call["hedges"],
+        )
+        return response
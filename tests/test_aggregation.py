@@ -0,0 +1,143 @@
+import time
+import unittest
+import numpy as np
+from src.aggregation import (
+    SCORE_FIELDS,
+    OnlineAggregator,
+    ResultTable,
+    RunningStats,
+    aggregate_groups,
+)
+from src.datastructures import EvaluationResult, Scenario
+from src.reporting import aggregate_results
+from src.scenarios import load_all_scenarios
+
+
+def result(i, rating, student="s1", scenario="fractions", **scores):
+    return EvaluationResult(
+        conversation_id=f"c{i}",
+        student=student,
+        scenario=scenario,
+        rating=rating,
+        reasoning="",
+        **scores,
+    )
+
+
+class TestAggregation(unittest.TestCase):
+    def setUp(self):
+        self.scenarios = {
+            "fractions": Scenario(
+                id="fractions", subject="math", grade_band=5, initial_message="Hi"
+            ),
+            "evolution": Scenario(
+                id="evolution", subject="biology", grade_band=9, initial_message="Hi"
+            ),
+        }
+        self.results = [
+            result(0, 8.0, "s1", "fractions", first_mile_score=4.0),
+            result(1, 6.0, "s2", "fractions", first_mile_score=2.0),
+            result(2, 4.0, "s1", "evolution", first_mile_score=1.0),
+            result(3, 2.0, "s2", "evolution"),
+        ]
+
+    def test_columns_follow_evaluation_fields(self):
+        table = ResultTable.from_results(self.results, self.scenarios)
+        self.assertEqual(table.scores.shape, (len(SCORE_FIELDS), 4))
+        means = table.means()
+        self.assertEqual(means["rating"], 5.0)
+        self.assertEqual(means["first_mile_score"], 1.75)
+        self.assertEqual(list(table.labels["subject"]), ["math", "math", "biology", "biology"])
+
+    def test_group_by(self):
+        table = ResultTable.from_results(self.results, self.scenarios)
+        groups = aggregate_groups(table, resamples=200)
+        self.assertEqual(set(groups), {"student", "scenario", "subject", "grade_band"})
+        self.assertEqual(groups["subject"]["math"]["means"]["rating"], 7.0)
+        self.assertEqual(groups["grade_band"]["9"]["n"], 2)
+        self.assertEqual(groups["student"]["s1"]["means"]["first_mile_score"], 2.5)
+
+    def test_grade_bands_of_the_scenario_files(self):
+        scenarios = {s.id: s for s in load_all_scenarios("data/scenarios")}
+        results = [
+            result(i, 5.0 + i, "s1", scenario_id)
+            for i, scenario_id in enumerate(sorted(scenarios))
+        ]
+        groups = aggregate_groups(ResultTable.from_results(results, scenarios), resamples=50)
+        self.assertEqual(set(groups["grade_band"]), {"3-5", "9-10"})
+        self.assertEqual(groups["grade_band"]["9-10"]["n"], 3)
+
+        online = OnlineAggregator(scenarios)
+        for evaluation in results:
+            online.add(evaluation)
+        self.assertEqual(set(online.snapshot()["groups"]["grade_band"]), {"3-5", "9-10"})
+
+    def test_bootstrap_ci_covers_the_mean(self):
+        rng = np.random.default_rng(1)
+        results = [
+            result(i, float(rating), first_mile_score=float(rating % 6))
+            for i, rating in enumerate(rng.integers(1, 11, size=2000))
+        ]
+        table = ResultTable.from_results(results)
+        intervals = table.bootstrap_ci(resamples=500, seed=0)
+        means = table.means()
+        for field in ("rating", "first_mile_score"):
+            low, high = intervals[field]
+            self.assertLess(low, means[field])
+            self.assertGreater(high, means[field])
+            # The standard error of a 1-10 uniform mean over 2000 results is ~0.064
+            self.assertLess(high - low, 0.5)
+        # Fields without variation have a degenerate interval
+        self.assertEqual(intervals["retrieval_score"], (0.0, 0.0))
+
+    def test_concat(self):
+        table = ResultTable.from_results(self.results, self.scenarios)
+        combined = ResultTable.concat([table, table])
+        self.assertEqual(len(combined), 8)
+        self.assertEqual(combined.means()["rating"], 5.0)
+
+    def test_large_tables_aggregate_quickly(self):
+        table = ResultTable(
+            np.random.default_rng(0).integers(0, 6, size=(len(SCORE_FIELDS), 50000)).astype(float),
+            {
+                "student": np.array([f"s{i % 5}" for i in range(50000)], dtype=object),
+                "scenario": np.array([f"c{i % 10}" for i in range(50000)], dtype=object),
+                "subject": np.array([""] * 50000, dtype=object),
+                "grade_band": np.array([""] * 50000, dtype=object),
+            },
+        )
+        start = time.perf_counter()
+        table.bootstrap_ci()
+        aggregate_groups(table)
+        self.assertLess(time.perf_counter() - start, 2.0)
+
+    def test_running_stats_match_numpy(self):
+        values = np.random.default_rng(1).normal(5.0, 2.0, size=(500, 3))
+        stats = RunningStats(3)
+        for row in values:
+            stats.update(row)
+        np.testing.assert_allclose(stats.mean, values.mean(axis=0))
+        np.testing.assert_allclose(stats.stddev(), values.std(axis=0, ddof=1))
+
+    def test_online_aggregator_matches_batch_aggregation(self):
+        online = OnlineAggregator(self.scenarios, expected=10)
+        for r in self.results:
+            online.add(r)
+        snapshot = online.snapshot()
+        batch = aggregate_results(self.results, self.scenarios)
+        self.assertEqual(snapshot["num_evaluations"], 4)
+        self.assertEqual(snapshot["progress"], {"evaluations": 4, "expected": 10})
+        self.assertAlmostEqual(snapshot["average_rating"], batch["average_rating"])
+        self.assertAlmostEqual(
+            snapshot["metrics"]["average_first_mile_score"],
+            batch["metrics"]["average_first_mile_score"],
+        )
+        self.assertEqual(snapshot["groups"]["subject"]["math"]["n"], 2)
+        self.assertEqual(snapshot["groups"]["subject"]["math"]["means"]["rating"], 7.0)
+        low, high = snapshot["confidence_intervals"]["rating"]
+        self.assertLess(low, 5.0)
+        self.assertGreater(high, 5.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,42 @@
+import unittest
+from unittest.mock import patch
+from src.bench import peak_rss_mb, percentile, run_benchmark
+
+
+class TestBench(unittest.TestCase):
+    def test_percentile(self):
+        values = [float(i) for i in range(1, 101)]
+        self.assertEqual(percentile(values, 50), 50.0)
+        self.assertEqual(percentile(values, 99), 99.0)
+        self.assertEqual(percentile([3.0], 95), 3.0)
+        self.assertEqual(percentile([], 50), 0.0)
+
+    def test_run_benchmark(self):
+        results = run_benchmark(
+            num_students=2, num_scenarios=2, max_turns=2, concurrency=4, repeat=2
+        )
+        self.assertEqual(results["throughput"]["conversations"], 4)
+        self.assertEqual(results["throughput"]["evaluations"], 4)
+        # Two turns of teacher, student and moderator calls per conversation
+        self.assertEqual(results["latency_seconds"]["teacher_call"]["count"], 8)
+        self.assertEqual(results["latency_seconds"]["grader_call"]["count"], 4)
+        self.assertGreater(results["peak_rss_mb"], 0)
+        self.assertEqual(
+            sorted(results["own_code_cpu"]),
+            [
+                "aggregate_results",
+                "grader_prompt_and_parsing",
+                "json_serialization",
+                "prompt_building",
+                "telemetry",
+            ],
+        )
+        self.assertEqual(results["own_code_cpu"]["telemetry"]["dropped"], 0)
+
+    def test_peak_rss_is_skipped_without_resource(self):
+        with patch.dict("sys.modules", {"resource": None}):
+            self.assertIsNone(peak_rss_mb())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+import unittest
+import asyncio
+import os
+import tempfile
+import time
+from unittest.mock import AsyncMock
+from openai.types.chat import ChatCompletion
+from src.cache import ResponseCache, CachedClient, with_cache
+from src.fake_backend import FakeChatClient, FakeResponder
+from src.streaming import StreamingClient
+
+
+def make_completion(content):
+    return ChatCompletion.model_validate(
+        {
+            "id": "chatcmpl-1",
+            "object": "chat.completion",
+            "created": 0,
+            "model": "test-model",
+            "choices": [
+                {
+                    "index": 0,
+                    "finish_reason": "stop",
+                    "message": {"role": "assistant", "content": content},
+                }
+            ],
+        }
+    )
+
+
+class TestCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "cache.sqlite")
+        self.request = {
+            "model": "test-model",
+            "messages": [{"role": "user", "content": "Hello"}],
+            "temperature": 0,
+        }
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_make_key_depends_on_endpoint_and_request(self):
+        key = ResponseCache.make_key("https://a/v1", self.request)
+        self.assertEqual(key, ResponseCache.make_key("https://a/v1", dict(self.request)))
+        self.assertNotEqual(key, ResponseCache.make_key("https://b/v1", self.request))
+        self.assertNotEqual(
+            key,
+            ResponseCache.make_key("https://a/v1", {**self.request, "temperature": 1}),
+        )
+
+    def test_cached_client_serves_repeated_requests(self):
+        client = AsyncMock()
+        client.chat.completions.create.return_value = make_completion("Hi there")
+        cache = ResponseCache(self.path)
+        cached = CachedClient(client, cache, "https://a/v1")
+
+        first = asyncio.run(cached.chat.completions.create(**self.request))
+        second = asyncio.run(cached.chat.completions.create(**self.request))
+
+        self.assertEqual(client.chat.completions.create.await_count, 1)
+        self.assertEqual(first.choices[0].message.content, "Hi there")
+        self.assertEqual(second.choices[0].message.content, "Hi there")
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 1)
+        cache.close()
+
+    def test_cache_persists_across_runs(self):
+        cache = ResponseCache(self.path)
+        cache.put("key", make_completion("stored").model_dump(mode="json"))
+        cache.close()
+
+        reopened = ResponseCache(self.path, mode="read-only")
+        self.assertIsNotNone(reopened.get("key"))
+        reopened.put("other", {})
+        self.assertIsNone(reopened.get("other"))
+        reopened.close()
+
+    def test_eviction_by_count_and_age(self):
+        cache = ResponseCache(self.path, max_entries=2, max_age_seconds=3600)
+        for i in range(3):
+            cache.put(f"key{i}", {"i": i})
+            time.sleep(0.01)
+        cache.get("key0")
+        cache.evict()
+        self.assertIsNotNone(cache.get("key0"))
+        self.assertIsNone(cache.get("key1"))
+        self.assertIsNotNone(cache.get("key2"))
+
+        cache.max_age_seconds = 0
+        cache.evict()
+        self.assertIsNone(cache.get("key0"))
+        cache.close()
+
+    def test_cut_off_replies_are_cached_apart(self):
+        responder = FakeResponder(scripts={"teacher": ["Good question, let's see."]})
+        cache = ResponseCache(self.path)
+        streaming = StreamingClient(FakeChatClient(responder, "teacher"), max_chars=10)
+        cut = CachedClient(streaming, cache, "https://a/v1", salt=streaming.cutoff)
+        uncut = CachedClient(
+            StreamingClient(FakeChatClient(responder, "teacher")), cache, "https://a/v1"
+        )
+
+        first = asyncio.run(cut.chat.completions.create(**self.request))
+        second = asyncio.run(uncut.chat.completions.create(**self.request))
+
+        self.assertEqual(first.choices[0].message.content, "Good quest")
+        self.assertEqual(second.choices[0].message.content, "Good question, let's see.")
+        self.assertEqual(cache.stats()["hits"], 0)
+        cache.close()
+
+    def test_with_cache_off(self):
+        client = AsyncMock()
+        self.assertIs(with_cache(client, None, "https://a/v1"), client)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+import unittest
+import os
+import tempfile
+from src.checkpoint import JsonlCheckpoint, load_records, write_atomic
+from src.datastructures import EvaluationResult
+
+
+class TestCheckpoint(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.file_path = os.path.join(self.tmpdir.name, "evaluations.jsonl")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_append_writes_each_record_immediately(self):
+        with JsonlCheckpoint(self.file_path, EvaluationResult) as checkpoint:
+            checkpoint.append(
+                EvaluationResult(conversation_id="conv1", rating=7.0, reasoning="Good")
+            )
+            records = load_records(self.file_path, EvaluationResult)
+        self.assertEqual([r.conversation_id for r in records], ["conv1"])
+
+    def test_resume_keeps_records_and_drops_truncated_line(self):
+        with JsonlCheckpoint(self.file_path, EvaluationResult) as checkpoint:
+            checkpoint.append(
+                EvaluationResult(conversation_id="conv1", rating=7.0, reasoning="Good")
+            )
+        with open(self.file_path, "a") as f:
+            f.write('{"conversation_id": "conv2", "rat')
+
+        with JsonlCheckpoint(self.file_path, EvaluationResult, resume=True) as checkpoint:
+            self.assertEqual([r.conversation_id for r in checkpoint.records], ["conv1"])
+            checkpoint.append(
+                EvaluationResult(conversation_id="conv3", rating=6.0, reasoning="Fair")
+            )
+
+        records = load_records(self.file_path, EvaluationResult)
+        self.assertEqual([r.conversation_id for r in records], ["conv1", "conv3"])
+
+    def test_without_resume_the_file_starts_empty(self):
+        with JsonlCheckpoint(self.file_path, EvaluationResult) as checkpoint:
+            checkpoint.append(
+                EvaluationResult(conversation_id="conv1", rating=7.0, reasoning="Good")
+            )
+        with JsonlCheckpoint(self.file_path, EvaluationResult) as checkpoint:
+            self.assertEqual(checkpoint.records, [])
+        self.assertEqual(load_records(self.file_path, EvaluationResult), [])
+
+    def test_write_atomic_replaces_the_file(self):
+        report_path = os.path.join(os.path.dirname(self.file_path), "report.md")
+        write_atomic(report_path, "first")
+        write_atomic(report_path, "second")
+        with open(report_path) as f:
+            self.assertEqual(f.read(), "second")
+        self.assertFalse(os.path.exists(report_path + ".tmp"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,11 +1,16 @@
+import asyncio
+import json
 import unittest
 from unittest.mock import AsyncMock
 from src.evaluation import (
+    GRADER_FIELDS,
     evaluate_conversation_with_grader,
+    parse_grader_reply,
     calculate_student_talk_time,
     calculate_average_words_per_turn,
 )
 from src.datastructures import Conversation, Exchange, EvaluationResult
+from src.fake_backend import FakeChatClient, FakeResponder
 
 
 class TestEvaluation(unittest.TestCase):
@@ -58,6 +63,174 @@ class TestEvaluation(unittest.TestCase):
             evaluation_result.reasoning, "The teacher was very clear and supportive."
         )
 
+    def test_parse_grader_reply(self):
+        content = (
+            "**OverallRating:** 8/10\n"
+            "OverallReasoning: Clear explanations.\n"
+            "The pacing could improve.\n"
+            "- **FirstMileDiagnosticsScore**: 4 (0-5)\n"
+            "FirstMileDiagnosticsReasoning: Asked two questions.\n"
+            "RetrievalPracticeScore: N/A\n"
+        )
+        arguments, missing = parse_grader_reply(content)
+        self.assertEqual(arguments["rating"], 8.0)
+        self.assertEqual(
+            arguments["reasons"], "Clear explanations.\nThe pacing could improve."
+        )
+        self.assertEqual(arguments["first_mile_score"], 4.0)
+        self.assertEqual(arguments["retrieval_score"], 0.0)
+        self.assertIn("RetrievalPracticeScore", missing)
+        self.assertIn("InterleavedPracticeScore", missing)
+        self.assertNotIn("OverallRating", missing)
+        self.assertNotIn("FirstMileDiagnosticsReasoning", missing)
+
+    def test_parse_numbered_grader_reply(self):
+        content = (
+            "1. OverallRating: 7\n"
+            "2) **FirstMileDiagnosticsScore**: 3\n"
+            "  10. RetrievalPracticeScore: 5\n"
+        )
+        arguments, missing = parse_grader_reply(content)
+        self.assertEqual(arguments["rating"], 7.0)
+        self.assertEqual(arguments["first_mile_score"], 3.0)
+        self.assertEqual(arguments["retrieval_score"], 5.0)
+        self.assertNotIn("RetrievalPracticeScore", missing)
+
+    def test_parse_complete_grader_reply(self):
+        arguments, missing = parse_grader_reply(FakeResponder().grade("transcript"))
+        self.assertEqual(missing, [])
+        self.assertEqual(set(arguments), set(GRADER_FIELDS.values()))
+
+    def test_structured_grader_output(self):
+        grader = AsyncMock()
+        grader.chat.completions.create.return_value.choices[0].message.content = json.dumps(
+            {
+                key: 2 if key.endswith("_score") else "Fine."
+                for key in GRADER_FIELDS.values()
+            }
+            | {"rating": 7}
+        )
+        result = asyncio.run(
+            evaluate_conversation_with_grader(
+                self.conversation, grader, "grader", output_format="json-schema"
+            )
+        )
+        request = grader.chat.completions.create.call_args.kwargs
+        self.assertEqual(request["response_format"]["type"], "json_schema")
+        self.assertEqual(result.missing_fields, [])
+        self.assertEqual(result.rating, 7.0)
+        self.assertEqual(result.beliefs_attributions_score, 2.0)
+
+    def test_repairs_missing_and_out_of_range_scores(self):
+        complete = FakeResponder().grade("transcript")
+        first_reply = "\n".join(
+            line.replace("RetrievalPracticeScore: ", "RetrievalPracticeScore: 9")
+            for line in complete.splitlines()
+            if not line.startswith("InterleavedPracticeScore")
+        )
+        grader = FakeChatClient(
+            FakeResponder(
+                scripts={
+                    "grader": [
+                        first_reply,
+                        "InterleavedPracticeScore: 3\nRetrievalPracticeScore: 4",
+                    ]
+                }
+            ),
+            "grader",
+        )
+        result = asyncio.run(
+            evaluate_conversation_with_grader(self.conversation, grader, "grader")
+        )
+        self.assertEqual(result.repair_calls, 1)
+        self.assertEqual(
+            sorted(result.repaired_fields),
+            ["InterleavedPracticeScore", "RetrievalPracticeScore"],
+        )
+        self.assertEqual(result.missing_fields, [])
+        self.assertEqual(result.interleaved_practice_score, 3.0)
+        self.assertEqual(result.retrieval_score, 4.0)
+        # One grading call and a single follow-up for both fields
+        self.assertEqual(grader.responder.calls["grader"], 2)
+
+    def test_unrepaired_scores_are_clamped_and_reported(self):
+        reply = FakeResponder().grade("transcript").replace(
+            "OverallRating: ", "OverallRating: 4", 1
+        )
+        grader = FakeChatClient(FakeResponder(scripts={"grader": [reply]}), "grader")
+        result = asyncio.run(
+            evaluate_conversation_with_grader(
+                self.conversation, grader, "grader", max_repairs=0
+            )
+        )
+        self.assertEqual(result.repair_calls, 0)
+        self.assertEqual(result.rating, 10.0)
+        self.assertEqual(result.missing_fields, ["OverallRating"])
+
+    def test_per_dimension_grading(self):
+        grader = FakeChatClient(FakeResponder(), "grader")
+        result = asyncio.run(
+            evaluate_conversation_with_grader(
+                self.conversation, grader, "grader", mode="per-dimension"
+            )
+        )
+        # One call for the overall rating and one per dimension
+        self.assertEqual(grader.responder.calls["grader"], 11)
+        self.assertEqual(result.missing_fields, [])
+        self.assertEqual(result.repair_calls, 0)
+        self.assertIn("Beliefs & Attributions", result.reasoning)
+
+    def test_per_dimension_prompts_share_the_transcript_prefix(self):
+        grader = AsyncMock()
+        grader.chat.completions.create.return_value.choices[0].message.content = ""
+        asyncio.run(
+            evaluate_conversation_with_grader(
+                self.conversation, grader, "grader", mode="per-dimension", max_repairs=0
+            )
+        )
+        prompts = [
+            call.kwargs["messages"][0]["content"]
+            for call in grader.chat.completions.create.call_args_list
+        ]
+        self.assertEqual(len(prompts), 11)
+        prefix = prompts[0][: prompts[0].index("[END DATA]")]
+        self.assertTrue(all(prompt.startswith(prefix) for prompt in prompts))
+        self.assertEqual(sum("InterleavedPracticeScore:" in p for p in prompts), 1)
+
+    def test_multi_sample_grading_stops_on_agreement(self):
+        reply = FakeResponder().grade("transcript")
+        grader = FakeChatClient(FakeResponder(scripts={"grader": [reply]}), "grader")
+        result = asyncio.run(
+            evaluate_conversation_with_grader(
+                self.conversation, grader, "grader", samples=5
+            )
+        )
+        # The first wave of two agrees, so no further gradings are requested
+        self.assertEqual(grader.responder.calls["grader"], 2)
+        self.assertEqual(result.samples, 2)
+        self.assertEqual(result.score_stddev["rating"], 0.0)
+
+    def test_multi_sample_grading_averages_disagreeing_samples(self):
+        base = FakeResponder().grade("transcript")
+        replies = [
+            "\n".join(
+                f"OverallRating: {rating}" if line.startswith("OverallRating") else line
+                for line in base.splitlines()
+            )
+            for rating in (2, 8, 4, 6)
+        ]
+        grader = FakeChatClient(FakeResponder(scripts={"grader": replies}), "grader")
+        result = asyncio.run(
+            evaluate_conversation_with_grader(
+                self.conversation, grader, "grader", samples=4, agreement_tolerance=1.0
+            )
+        )
+        self.assertEqual(result.samples, 4)
+        self.assertEqual(result.rating, 5.0)
+        self.assertAlmostEqual(result.score_stddev["rating"], 2.5819888974716)
+        self.assertEqual(result.score_stddev["first_mile_score"], 0.0)
+        self.assertEqual(grader.responder.calls["grader"], 4)
+
     def test_calculate_student_talk_time(self):
         student_talk_time = calculate_student_talk_time(self.conversation)
         # Student words: 5 + 4 = 9
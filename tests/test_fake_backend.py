@@ -0,0 +1,102 @@
+import unittest
+import asyncio
+import random
+from openai import AsyncOpenAI, RateLimitError
+from src.fake_backend import FakeChatClient, FakeResponder, FakeServer, parse_latency
+from src.evaluation import evaluate_conversation_with_grader
+from src.datastructures import Conversation, Exchange
+
+
+class TestFakeBackend(unittest.TestCase):
+    def test_parse_latency(self):
+        rng = random.Random(0)
+        self.assertEqual(parse_latency("fixed:0.2")(rng), 0.2)
+        self.assertTrue(0.1 <= parse_latency("uniform:0.1:0.3")(rng) <= 0.3)
+        self.assertGreater(parse_latency("lognormal:0.5:0.2")(rng), 0)
+        with self.assertRaises(ValueError):
+            parse_latency("normal:1")
+
+    def test_grader_output_is_parseable(self):
+        conversation = Conversation(
+            id="conv1",
+            scenario="scenario1",
+            student="student1",
+            exchanges=[
+                Exchange(speaker="Student", message="Hello teacher!"),
+                Exchange(speaker="Teacher", message="Hello student!"),
+            ],
+        )
+        grader = FakeChatClient(FakeResponder(), "grader")
+        result = asyncio.run(
+            evaluate_conversation_with_grader(conversation, grader, "fake-grader")
+        )
+        self.assertTrue(1 <= result.rating <= 10)
+        self.assertTrue(0 <= result.first_mile_score <= 5)
+        self.assertTrue(
+            result.reasoning.startswith("Overall: Generated by the offline backend.")
+        )
+
+    def test_scripted_replies_and_moderator(self):
+        responder = FakeResponder(scripts={"student": ["one", "two"]}, stop_after_turns=1)
+        student = FakeChatClient(responder, "student")
+        moderator = FakeChatClient(responder, "moderator")
+
+        async def run():
+            replies = [
+                (await student.chat.completions.create(model="m", messages=[]))
+                .choices[0]
+                .message.content
+                for _ in range(3)
+            ]
+            decision = await moderator.chat.completions.create(
+                model="m",
+                messages=[{"role": "user", "content": "so far:\nStudent: hi\nTeacher: hello"}],
+            )
+            return replies, decision.choices[0].message.content
+
+        replies, decision = asyncio.run(run())
+        self.assertEqual(replies, ["one", "two", "one"])
+        self.assertEqual(decision, "STOP")
+
+    def test_server_follows_base_url_contract(self):
+        responder = FakeResponder(scripts={"teacher": ["Let's begin."]})
+        with FakeServer(responder) as server:
+
+            async def run():
+                client = AsyncOpenAI(api_key="dummy", base_url=server.base_url("teacher"))
+                response = await client.chat.completions.create(
+                    model="fake-teacher",
+                    messages=[{"role": "user", "content": "Help me"}],
+                )
+                await client.close()
+                return response
+
+            response = asyncio.run(run())
+        self.assertEqual(response.choices[0].message.content, "Let's begin.")
+        self.assertGreater(response.usage.total_tokens, 0)
+
+    def test_server_injects_rate_limit_errors(self):
+        responder = FakeResponder(rate_limit_rate=1.0)
+        with FakeServer(responder) as server:
+
+            async def run():
+                client = AsyncOpenAI(
+                    api_key="dummy", base_url=server.base_url("student"), max_retries=0
+                )
+                try:
+                    await client.chat.completions.create(model="m", messages=[])
+                finally:
+                    await client.close()
+
+            with self.assertRaises(RateLimitError):
+                asyncio.run(run())
+
+
+    def test_server_start_fails_when_the_port_is_taken(self):
+        with FakeServer(FakeResponder()) as server:
+            with self.assertRaises(OSError):
+                FakeServer(FakeResponder(), port=server.port).start(timeout=5.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,8 +1,11 @@
 import unittest
 import asyncio
+from types import SimpleNamespace
 from unittest.mock import AsyncMock
-from src.generator import generate_conversation
-from src.datastructures import Student, Scenario, Conversation
+from src.generator import generate_conversation, SharedOpeningTurns
+from src.moderation import HeuristicModerator
+from src.history import ContextPolicy
+from src.datastructures import Student, Scenario, Conversation, Teacher
 
 
 class TestGenerator(unittest.TestCase):
@@ -39,6 +42,199 @@ class TestGenerator(unittest.TestCase):
         self.assertEqual(conversation.exchanges[3].speaker, "Teacher")
         self.assertEqual(conversation.exchanges[4].speaker, "Student")
 
+    def test_pre_moderator_skips_moderator_call(self):
+        student = Student(id="student1", system_prompt="You are a helpful student.")
+        teacher = Teacher(id="teacher", system_prompt="You are a teacher.")
+        scenario = Scenario(id="scenario1", initial_message="Start the conversation.")
+
+        teacher_model = AsyncMock()
+        teacher_model.chat.completions.create.return_value.choices[
+            0
+        ].message.content = "The teacher's response."
+        student_model = AsyncMock()
+        student_model.chat.completions.create.return_value.choices[
+            0
+        ].message.content = "Thanks, goodbye!"
+        moderator_model = AsyncMock()
+        pre_moderator = HeuristicModerator()
+
+        conversation = asyncio.run(
+            generate_conversation(
+                student=student,
+                scenario=scenario,
+                teacher=teacher,
+                teacher_model=teacher_model,
+                student_model=student_model,
+                moderator_model=moderator_model,
+                student_model_name="student-model",
+                teacher_model_name="teacher-model",
+                moderator_model_name="moderator-model",
+                max_turns=3,
+                pre_moderator=pre_moderator,
+            )
+        )
+
+        self.assertEqual(len(conversation.exchanges), 3)
+        moderator_model.chat.completions.create.assert_not_awaited()
+        self.assertEqual(pre_moderator.summary()["calls_saved"], 1)
+
+    def test_speculative_teacher_keeps_transcript(self):
+        student = Student(id="student1", system_prompt="You are a helpful student.")
+        teacher = Teacher(id="teacher", system_prompt="You are a teacher.")
+        scenario = Scenario(id="scenario1", initial_message="Start the conversation.")
+
+        def scripted(reply):
+            async def create(model, messages, **kwargs):
+                content = reply(messages)
+                await asyncio.sleep(0)
+                return SimpleNamespace(
+                    choices=[SimpleNamespace(message=SimpleNamespace(content=content))]
+                )
+
+            return SimpleNamespace(
+                chat=SimpleNamespace(completions=SimpleNamespace(create=create))
+            )
+
+        def run(speculative):
+            teacher_calls = []
+
+            def teacher_reply(messages):
+                teacher_calls.append(len(messages))
+                return f"Teacher turn after {len(messages)} messages"
+
+            def moderator_reply(messages):
+                # Stop once the teacher has spoken three times
+                return "STOP" if messages[0]["content"].count("Teacher:") >= 3 else "CONTINUE"
+
+            conversation = asyncio.run(
+                generate_conversation(
+                    student=student,
+                    scenario=scenario,
+                    teacher=teacher,
+                    teacher_model=scripted(teacher_reply),
+                    student_model=scripted(lambda m: f"Student turn {len(m)}"),
+                    moderator_model=scripted(moderator_reply),
+                    student_model_name="student-model",
+                    teacher_model_name="teacher-model",
+                    moderator_model_name="moderator-model",
+                    max_turns=5,
+                    speculative=speculative,
+                )
+            )
+            return conversation, teacher_calls
+
+        sequential, sequential_calls = run(speculative=False)
+        speculated, speculated_calls = run(speculative=True)
+
+        self.assertEqual(sequential.exchanges, speculated.exchanges)
+        self.assertEqual(len(sequential.exchanges), 7)
+        self.assertEqual(len(sequential_calls), 3)
+        # The speculative teacher call after the final student turn is started, then discarded
+        self.assertEqual(len(speculated_calls), 4)
+
+    def test_shared_opening_turns_request_each_scenario_once(self):
+        teacher = Teacher(id="teacher", system_prompt="You are a teacher.")
+        scenarios = [
+            Scenario(id=f"scenario{i}", initial_message=f"Question {i}") for i in range(2)
+        ]
+        teacher_model = AsyncMock()
+        teacher_model.chat.completions.create.return_value.choices[
+            0
+        ].message.content = "Opening"
+        openings = SharedOpeningTurns(teacher, teacher_model, "teacher-model", samples=2)
+
+        async def run():
+            return await asyncio.gather(
+                *(
+                    openings.get(scenario, student_index)
+                    for scenario in scenarios
+                    for student_index in range(5)
+                )
+            )
+
+        results = asyncio.run(run())
+
+        self.assertEqual(results, ["Opening"] * 10)
+        # Two samples for each of the two scenarios, as distinct requests
+        self.assertEqual(teacher_model.chat.completions.create.await_count, 4)
+        requests = [
+            call.kwargs for call in teacher_model.chat.completions.create.await_args_list
+        ]
+        self.assertEqual(sorted(request["seed"] for request in requests), [0, 0, 1, 1])
+        self.assertTrue(all(request["temperature"] > 0 for request in requests))
+
+    def test_opening_teacher_message_skips_first_teacher_call(self):
+        student = Student(id="student1", system_prompt="You are a helpful student.")
+        teacher = Teacher(id="teacher", system_prompt="You are a teacher.")
+        scenario = Scenario(id="scenario1", initial_message="Start the conversation.")
+        teacher_model = AsyncMock()
+        student_model = AsyncMock()
+        student_model.chat.completions.create.return_value.choices[
+            0
+        ].message.content = "The student's response."
+        moderator_model = AsyncMock()
+        moderator_model.chat.completions.create.return_value.choices[
+            0
+        ].message.content = "STOP"
+
+        conversation = asyncio.run(
+            generate_conversation(
+                student=student,
+                scenario=scenario,
+                teacher=teacher,
+                teacher_model=teacher_model,
+                student_model=student_model,
+                moderator_model=moderator_model,
+                student_model_name="student-model",
+                teacher_model_name="teacher-model",
+                moderator_model_name="moderator-model",
+                opening_teacher_message="Shared opening",
+            )
+        )
+
+        teacher_model.chat.completions.create.assert_not_awaited()
+        self.assertEqual(conversation.exchanges[1].message, "Shared opening")
+
+    def test_context_policy_bounds_prompts(self):
+        student = Student(id="student1", system_prompt="You are a helpful student.")
+        teacher = Teacher(id="teacher", system_prompt="You are a teacher.")
+        scenario = Scenario(id="scenario1", initial_message="Start the conversation.")
+        prompt_sizes = []
+
+        async def create(model, messages, **kwargs):
+            prompt_sizes.append(len(messages))
+            return SimpleNamespace(
+                choices=[SimpleNamespace(message=SimpleNamespace(content="A reply."))]
+            )
+
+        model = SimpleNamespace(
+            chat=SimpleNamespace(completions=SimpleNamespace(create=create))
+        )
+        moderator_model = AsyncMock()
+        moderator_model.chat.completions.create.return_value.choices[
+            0
+        ].message.content = "CONTINUE"
+
+        conversation = asyncio.run(
+            generate_conversation(
+                student=student,
+                scenario=scenario,
+                teacher=teacher,
+                teacher_model=model,
+                student_model=model,
+                moderator_model=moderator_model,
+                student_model_name="student-model",
+                teacher_model_name="teacher-model",
+                moderator_model_name="moderator-model",
+                max_turns=6,
+                teacher_context=ContextPolicy.parse("last:4"),
+                student_context=ContextPolicy.parse("last:4"),
+            )
+        )
+
+        self.assertEqual(len(conversation.exchanges), 13)
+        self.assertEqual(max(prompt_sizes), 5)
+
 
 if __name__ == "__main__":
     unittest.main()
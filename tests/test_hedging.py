@@ -0,0 +1,125 @@
+import unittest
+import asyncio
+from src.fake_backend import FakeAPIError
+from src.hedging import HedgedClient
+from src.ratelimit import RateLimiter
+from src.retry import RetryingClient, RetryPolicy
+from src.usage import TokenUsage, UsageTrackingClient
+
+
+class ScriptedClient:
+    """
+    Answers calls after scripted delays, recording starts and cancellations.
+    """
+
+    def __init__(self, delays):
+        self.delays = list(delays)
+        self.started = 0
+        self.cancelled = 0
+        self.chat = self
+        self.completions = self
+
+    async def create(self, **kwargs):
+        delay = self.delays[self.started % len(self.delays)]
+        self.started += 1
+        leg = self.started
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        return f"response {leg}"
+
+
+class TestHedging(unittest.TestCase):
+    def test_no_hedging_before_enough_samples(self):
+        client = HedgedClient(ScriptedClient([0.0]), min_samples=5)
+        self.assertIsNone(client.threshold())
+
+        async def run():
+            for _ in range(3):
+                await client.chat.completions.create(messages=[])
+
+        asyncio.run(run())
+        self.assertEqual(client.stats["hedged"], 0)
+        self.assertIsNone(client.threshold())
+
+    def test_slow_call_is_hedged_and_loser_cancelled(self):
+        inner = ScriptedClient([0.01])
+        client = HedgedClient(inner, quantile=50, max_ratio=1.0, min_samples=3)
+        usage = TokenUsage()
+        tracked = UsageTrackingClient(client, usage, "teacher")
+
+        async def run():
+            for _ in range(3):
+                await tracked.chat.completions.create(messages=[])
+            # The next call hangs; its duplicate answers at the usual speed
+            inner.delays = [10.0, 0.01]
+            inner.started = 0
+            return await tracked.chat.completions.create(messages=[])
+
+        response = asyncio.run(run())
+        self.assertEqual(response, "response 2")
+        self.assertEqual(inner.cancelled, 1)
+        self.assertEqual(client.stats["hedged"], 1)
+        self.assertEqual(client.stats["hedge_wins"], 1)
+        # The hedged call is recorded once, with its duplicate request
+        self.assertEqual([call["hedges"] for call in usage.calls], [0, 0, 0, 1])
+
+    def test_hedge_ratio_caps_duplicates(self):
+        inner = ScriptedClient([0.001, 0.001, 0.001, 0.03])
+        client = HedgedClient(inner, quantile=50, max_ratio=0.1, min_samples=3)
+
+        async def run():
+            for _ in range(40):
+                await client.chat.completions.create(messages=[])
+
+        asyncio.run(run())
+        self.assertGreater(client.stats["hedged"], 0)
+        self.assertLessEqual(client.stats["hedged"], 0.1 * client.stats["calls"])
+
+    def test_failed_leg_falls_back_to_the_other(self):
+        class FailingHedge(ScriptedClient):
+            async def create(self, **kwargs):
+                if self.started == 4:
+                    self.started += 1
+                    raise RuntimeError("hedge failed")
+                return await super().create(**kwargs)
+
+        inner = FailingHedge([0.01, 0.01, 0.01, 0.05])
+        client = HedgedClient(inner, quantile=50, max_ratio=1.0, min_samples=3)
+
+        async def run():
+            return [await client.chat.completions.create(messages=[]) for _ in range(4)]
+
+        responses = asyncio.run(run())
+        self.assertEqual(responses[-1], "response 4")
+        self.assertEqual(client.stats["hedge_wins"], 0)
+
+    def test_limiter_waits_and_backoff_are_not_hedged(self):
+        class ThrottledClient(ScriptedClient):
+            async def create(self, **kwargs):
+                if self.started == 0:
+                    self.started += 1
+                    raise FakeAPIError(429, "Rate limit", retry_after=0.2)
+                return await super().create(**kwargs)
+
+        inner = ThrottledClient([0.001])
+        hedged = HedgedClient(inner, quantile=50, max_ratio=1.0, min_samples=3)
+        hedged.latencies.extend([0.01] * 3)
+        # The local quota is used up, so admission waits well past the threshold
+        limiter = RateLimiter(rpm=240)
+        limiter.requests.level = 0.0
+        client = RetryingClient(
+            hedged, RetryPolicy(base_delay=0.001, max_delay=0.01), limiter=limiter
+        )
+
+        self.assertEqual(asyncio.run(client.chat.completions.create(messages=[])), "response 2")
+        self.assertEqual(client.stats["retries"], 1)
+        self.assertEqual(hedged.stats["hedged"], 0)
+        self.assertEqual(inner.started, 2)
+        self.assertLess(max(hedged.latencies), 0.1)
+
+
+if __name__ == "__main__":
+    unittest.main()
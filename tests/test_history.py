@@ -0,0 +1,70 @@
+import unittest
+from src.history import (
+    ContextPolicy,
+    needs_summary,
+    window_exchanges,
+    window_messages,
+)
+from src.datastructures import Exchange
+
+
+class TestHistory(unittest.TestCase):
+    def setUp(self):
+        self.messages = [{"role": "system", "content": "You are a teacher."}] + [
+            {"role": "user" if i % 2 == 0 else "assistant", "content": f"message {i}"}
+            for i in range(10)
+        ]
+        self.exchanges = [
+            Exchange(speaker="Student" if i % 2 == 0 else "Teacher", message=f"turn {i}")
+            for i in range(10)
+        ]
+
+    def test_parse(self):
+        self.assertEqual(ContextPolicy.parse("full").mode, "full")
+        policy = ContextPolicy.parse("last:4")
+        self.assertEqual((policy.mode, policy.k), ("last", 4))
+        policy = ContextPolicy.parse("summary:4:2")
+        self.assertEqual((policy.mode, policy.k, policy.summary_every), ("summary", 4, 2))
+        for spec in ["window", "last", "last:x", "summary:4", "last:0", "full:3"]:
+            with self.assertRaises(ValueError):
+                ContextPolicy.parse(spec)
+
+    def test_full_policy_keeps_history(self):
+        self.assertIs(window_messages(self.messages, ContextPolicy()), self.messages)
+
+    def test_last_k_keeps_system_prompt(self):
+        windowed = window_messages(self.messages, ContextPolicy.parse("last:3"))
+        self.assertEqual(
+            [m["content"] for m in windowed],
+            ["You are a teacher.", "message 7", "message 8", "message 9"],
+        )
+
+    def test_summary_precedes_window(self):
+        windowed = window_messages(
+            self.messages, ContextPolicy.parse("summary:2:3"), summary="They added fractions."
+        )
+        self.assertEqual(len(windowed), 4)
+        self.assertIn("They added fractions.", windowed[1]["content"])
+
+        transcript = window_exchanges(
+            self.exchanges, ContextPolicy.parse("summary:2:3"), summary="Earlier."
+        )
+        self.assertEqual(
+            transcript.splitlines(),
+            [
+                "Summary of the earlier conversation: Earlier.",
+                "Student: turn 8",
+                "Teacher: turn 9",
+            ],
+        )
+
+    def test_needs_summary(self):
+        policies = [ContextPolicy(), ContextPolicy.parse("summary:4:3")]
+        self.assertEqual(
+            [turn for turn in range(7) if needs_summary(policies, turn)], [2, 5]
+        )
+        self.assertFalse(needs_summary([ContextPolicy()], 2))
+
+
+if __name__ == "__main__":
+    unittest.main()
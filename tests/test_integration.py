@@ -1,8 +1,13 @@
 import unittest
 import os
+import json
 import shutil
+from unittest.mock import patch
 from click.testing import CliRunner
+import src.tracing
 from src.edubench import cli
+from src.fake_backend import FakeResponder, FakeServer
+from src.runtime import ROLES
 
 
 class TestIntegration(unittest.TestCase):
@@ -12,22 +17,45 @@ class TestIntegration(unittest.TestCase):
             shutil.rmtree(self.output_dir)
         os.makedirs(self.output_dir)
 
-        # Create a dummy .eduenv file for testing
-        with open(".eduenv", "w") as f:
-            f.write("API_KEY=dummy_api_key\n")
-            f.write("MODEL_NAME=gpt-4o\n")
+        # Serve all roles from the offline backend
+        self.server = FakeServer(FakeResponder(stop_after_turns=2, seed=0)).start()
+        self.saved_environ = dict(os.environ)
+        for role in ROLES:
+            os.environ[f"{role.upper()}_API_KEY"] = "dummy_api_key"
+            os.environ[f"{role.upper()}_BASE_URL"] = self.server.base_url(role)
+            os.environ[f"{role.upper()}_MODEL"] = f"fake-{role}"
 
     def tearDown(self):
+        self.server.stop()
+        os.environ.clear()
+        os.environ.update(self.saved_environ)
         if os.path.exists(self.output_dir):
             shutil.rmtree(self.output_dir)
-        if os.path.exists(".eduenv"):
-            os.remove(".eduenv")
 
     def test_full_pipeline(self):
         runner = CliRunner()
-        result = runner.invoke(cli, ["run", "--output-dir", self.output_dir])
+        trace_file = os.path.join(self.output_dir, "trace.json")
+        result = runner.invoke(
+            cli,
+            [
+                "run",
+                "--output-dir",
+                self.output_dir,
+                "--concurrency",
+                "5",
+                "--trace",
+                trace_file,
+                "--partial-report-interval",
+                "0.001",
+                "--hedge",
+                "teacher",
+                "--stream",
+                "--telemetry",
+                "local",
+            ],
+        )
 
-        self.assertEqual(result.exit_code, 0)
+        self.assertEqual(result.exit_code, 0, result.output)
         self.assertTrue(
             os.path.exists(os.path.join(self.output_dir, "conversations.jsonl"))
         )
@@ -35,6 +63,18 @@ class TestIntegration(unittest.TestCase):
             os.path.exists(os.path.join(self.output_dir, "evaluations.jsonl"))
         )
         self.assertTrue(os.path.exists(os.path.join(self.output_dir, "report.md")))
+        self.assertTrue(os.path.exists(os.path.join(self.output_dir, "calls.jsonl")))
+        with open(os.path.join(self.output_dir, "spans.jsonl")) as f:
+            spans_by_role = {json.loads(line)["role"] for line in f}
+        self.assertEqual(spans_by_role, {"student", "teacher", "grader", "moderator"})
+        with open(trace_file) as f:
+            spans = {event["name"] for event in json.load(f)["traceEvents"]}
+        self.assertTrue(
+            {"load_data", "conversation", "teacher_turn", "grader_call", "report"} <= spans
+        )
+        # Partial reports are written during the run and removed at the end
+        self.assertIn("partial_report", spans)
+        self.assertFalse(os.path.exists(os.path.join(self.output_dir, "report.partial.md")))
 
         # Basic check of the report content
         with open(os.path.join(self.output_dir, "report.md"), "r") as f:
@@ -44,8 +84,42 @@ class TestIntegration(unittest.TestCase):
             self.assertIn("Number of Evaluations:", report_content)
             self.assertIn("Student Talk Time:", report_content)
             self.assertIn("Average Words per Turn:", report_content)
+            self.assertIn("## Cost & Latency", report_content)
+            self.assertIn("## Retries & Timeouts", report_content)
+            self.assertIn("## Hedged Requests", report_content)
+            self.assertIn("## Streaming", report_content)
+            self.assertIn("## Telemetry", report_content)
+
+    def test_consecutive_runs_in_one_process(self):
+        runner = CliRunner()
+        for run_dir in ("first", "second"):
+            output_dir = os.path.join(self.output_dir, run_dir)
+            result = runner.invoke(
+                cli, ["run", "--output-dir", output_dir, "--telemetry", "local"]
+            )
+            self.assertEqual(result.exit_code, 0, result.output)
+            with open(os.path.join(output_dir, "evaluations.jsonl")) as f:
+                self.assertEqual(len(f.readlines()), 25)
+            self.assertTrue(os.path.exists(os.path.join(output_dir, "spans.jsonl")))
+
+    def test_failed_run_stops_tracing(self):
+        trace_file = os.path.join(self.output_dir, "trace.json")
+        with patch("src.edubench.load_all_students", side_effect=RuntimeError("boom")):
+            result = CliRunner().invoke(
+                cli, ["run", "--output-dir", self.output_dir, "--trace", trace_file]
+            )
+        self.assertIsInstance(result.exception, RuntimeError)
+        self.assertIsNone(src.tracing._tracer)
+
+    def test_http2_without_h2_is_a_usage_error(self):
+        with patch("importlib.util.find_spec", return_value=None):
+            result = CliRunner().invoke(
+                cli, ["run", "--output-dir", self.output_dir, "--http2"]
+            )
+        self.assertEqual(result.exit_code, 2)
+        self.assertIn("httpx[http2]", result.output)
+        self.assertFalse(os.path.exists(os.path.join(self.output_dir, "report.md")))
 
 
 if __name__ == "__main__":
     unittest.main()
-
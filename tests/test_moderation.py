@@ -0,0 +1,82 @@
+import unittest
+from src.moderation import HeuristicModerator, shingles, similarity
+from src.datastructures import Exchange
+
+
+def exchanges(*messages):
+    speakers = ["Student", "Teacher"]
+    return [
+        Exchange(speaker=speakers[i % 2], message=message)
+        for i, message in enumerate(messages)
+    ]
+
+
+class TestModeration(unittest.TestCase):
+    def test_similarity(self):
+        a = shingles("I still do not understand how to add fractions")
+        b = shingles("i still do not understand how to add fractions!")
+        self.assertEqual(similarity(a, b), 1.0)
+        self.assertLess(similarity(a, shingles("What is a common denominator?")), 0.2)
+
+    def test_decides_obvious_stops(self):
+        moderator = HeuristicModerator()
+        self.assertTrue(moderator.decide(exchanges("Help me", "Sure", "")))
+        self.assertTrue(
+            moderator.decide(exchanges("Help me", "Sure", "Got it, bye for now!"))
+        )
+        self.assertTrue(moderator.decide(exchanges("Help me", "Sure", "Thanks a lot!")))
+        self.assertTrue(
+            moderator.decide(
+                exchanges(
+                    "I don't get why 1/2 + 1/3 is not 2/5",
+                    "Let's look at the denominators.",
+                    "I don't get why 1/2 + 1/3 is not 2/5",
+                )
+            )
+        )
+
+    def test_is_unsure_otherwise(self):
+        moderator = HeuristicModerator()
+        self.assertIsNone(
+            moderator.decide(
+                exchanges(
+                    "Help me with fractions",
+                    "What do you already know?",
+                    "Thanks, but why do we need the same denominator?",
+                )
+            )
+        )
+        self.assertIsNone(
+            moderator.decide(exchanges("I dont know.", "What is 1/2 of 4?", "I dont know."))
+        )
+        self.assertIsNone(
+            moderator.decide(
+                exchanges("Is it 2?", "Great job!", "And 1/3 of 6 is 2?", "Great job!")
+            )
+        )
+        for message in (
+            "Thanks, I think the answer is 5/6.",
+            "I see you multiplied both sides by 2, but why?",
+            "Before we say goodbye, can you explain ATP?",
+            "Let me talk to you later about this, first can we do one more?",
+        ):
+            self.assertIsNone(moderator.decide(exchanges("Help me", "Sure", message)))
+
+    def test_summary_counts_saved_calls_and_agreement(self):
+        moderator = HeuristicModerator(audit_rate=1.0, seed=0)
+        local = moderator.decide(exchanges("Help me", "Sure", "Goodbye!"))
+        self.assertTrue(moderator.should_audit())
+        moderator.record_remote(local, True)
+        unsure = moderator.decide(exchanges("Help me", "Sure", "Why?"))
+        moderator.record_remote(unsure, False)
+
+        summary = moderator.summary()
+        self.assertEqual(summary["turns"], 2)
+        self.assertEqual(summary["local_decisions"], 1)
+        self.assertEqual(summary["remote_calls"], 2)
+        self.assertEqual(summary["agreement_rate"], 1.0)
+        self.assertEqual(summary["reasons"], {"goodbye": 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import unittest
+import asyncio
+from src.ratelimit import TokenBucket, RateLimiter, estimate_tokens
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestRateLimit(unittest.TestCase):
+    def test_token_bucket_refills_over_time(self):
+        clock = FakeClock()
+        bucket = TokenBucket(60, clock)  # one token per second
+        bucket.consume(60)
+        self.assertAlmostEqual(bucket.wait_time(1), 1.0)
+        clock.now = 10.0
+        self.assertEqual(bucket.wait_time(10), 0.0)
+        self.assertAlmostEqual(bucket.wait_time(15), 5.0)
+
+    def test_token_bucket_admits_oversized_request_when_full(self):
+        bucket = TokenBucket(100, FakeClock())
+        self.assertEqual(bucket.wait_time(500), 0.0)
+
+    def test_estimate_tokens(self):
+        request = {
+            "messages": [{"role": "user", "content": "x" * 40}],
+            "max_tokens": 5,
+        }
+        self.assertEqual(estimate_tokens(request), 16)
+
+    def test_rate_limiter_throttles_requests_per_minute(self):
+        async def run():
+            limiter = RateLimiter(rpm=600)  # one request per 0.1 seconds
+            limiter.requests.level = 1
+            await limiter.acquire(1)
+            await limiter.acquire(1)
+            return limiter
+
+        limiter = asyncio.run(run())
+        self.assertEqual(limiter.throttled_calls, 1)
+        self.assertGreater(limiter.throttled_seconds, 0.05)
+
+    def test_settling_an_over_estimate_never_overfills_the_bucket(self):
+        clock = FakeClock()
+        limiter = RateLimiter(tpm=1000, clock=clock)
+        asyncio.run(limiter.acquire(800))
+        # The bucket refills while the call is in flight, then the call uses far
+        # fewer tokens than estimated
+        clock.now = 60.0
+        limiter.settle(800, 10)
+        self.assertEqual(limiter.tokens.level, 1000)
+
+        # An immediate burst gets at most one minute's quota
+        self.assertEqual(limiter.tokens.wait_time(1000), 0.0)
+        limiter.tokens.consume(1000)
+        self.assertGreater(limiter.tokens.wait_time(1), 0.0)
+
+
+
+if __name__ == "__main__":
+    unittest.main()
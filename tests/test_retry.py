@@ -0,0 +1,188 @@
+import unittest
+import asyncio
+import random
+from unittest.mock import AsyncMock
+from src.fake_backend import FakeAPIError
+from src.ratelimit import RateLimiter
+from src.retry import (
+    CircuitBreaker,
+    RetryingClient,
+    RetryPolicy,
+    is_retryable,
+    retry_after,
+    with_retries,
+)
+from src.usage import TokenUsage, UsageTrackingClient
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def fast_policy(**kwargs):
+    return RetryPolicy(base_delay=0.001, max_delay=0.01, **kwargs)
+
+
+class TestRetry(unittest.TestCase):
+    def test_retryable_errors(self):
+        self.assertTrue(is_retryable(FakeAPIError(429, "Rate limit")))
+        self.assertTrue(is_retryable(FakeAPIError(503, "Unavailable")))
+        self.assertTrue(is_retryable(asyncio.TimeoutError()))
+        self.assertFalse(is_retryable(FakeAPIError(400, "Bad request")))
+        self.assertFalse(is_retryable(ValueError("bad")))
+
+    def test_backoff_is_jittered_and_honours_retry_after(self):
+        policy = RetryPolicy(base_delay=1.0, max_delay=5.0)
+        rng = random.Random(0)
+        delays = [policy.backoff(3, FakeAPIError(500, "error"), rng) for _ in range(100)]
+        self.assertTrue(all(0 <= delay <= 5.0 for delay in delays))
+        self.assertGreater(len(set(delays)), 90)
+        error = FakeAPIError(429, "Rate limit", retry_after=7.0)
+        self.assertEqual(retry_after(error), 7.0)
+        self.assertGreaterEqual(policy.backoff(0, error, rng), 7.0)
+
+    def test_retries_until_success_and_counts_them_on_the_call(self):
+        inner = AsyncMock()
+        inner.chat.completions.create.side_effect = [
+            FakeAPIError(500, "error"),
+            FakeAPIError(429, "Rate limit"),
+            "response",
+        ]
+        usage = TokenUsage()
+        client = UsageTrackingClient(
+            RetryingClient(inner, fast_policy(), role="teacher"), usage, "teacher"
+        )
+
+        response = asyncio.run(client.chat.completions.create(model="m", messages=[]))
+
+        self.assertEqual(response, "response")
+        self.assertEqual(usage.calls[0]["retries"], 2)
+        self.assertEqual(client.client.stats["retries"], 2)
+
+    def test_non_retryable_errors_are_raised_at_once(self):
+        inner = AsyncMock()
+        inner.chat.completions.create.side_effect = FakeAPIError(400, "Bad request")
+        client = RetryingClient(inner, fast_policy())
+        with self.assertRaises(FakeAPIError):
+            asyncio.run(client.chat.completions.create(model="m", messages=[]))
+        self.assertEqual(inner.chat.completions.create.call_count, 1)
+
+    def test_gives_up_after_max_retries(self):
+        inner = AsyncMock()
+        inner.chat.completions.create.side_effect = FakeAPIError(500, "error")
+        client = RetryingClient(inner, fast_policy(max_retries=2))
+        with self.assertRaises(FakeAPIError):
+            asyncio.run(client.chat.completions.create(model="m", messages=[]))
+        self.assertEqual(inner.chat.completions.create.call_count, 3)
+        self.assertEqual(client.stats["failures"], 1)
+
+    def test_hung_attempts_time_out_and_are_retried(self):
+        attempts = []
+
+        async def create(**kwargs):
+            attempts.append(kwargs)
+            if len(attempts) == 1:
+                await asyncio.sleep(10)
+            return "response"
+
+        inner = AsyncMock()
+        inner.chat.completions.create.side_effect = create
+        client = RetryingClient(inner, fast_policy(timeout=0.05))
+
+        self.assertEqual(asyncio.run(client.chat.completions.create(messages=[])), "response")
+        self.assertEqual(client.stats["timeouts"], 1)
+        self.assertEqual(client.stats["retries"], 1)
+
+    def test_deadline_bounds_the_whole_call(self):
+        async def hang(**kwargs):
+            await asyncio.sleep(10)
+
+        inner = AsyncMock()
+        inner.chat.completions.create.side_effect = hang
+        client = RetryingClient(inner, fast_policy(timeout=1.0, deadline=0.1))
+        with self.assertRaises(asyncio.TimeoutError):
+            asyncio.run(client.chat.completions.create(messages=[]))
+
+    def test_rate_limiter_waits_do_not_time_out_attempts(self):
+        inner = AsyncMock()
+        inner.chat.completions.create.return_value = "response"
+        # With the quota used up, admission takes longer than the attempt timeout
+        limiter = RateLimiter(rpm=240)
+        limiter.requests.level = 0.0
+        breaker = CircuitBreaker(failure_threshold=1)
+        client = RetryingClient(inner, fast_policy(timeout=0.1), breaker, limiter=limiter)
+
+        response = asyncio.run(client.chat.completions.create(messages=[]))
+
+        self.assertEqual(response, "response")
+        self.assertEqual(client.stats["timeouts"], 0)
+        self.assertEqual(client.stats["retries"], 0)
+        self.assertEqual(breaker.opened, 0)
+        self.assertEqual(limiter.throttled_calls, 1)
+
+    def test_limiter_settles_actual_usage(self):
+        inner = AsyncMock()
+        inner.chat.completions.create.return_value.usage.total_tokens = 100
+        limiter = RateLimiter(tpm=1000)
+        client = RetryingClient(inner, fast_policy(), limiter=limiter)
+
+        asyncio.run(
+            client.chat.completions.create(
+                model="m", messages=[{"role": "user", "content": "hi"}]
+            )
+        )
+
+        inner.chat.completions.create.assert_awaited_once()
+        self.assertAlmostEqual(limiter.tokens.level, 900, delta=1)
+
+    def test_circuit_breaker_opens_and_closes(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=3, cooldown=10.0, clock=clock)
+        breaker.record_failure()
+        breaker.record_failure()
+        self.assertEqual(breaker.wait_time(), 0.0)
+        breaker.record_failure()
+        self.assertEqual(breaker.wait_time(), 10.0)
+        self.assertEqual(breaker.opened, 1)
+
+        # A failed trial after the cooldown opens the circuit again at once
+        clock.now = 10.0
+        breaker.record_failure()
+        self.assertEqual(breaker.wait_time(), 10.0)
+        self.assertEqual(breaker.opened, 2)
+
+        clock.now = 20.0
+        breaker.record_success()
+        breaker.record_failure()
+        self.assertEqual(breaker.wait_time(), 0.0)
+
+    def test_open_circuit_pauses_calls(self):
+        inner = AsyncMock()
+        inner.chat.completions.create.return_value = "response"
+        breaker = CircuitBreaker(failure_threshold=1, cooldown=0.05)
+        breaker.record_failure()
+        client = RetryingClient(inner, fast_policy(), breaker)
+
+        self.assertEqual(asyncio.run(client.chat.completions.create(messages=[])), "response")
+        self.assertGreater(client.stats["paused_seconds"], 0.0)
+        self.assertEqual(breaker.wait_time(), 0.0)
+
+    def test_with_retries_reads_the_role_config(self):
+        client = with_retries(
+            AsyncMock(), {"timeout": 5.0, "max_retries": 1, "deadline": None}, "grader"
+        )
+        self.assertEqual(client.policy.timeout, 5.0)
+        self.assertEqual(client.policy.max_retries, 1)
+        self.assertIsNone(client.policy.deadline)
+        self.assertEqual(client.role, "grader")
+        self.assertIsNone(client.limiter)
+        limited = with_retries(AsyncMock(), {"rpm": 60, "tpm": None}, "grader")
+        self.assertEqual(limited.limiter.requests.capacity, 60)
+
+
+if __name__ == "__main__":
+    unittest.main()
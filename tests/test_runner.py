@@ -0,0 +1,190 @@
+import unittest
+import asyncio
+from src.runner import run_grid, run_pipeline
+from src.datastructures import Student, Scenario, Conversation, EvaluationResult
+
+
+class TestRunner(unittest.TestCase):
+    def setUp(self):
+        self.students = [
+            Student(id=f"student{i}", system_prompt="You are a student.")
+            for i in range(3)
+        ]
+        self.scenarios = [
+            Scenario(id=f"scenario{i}", initial_message="Help me.") for i in range(2)
+        ]
+
+    def test_run_grid_keeps_grid_order(self):
+        async def generate(student, scenario):
+            # Finish later cells first to make sure order does not follow completion
+            await asyncio.sleep(0.01 if student.id == "student0" else 0)
+            return Conversation(
+                id=f"{student.id}_{scenario.id}",
+                student=student.id,
+                scenario=scenario.id,
+                exchanges=[],
+            )
+
+        conversations = asyncio.run(
+            run_grid(self.students, self.scenarios, generate, concurrency=6)
+        )
+
+        self.assertEqual(
+            [c.id for c in conversations],
+            [
+                "student0_scenario0",
+                "student0_scenario1",
+                "student1_scenario0",
+                "student1_scenario1",
+                "student2_scenario0",
+                "student2_scenario1",
+            ],
+        )
+
+    def test_run_grid_caps_in_flight_conversations(self):
+        in_flight = 0
+        peak = 0
+
+        async def generate(student, scenario):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return Conversation(
+                id=f"{student.id}_{scenario.id}",
+                student=student.id,
+                scenario=scenario.id,
+                exchanges=[],
+            )
+
+        conversations = asyncio.run(
+            run_grid(self.students, self.scenarios, generate, concurrency=2)
+        )
+
+        self.assertEqual(len(conversations), 6)
+        self.assertEqual(peak, 2)
+
+    def test_run_grid_isolates_failed_cells(self):
+        async def generate(student, scenario):
+            if student.id == "student1":
+                raise RuntimeError("endpoint unavailable")
+            return Conversation(
+                id=f"{student.id}_{scenario.id}",
+                student=student.id,
+                scenario=scenario.id,
+                exchanges=[],
+            )
+
+        conversations = asyncio.run(
+            run_grid(self.students, self.scenarios, generate, concurrency=3)
+        )
+
+        self.assertEqual(len(conversations), 4)
+        self.assertTrue(all(c.student != "student1" for c in conversations))
+
+    def test_run_pipeline_grades_while_generating(self):
+        events = []
+
+        async def generate(student, scenario):
+            # The last cell is slow so grading has to start before it finishes
+            slow = student.id == "student2" and scenario.id == "scenario1"
+            await asyncio.sleep(0.05 if slow else 0)
+            events.append(("generated", f"{student.id}_{scenario.id}"))
+            return Conversation(
+                id=f"{student.id}_{scenario.id}",
+                student=student.id,
+                scenario=scenario.id,
+                exchanges=[],
+            )
+
+        async def evaluate(conversation):
+            if conversation.student == "student1":
+                raise RuntimeError("grader unavailable")
+            events.append(("evaluated", conversation.id))
+            return EvaluationResult(
+                conversation_id=conversation.id, rating=5.0, reasoning=""
+            )
+
+        streamed = []
+        conversations, evaluations = asyncio.run(
+            run_pipeline(
+                self.students,
+                self.scenarios,
+                generate,
+                evaluate,
+                concurrency=6,
+                grader_concurrency=2,
+                on_evaluation=lambda result: streamed.append(result.conversation_id),
+            )
+        )
+
+        self.assertEqual(len(conversations), 6)
+        self.assertEqual(
+            [e.conversation_id for e in evaluations],
+            [
+                "student0_scenario0",
+                "student0_scenario1",
+                "student2_scenario0",
+                "student2_scenario1",
+            ],
+        )
+        self.assertEqual(sorted(streamed), [e.conversation_id for e in evaluations])
+        self.assertLess(
+            events.index(("evaluated", "student0_scenario0")),
+            events.index(("generated", "student2_scenario1")),
+        )
+
+    def test_run_pipeline_resumes_completed_cells(self):
+        generated = []
+        evaluated = []
+
+        def make_conversation(student_id, scenario_id):
+            return Conversation(
+                id=f"{student_id}_{scenario_id}",
+                student=student_id,
+                scenario=scenario_id,
+                exchanges=[],
+            )
+
+        async def generate(student, scenario):
+            generated.append(f"{student.id}_{scenario.id}")
+            return make_conversation(student.id, scenario.id)
+
+        async def evaluate(conversation):
+            evaluated.append(conversation.id)
+            return EvaluationResult(
+                conversation_id=conversation.id, rating=5.0, reasoning=""
+            )
+
+        conversations, evaluations = asyncio.run(
+            run_pipeline(
+                self.students,
+                self.scenarios,
+                generate,
+                evaluate,
+                concurrency=2,
+                completed_conversations=[
+                    make_conversation("student0", "scenario0"),
+                    make_conversation("student0", "scenario1"),
+                ],
+                completed_evaluations=[
+                    EvaluationResult(
+                        conversation_id="student0_scenario0", rating=9.0, reasoning=""
+                    )
+                ],
+            )
+        )
+
+        self.assertEqual(len(conversations), 6)
+        self.assertEqual(len(evaluations), 6)
+        self.assertNotIn("student0_scenario0", generated)
+        self.assertNotIn("student0_scenario1", generated)
+        self.assertEqual(len(generated), 4)
+        self.assertIn("student0_scenario1", evaluated)
+        self.assertNotIn("student0_scenario0", evaluated)
+        self.assertEqual(evaluations[0].rating, 9.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
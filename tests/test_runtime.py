@@ -0,0 +1,84 @@
+import unittest
+import asyncio
+import os
+import tempfile
+from src.runtime import build_run_context, connection_limit
+from src.hedging import HedgedClient
+from src.streaming import StreamingClient
+from src.telemetry import TelemetryClient
+
+
+class TestRuntime(unittest.TestCase):
+    def setUp(self):
+        self.saved_environ = dict(os.environ)
+        for key in list(os.environ):
+            if key.endswith(("_API_KEY", "_BASE_URL")):
+                del os.environ[key]
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.env_file = os.path.join(self.tmpdir.name, ".eduenv")
+        with open(self.env_file, "w") as f:
+            f.write("STUDENT_API_KEY=key\nSTUDENT_BASE_URL=http://provider-a/v1\n")
+            f.write("TEACHER_API_KEY=key\nTEACHER_BASE_URL=http://provider-a/v1\n")
+            f.write("GRADER_API_KEY=other\nGRADER_BASE_URL=http://provider-a/v1\n")
+            f.write("MODERATOR_API_KEY=key\nMODERATOR_BASE_URL=http://provider-b/v1\n")
+
+    def tearDown(self):
+        os.environ.clear()
+        os.environ.update(self.saved_environ)
+        self.tmpdir.cleanup()
+
+    def test_connection_limit_follows_concurrency(self):
+        self.assertEqual(connection_limit(10, 2), 22)
+        self.assertEqual(connection_limit(10, 2, grader_fanout=11), 42)
+
+    def test_roles_share_clients_and_one_connection_pool(self):
+        context = build_run_context(self.env_file, max_connections=8, telemetry="off")
+        sdk_clients = {role: client.client for role, client in context.clients.items()}
+
+        # Same base URL and API key: one client
+        self.assertIs(sdk_clients["student"], sdk_clients["teacher"])
+        self.assertIsNot(sdk_clients["student"], sdk_clients["grader"])
+        self.assertIsNot(sdk_clients["student"], sdk_clients["moderator"])
+        # Every client sends its requests through the shared HTTP client
+        for client in sdk_clients.values():
+            self.assertIs(client._client, context.http_client)
+            self.assertEqual(client.max_retries, 0)
+        asyncio.run(context.aclose())
+
+    def test_calls_are_traced_through_the_exporter(self):
+        spans_file = os.path.join(self.tmpdir.name, "spans.jsonl")
+        context = build_run_context(
+            self.env_file, telemetry="local", telemetry_path=spans_file
+        )
+        self.assertIsInstance(context.clients["grader"].client, TelemetryClient)
+        self.assertIs(context.clients["grader"].client.exporter, context.exporter)
+        asyncio.run(context.aclose())
+
+    def test_streaming_sits_below_retries_and_telemetry(self):
+        spans_file = os.path.join(self.tmpdir.name, "spans.jsonl")
+        context = build_run_context(
+            self.env_file,
+            telemetry="local",
+            telemetry_path=spans_file,
+            stream=True,
+            max_turn_chars=100,
+        )
+        teacher = context.clients["teacher"].client.client
+        self.assertIsInstance(teacher, StreamingClient)
+        self.assertIs(context.streaming_clients["teacher"], teacher)
+        self.assertEqual(teacher.max_chars, 100)
+        self.assertEqual(sorted(context.streaming_clients), ["student", "teacher"])
+        self.assertNotIsInstance(context.clients["grader"].client.client, StreamingClient)
+        asyncio.run(context.aclose())
+
+    def test_hedging_sits_below_retries(self):
+        context = build_run_context(self.env_file, telemetry="off", hedge=("grader",))
+        hedged = context.clients["grader"].client
+        self.assertIsInstance(hedged, HedgedClient)
+        self.assertIs(context.hedged_clients["grader"], hedged)
+        self.assertEqual(list(context.hedged_clients), ["grader"])
+        asyncio.run(context.aclose())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import unittest
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+# Generous budget for importing the CLI; the real cost is a fraction of this
+IMPORT_BUDGET_SECONDS = 2.0
+
+IMPORT_PROBE = """
+import sys, time, json
+start = time.perf_counter()
+import src.edubench
+elapsed = time.perf_counter() - start
+print(json.dumps({
+    "seconds": elapsed,
+    "heavy": sorted(m for m in ("openai", "braintrust", "httpx") if m in sys.modules),
+}))
+"""
+
+
+class TestStartup(unittest.TestCase):
+    def setUp(self):
+        # Run from an empty directory without credentials so no .eduenv is picked up
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.env = {
+            key: value
+            for key, value in os.environ.items()
+            if not key.endswith("_API_KEY")
+        }
+        self.env["PYTHONPATH"] = os.getcwd()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def run_python(self, *args):
+        return subprocess.run(
+            [sys.executable, *args],
+            cwd=self.tmpdir.name,
+            env=self.env,
+            capture_output=True,
+            text=True,
+            timeout=60,
+        )
+
+    def test_import_is_cheap(self):
+        result = self.run_python("-c", IMPORT_PROBE)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        probe = json.loads(result.stdout.strip().splitlines()[-1])
+        self.assertEqual(probe["heavy"], [])
+        self.assertLess(probe["seconds"], IMPORT_BUDGET_SECONDS)
+
+    def test_help_works_without_credentials(self):
+        result = self.run_python("-m", "src.edubench", "run", "--help")
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertIn("--concurrency", result.stdout)
+
+
+if __name__ == "__main__":
+    unittest.main()
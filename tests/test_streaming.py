@@ -0,0 +1,84 @@
+import unittest
+import asyncio
+from openai import AsyncOpenAI
+from src.datastructures import Scenario, Student, Teacher
+from src.fake_backend import FakeChatClient, FakeResponder, FakeServer
+from src.generator import generate_conversation
+from src.streaming import StreamingClient
+
+
+def generate(responder, stream):
+    clients = {
+        role: FakeChatClient(responder, role) for role in ("teacher", "student", "moderator")
+    }
+    if stream:
+        for role in ("teacher", "student"):
+            clients[role] = StreamingClient(clients[role])
+    conversation = asyncio.run(
+        generate_conversation(
+            student=Student(id="student1", system_prompt="You are a student."),
+            scenario=Scenario(id="scenario1", initial_message="What is a fraction?"),
+            teacher=Teacher(id="teacher1", system_prompt="You are a teacher."),
+            teacher_model=clients["teacher"],
+            student_model=clients["student"],
+            moderator_model=clients["moderator"],
+            student_model_name="student",
+            teacher_model_name="teacher",
+            moderator_model_name="moderator",
+            max_turns=5,
+        )
+    )
+    return conversation, clients
+
+
+class TestStreaming(unittest.TestCase):
+    def test_streamed_transcript_matches_non_streamed(self):
+        script = {"teacher": ["Let's  start with halves.", "Good. Now try thirds!"]}
+        plain, _ = generate(FakeResponder(scripts=script, stop_after_turns=3), stream=False)
+        streamed, clients = generate(
+            FakeResponder(scripts=script, stop_after_turns=3), stream=True
+        )
+        self.assertEqual(streamed.exchanges, plain.exchanges)
+
+        stats = clients["teacher"].stats
+        self.assertEqual(stats["calls"], 3)
+        self.assertGreater(stats["p50_ttft_seconds"], 0.0)
+        self.assertEqual(stats["cut_off"], 0)
+
+    def test_replies_are_cut_off_on_the_client(self):
+        responder = FakeResponder(scripts={"teacher": ["One two three. STOP here please"]})
+
+        async def run(client):
+            response = await client.chat.completions.create(model="m", messages=[])
+            return response.choices[0]
+
+        limited = StreamingClient(FakeChatClient(responder, "teacher"), max_chars=7)
+        choice = asyncio.run(run(limited))
+        self.assertEqual(choice.message.content, "One two")
+        self.assertEqual(choice.finish_reason, "length")
+
+        stopped = StreamingClient(FakeChatClient(responder, "teacher"), stop=["STOP"])
+        choice = asyncio.run(run(stopped))
+        self.assertEqual(choice.message.content, "One two three. ")
+        self.assertEqual(choice.finish_reason, "stop")
+        self.assertEqual(limited.stats["cut_off"] + stopped.stats["cut_off"], 2)
+
+    def test_streaming_through_the_sdk(self):
+        responder = FakeResponder(scripts={"teacher": ["Streamed over HTTP."]})
+        with FakeServer(responder) as server:
+
+            async def run():
+                sdk = AsyncOpenAI(api_key="dummy", base_url=server.base_url("teacher"))
+                client = StreamingClient(sdk)
+                response = await client.chat.completions.create(model="m", messages=[])
+                await sdk.close()
+                return response, client
+
+            response, client = asyncio.run(run())
+        self.assertEqual(response.choices[0].message.content, "Streamed over HTTP.")
+        self.assertGreater(response.usage.completion_tokens, 0)
+        self.assertEqual(client.stats["calls"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
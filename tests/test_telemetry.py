@@ -0,0 +1,123 @@
+import unittest
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+from unittest.mock import AsyncMock
+from src.telemetry import JsonlSink, SpanExporter, TelemetryClient, make_exporter
+from src.usage import conversation_scope
+
+
+class RecordingSink:
+    def __init__(self, blocked: threading.Event = None, fail: bool = False):
+        self.batches = []
+        self.blocked = blocked
+        self.fail = fail
+        self.closed = False
+
+    def export(self, spans):
+        if self.blocked is not None:
+            self.blocked.wait()
+        if self.fail:
+            raise ConnectionError("backend unreachable")
+        self.batches.append(list(spans))
+
+    def close(self):
+        self.closed = True
+
+
+class TestTelemetry(unittest.TestCase):
+    def test_spans_are_batched_and_flushed_on_close(self):
+        sink = RecordingSink()
+        exporter = SpanExporter(sink, batch_size=10, flush_interval=60)
+        for i in range(25):
+            exporter.emit({"i": i})
+        exporter.close()
+
+        self.assertEqual([len(batch) for batch in sink.batches], [10, 10, 5])
+        self.assertTrue(sink.closed)
+        self.assertEqual(exporter.stats["exported"], 25)
+        self.assertEqual(exporter.stats["dropped"], 0)
+
+    def test_full_queue_drops_spans_without_blocking(self):
+        blocked = threading.Event()
+        sink = RecordingSink(blocked=blocked)
+        exporter = SpanExporter(sink, max_queue=5, batch_size=1, flush_interval=60)
+
+        start = time.perf_counter()
+        for i in range(100):
+            exporter.emit({"i": i})
+        self.assertLess(time.perf_counter() - start, 0.5)
+        blocked.set()
+        exporter.close()
+
+        stats = exporter.stats
+        self.assertGreater(stats["dropped"], 0)
+        self.assertEqual(stats["exported"] + stats["dropped"], 100)
+        self.assertGreater(stats["emit_overhead_us"], 0)
+
+    def test_failing_sink_is_counted(self):
+        exporter = SpanExporter(RecordingSink(fail=True), flush_interval=60)
+        exporter.emit({"i": 0})
+        exporter.close()
+        self.assertEqual(exporter.stats["failed"], 1)
+        self.assertEqual(exporter.stats["exported"], 0)
+
+    def test_telemetry_client_writes_spans_to_a_local_file(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            spans_file = os.path.join(tmpdir, "spans.jsonl")
+            exporter = make_exporter("local", file_path=spans_file)
+            inner = AsyncMock()
+            inner.chat.completions.create.return_value.choices[0].message.content = "Hi!"
+            inner.chat.completions.create.return_value.usage.prompt_tokens = 3
+            inner.chat.completions.create.return_value.usage.completion_tokens = 1
+            client = TelemetryClient(inner, exporter, "teacher")
+
+            async def run():
+                with conversation_scope("conv1"):
+                    await client.chat.completions.create(
+                        model="m", messages=[{"role": "user", "content": "Hello"}]
+                    )
+                inner.chat.completions.create.side_effect = TimeoutError()
+                with self.assertRaises(TimeoutError):
+                    await client.chat.completions.create(model="m", messages=[])
+
+            asyncio.run(run())
+            exporter.close()
+            with open(spans_file) as f:
+                spans = [json.loads(line) for line in f]
+
+        self.assertEqual(len(spans), 2)
+        self.assertEqual(spans[0]["role"], "teacher")
+        self.assertEqual(spans[0]["conversation_id"], "conv1")
+        self.assertEqual(spans[0]["output"], "Hi!")
+        self.assertEqual(spans[0]["prompt_tokens"], 3)
+        self.assertIsNone(spans[0]["error"])
+        self.assertEqual(spans[1]["error"], "TimeoutError()")
+
+    def test_local_sink_appends_when_resuming(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            spans_file = os.path.join(tmpdir, "spans.jsonl")
+
+            def run(number, resume):
+                sink = JsonlSink(spans_file, resume=resume)
+                sink.export([{"run": number}])
+                sink.close()
+                with open(spans_file) as f:
+                    return [json.loads(line)["run"] for line in f]
+
+            self.assertEqual(run(0, resume=False), [0])
+            self.assertEqual(run(1, resume=True), [0, 1])
+            self.assertEqual(run(2, resume=False), [2])
+
+    def test_off_means_no_exporter(self):
+        self.assertIsNone(make_exporter("off"))
+        exporter = make_exporter("local", file_path=os.devnull)
+        self.assertIsInstance(exporter.sink, JsonlSink)
+        exporter.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
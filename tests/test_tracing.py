@@ -0,0 +1,55 @@
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+from src.tracing import span, start_tracing, stop_tracing, traced
+
+
+class TestTracing(unittest.TestCase):
+    def tearDown(self):
+        stop_tracing()
+
+    def test_disabled_spans_record_nothing(self):
+        self.assertIs(span("a"), span("b", turn=1))
+        with span("a"):
+            pass
+        self.assertIsNone(stop_tracing())
+
+    def test_concurrent_tasks_get_their_own_tracks(self):
+        tracer = start_tracing()
+
+        async def cell(name):
+            with span("conversation", conversation=name):
+                with span("teacher_turn", "model"):
+                    await asyncio.sleep(0.01)
+
+        async def run():
+            with span("pipeline"):
+                await asyncio.gather(
+                    cell("a"), cell("b"), traced("speculative", asyncio.sleep(0))
+                )
+
+        asyncio.run(run())
+        self.assertIs(stop_tracing(), tracer)
+
+        spans = [event for event in tracer.events if event["ph"] == "X"]
+        conversations = [event for event in spans if event["name"] == "conversation"]
+        self.assertEqual(len(conversations), 2)
+        self.assertNotEqual(conversations[0]["tid"], conversations[1]["tid"])
+        # Both conversations overlap in time
+        first, second = sorted(conversations, key=lambda event: event["ts"])
+        self.assertLess(second["ts"], first["ts"] + first["dur"])
+        teacher = [event for event in spans if event["name"] == "teacher_turn"]
+        self.assertEqual({event["cat"] for event in teacher}, {"model"})
+        self.assertIn("speculative", {event["name"] for event in spans})
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "trace.json")
+            tracer.write(path)
+            with open(path) as f:
+                self.assertEqual(len(json.load(f)["traceEvents"]), len(tracer.events))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,135 @@
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+from src.usage import (
+    TokenUsage,
+    UsageTrackingClient,
+    conversation_scope,
+    current_call,
+)
+
+
+def completion(prompt_tokens, completion_tokens, cached_tokens=0):
+    return SimpleNamespace(
+        usage=SimpleNamespace(
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            prompt_tokens_details=SimpleNamespace(cached_tokens=cached_tokens),
+        )
+    )
+
+
+class StubClient:
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, **kwargs):
+        await asyncio.sleep(0)
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+class TestUsage(unittest.TestCase):
+    def test_records_calls_per_conversation(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "calls.jsonl")
+            usage = TokenUsage(prices={"teacher": (2.0, 8.0)}, calls_path=path)
+            teacher = UsageTrackingClient(
+                StubClient([completion(1000, 100, cached_tokens=500), completion(2000, 200)]),
+                usage,
+                "teacher",
+            )
+            student = UsageTrackingClient(
+                StubClient([completion(10, 5), RuntimeError("boom")]), usage, "student"
+            )
+
+            async def conversation(conversation_id, client):
+                with conversation_scope(conversation_id):
+                    return await client.chat.completions.create(model="m", messages=[])
+
+            async def run():
+                await asyncio.gather(
+                    conversation("a", teacher), conversation("b", teacher)
+                )
+                await conversation("a", student)
+                with self.assertRaises(RuntimeError):
+                    await conversation("b", student)
+
+            asyncio.run(run())
+            usage.close()
+
+            with open(path) as f:
+                calls = [json.loads(line) for line in f]
+            self.assertEqual(len(calls), 4)
+            self.assertEqual(calls[0]["cached_tokens"], 500)
+            self.assertEqual(calls[-1]["error"], "RuntimeError")
+            self.assertEqual(calls[-1]["prompt_tokens"], 0)
+
+            rollup = usage.cost_latency()
+            self.assertEqual(rollup["roles"]["teacher"]["calls"], 2)
+            self.assertAlmostEqual(
+                rollup["roles"]["teacher"]["cost"], (3000 * 2.0 + 300 * 8.0) / 1e6
+            )
+            self.assertIsNone(rollup["roles"]["student"]["cost"])
+            self.assertEqual(rollup["roles"]["student"]["errors"], 1)
+            self.assertEqual(rollup["conversations"]["a"]["calls"], 2)
+            self.assertEqual(rollup["conversations"]["b"]["calls"], 2)
+            self.assertEqual(
+                rollup["conversations"]["a"]["prompt_tokens"]
+                + rollup["conversations"]["b"]["prompt_tokens"],
+                3010,
+            )
+
+            # Resuming keeps the calls already on disk
+            resumed = TokenUsage(calls_path=path, resume=True)
+            self.assertEqual(len(resumed.calls), 4)
+            self.assertEqual(resumed.summary()["teacher"]["prompt_tokens"], 3000)
+            resumed.close()
+
+    def test_cancelled_calls_are_not_errors(self):
+        usage = TokenUsage(prices={"teacher": (2.0, 8.0)})
+
+        class HangingClient(StubClient):
+            async def create(self, **kwargs):
+                await asyncio.sleep(10)
+
+        client = UsageTrackingClient(HangingClient([]), usage, "teacher")
+
+        async def run():
+            task = asyncio.ensure_future(client.chat.completions.create(model="m", messages=[]))
+            await asyncio.sleep(0.01)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(run())
+        self.assertTrue(usage.calls[0]["cancelled"])
+        self.assertIsNone(usage.calls[0]["error"])
+        self.assertIsNone(usage.calls[0]["cost"])
+        rollup = usage.cost_latency()
+        self.assertEqual(rollup["roles"]["teacher"]["cancelled"], 1)
+        self.assertEqual(rollup["roles"]["teacher"]["errors"], 0)
+        self.assertEqual(rollup["latency_seconds"], 0.0)
+
+    def test_inner_layers_can_annotate_the_call(self):
+        usage = TokenUsage()
+
+        class RetryingClient(StubClient):
+            async def create(self, **kwargs):
+                current_call.get()["retries"] += 2
+                return await super().create(**kwargs)
+
+        client = UsageTrackingClient(RetryingClient([completion(1, 1)]), usage, "grader")
+        asyncio.run(client.chat.completions.create(model="m", messages=[]))
+        self.assertEqual(usage.calls[0]["retries"], 2)
+        self.assertIsNone(usage.calls[0]["conversation_id"])
+
+
+if __name__ == "__main__":
+    unittest.main()